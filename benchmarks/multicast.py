@@ -0,0 +1,77 @@
+"""
+Counts the copies and serializations of messages, envelopes and routings done by one Gossip.send_gossip.
+
+Usage:
+    PYTHONPATH=src python benchmarks/multicast.py
+"""
+import asyncio
+import ipaddress
+import time
+import uuid
+
+from aiogossip.gossip import Gossip
+from aiogossip.message_pb2 import Message
+from aiogossip.topology import Node
+from aiogossip.transport import Transport, codec
+from aiogossip.transport.address import Address
+
+PAYLOAD_SIZE = 2048
+ROUNDS = 100
+
+# gossip messages are copied and serialized as envelopes, with their own routing
+CLASSES = {"Message": Message, "Envelope": codec.Envelope, "Routing": Message.Routing}
+METHODS = ("CopyFrom", "SerializeToString")
+COUNTERS = {(name, method): 0 for name in CLASSES for method in METHODS}
+
+
+def count(name, method):
+    cls = CLASSES[name]
+    func = getattr(cls, method)
+
+    def wrapper(self, *args, **kwargs):
+        COUNTERS[name, method] += 1
+        return func(self, *args, **kwargs)
+
+    setattr(cls, method, wrapper)
+
+
+async def bench(fanout):
+    loop = asyncio.get_running_loop()
+    transport = Transport(("127.0.0.1", 0), loop=loop)
+    gossip = Gossip(transport, fanout=fanout)
+    for i in range(fanout):
+        node_addr = Address(ipaddress.ip_address("127.0.0.1"), 40000 + i)
+        gossip.topology.create_node_edge(Node(uuid.uuid4().bytes, node_addr))
+
+    for counter in COUNTERS:
+        COUNTERS[counter] = 0
+
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        message = Message(id=uuid.uuid4().bytes, topic="bench", payload=b"x" * PAYLOAD_SIZE)
+        await gossip.send_gossip(message)
+    elapsed = time.perf_counter() - start
+    datagrams = transport.tx_packets
+
+    await gossip.close()
+    counters = {counter: value / ROUNDS for counter, value in COUNTERS.items()}
+    return datagrams / ROUNDS, counters, elapsed / ROUNDS * 1e6
+
+
+async def main():
+    for counter in COUNTERS:
+        count(*counter)
+
+    print(f"payload: {PAYLOAD_SIZE} bytes, rounds: {ROUNDS}, copies/serializations per multicast")
+    columns = " ".join(f"{name + ' C/S':>14}" for name in CLASSES)
+    print(f"{'fanout':>8} {'datagrams':>10} {columns} {'us/multicast':>14}")
+    for fanout in (1, 5, 10, 50):
+        datagrams, counters, elapsed = await bench(fanout)
+        columns = " ".join(
+            f"{counters[name, 'CopyFrom']:>6.1f}/{counters[name, 'SerializeToString']:<7.1f}" for name in CLASSES
+        )
+        print(f"{fanout:>8} {datagrams:>10.1f} {columns} {elapsed:>14.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,77 @@
+"""
+Measures the memory held by a Topology of every backend at 1k, 10k and 100k nodes.
+
+Every node is connected to DEGREE random nodes, with edges in both directions, as Topology.update
+records them.
+
+Usage:
+    PYTHONPATH=src python benchmarks/topology_memory.py
+"""
+import ipaddress
+import random
+import time
+import tracemalloc
+import uuid
+
+from aiogossip.topology import CompactTopology
+from aiogossip.transport.address import Address
+
+try:
+    from aiogossip.topology import GraphTopology
+except ImportError:
+    # networkx is optional
+    GraphTopology = None
+
+DEGREE = 4
+NODES = (1_000, 10_000, 100_000)
+
+
+def get_addr(i):
+    return Address(ipaddress.ip_address(0x0A000000 + i), 30000 + i % 30000)
+
+
+def bench(topology_cls, nodes):
+    random.seed(0)
+    node_ids = [uuid.uuid4().bytes for _ in range(nodes)]
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    topology = topology_cls(node_ids[0], get_addr(0))
+    for i, node_id in enumerate(node_ids):
+        topology.create_node(node_id, node_addr=get_addr(i))
+    for i, src_id in enumerate(node_ids):
+        for j in random.sample(range(nodes), DEGREE):
+            if i == j:
+                continue
+            dst_id = node_ids[j]
+            topology.add_edge(src_id, dst_id, saddr=get_addr(i), daddr=get_addr(j), latency=1_000_000)
+            topology.add_edge(dst_id, src_id, saddr=get_addr(j), daddr=get_addr(i), latency=1_000_000)
+    elapsed = time.perf_counter() - start
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    topology.get_next_peer(node_ids[-1])
+    routing = time.perf_counter() - start
+
+    return memory, elapsed, routing
+
+
+def main():
+    backends = [cls for cls in (GraphTopology, CompactTopology) if cls is not None]
+    if GraphTopology is None:
+        print("networkx is not installed, skipping GraphTopology")
+
+    print(f"degree: {DEGREE}")
+    print(f"{'backend':>16} {'nodes':>8} {'MiB':>8} {'bytes/node':>11} {'build s':>8} {'route ms':>9}")
+    for topology_cls in backends:
+        for nodes in NODES:
+            memory, elapsed, routing = bench(topology_cls, nodes)
+            print(
+                f"{topology_cls.__name__:>16} {nodes:>8} {memory / 2**20:>8.1f} {memory / nodes:>11.0f} "
+                f"{elapsed:>8.2f} {routing * 1e3:>9.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+import hashlib
+
+
+class Buckets:
+    """
+    Summary of a set of ids for anti-entropy.
+
+    Ids are hashed into a fixed number of buckets and every bucket is summarized by the xor of the
+    hashes of its ids. Two sets of ids are compared bucket by bucket, so only the ids of differing
+    buckets need to be exchanged. Adding or removing an id costs O(1).
+    """
+
+    BUCKETS = 64
+
+    def __init__(self, buckets=None):
+        self.sums = [0] * (buckets or self.BUCKETS)
+
+    @staticmethod
+    def hash(mutex_id):
+        return int.from_bytes(hashlib.blake2b(mutex_id, digest_size=8).digest(), "little")
+
+    def bucket(self, mutex_id):
+        return self.hash(mutex_id) % len(self.sums)
+
+    def add(self, mutex_id):
+        h = self.hash(mutex_id)
+        self.sums[h % len(self.sums)] ^= h
+
+    # xor is its own inverse
+    remove = add
+
+    def diff(self, sums):
+        """
+        Returns the buckets that differ from another summary.
+
+        Args:
+            sums (list): The bucket sums of the other summary.
+
+        Returns:
+            set: The indexes of the differing buckets, every bucket if the summaries differ in size.
+        """
+        if len(sums) != len(self.sums):
+            return set(range(len(self.sums)))
+        return {i for i, (a, b) in enumerate(zip(self.sums, sums)) if a != b}
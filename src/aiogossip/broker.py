@@ -1,11 +1,11 @@
 import asyncio
 import collections
-import fnmatch
 import itertools
 
-from .concurrency import Channel, TaskManager
+from .concurrency import Channel, TaskManager, TimerWheel
 from .gossip import Gossip
 from .message_pb2 import Message
+from .topics import TopicIndex
 
 
 class Handler:
@@ -40,21 +40,66 @@ class Handler:
         await self.task_manager.close()
 
 
+class Correlation:
+    """
+    The messages received in response to a published message, until it expires.
+    """
+
+    __slots__ = ("_loop", "messages", "waiter", "timer", "closed")
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self._loop = loop
+
+        self.messages = collections.deque()
+        self.waiter = None
+        self.timer = None
+        self.closed = False
+
+    def _wakeup(self):
+        if self.waiter is not None and not self.waiter.done():
+            self.waiter.set_result(None)
+
+    def put(self, message):
+        self.messages.append(message)
+        self._wakeup()
+
+    def close(self):
+        self.closed = True
+        self._wakeup()
+
+    async def get(self):
+        """
+        Returns the next message, None once closed and every message was received.
+        """
+        while not self.messages and not self.closed:
+            self.waiter = self._loop.create_future()
+            try:
+                await self.waiter
+            finally:
+                self.waiter = None
+        return self.messages.popleft() if self.messages else None
+
+
 class Broker:
     TIMEOUT = 1
 
-    def __init__(self, gossip: Gossip, loop: asyncio.AbstractEventLoop = None):
+    def __init__(self, gossip: Gossip, loop: asyncio.AbstractEventLoop = None, timers: TimerWheel = None):
         """
         Initialize a Broker instance.
 
         Args:
             gossip (Gossip): The Gossip instance used for communication.
             loop (asyncio.AbstractEventLoop, optional): The event loop to use.
+            timers (TimerWheel, optional): The timer wheel to expire publish correlations on.
         """
         self._loop = loop or gossip.transport._loop
 
         self.gossip = gossip
         self.handlers = collections.defaultdict(list)
+        self.topics = TopicIndex()  # topics with handlers
+
+        self.correlations = {}  # published message id -> Correlation
+        self.timers = timers or TimerWheel(loop=self._loop)
 
     async def close(self):
         """
@@ -62,6 +107,9 @@ class Broker:
         """
         handlers = [h for h in itertools.chain(*self.handlers.values())]
         await asyncio.gather(*[h.cancel() for h in handlers], return_exceptions=True)
+
+        for message_id, correlation in list(self.correlations.items()):
+            self._expire(message_id, correlation)
         await self.gossip.close()
 
     async def listen(self):
@@ -69,25 +117,17 @@ class Broker:
         Connect to the gossip network and start receiving messages.
         """
         async for message in self.gossip.recv():
-            # FIXME: make messages idempotent (prevent duplicate processing of gossip messages)
-            handlers = list(self.handlers.keys())
-
-            if f"recv:{message.id}" in handlers:
-                for handler in self.handlers[f"recv:{message.id}"]:
-                    await handler.chan.send(message)
-
-            elif message.topic:
-                for topic in handlers:
-                    if fnmatch.fnmatch(message.topic, topic):
-                        for handler in self.handlers[topic]:
-                            await handler.chan.send(message)
+            correlation = self.correlations.get(message.id)
+            if correlation is not None:
+                correlation.put(message)
+                continue
 
-            else:
+            if not message.topic:
                 continue
 
-            for topic in handlers:
-                if len(self.handlers[topic]) == 0:
-                    del self.handlers[topic]
+            for topic in self.topics.match(message.topic):
+                for handler in list(self.handlers.get(topic, ())):
+                    await handler.chan.send(message)
 
     def subscribe(self, topic, func):
         """
@@ -102,6 +142,7 @@ class Broker:
         """
         handler = Handler(topic, func, loop=self._loop)
         self.handlers[topic].append(handler)
+        self.topics.add(topic)
         return handler
 
     async def unsubscribe(self, handler):
@@ -113,6 +154,9 @@ class Broker:
         """
         await handler.cancel()
         self.handlers[handler.topic].remove(handler)
+        if not self.handlers[handler.topic]:
+            del self.handlers[handler.topic]
+            self.topics.discard(handler.topic)
 
     async def publish(self, topic, message, peer_ids=None):
         """
@@ -134,23 +178,49 @@ class Broker:
             raise ValueError("Message ID is required:", message)
         message_id = message.id
 
-        if peer_ids:
-            for peer_id in peer_ids:
-                if peer_id in self.gossip.topology:
-                    await self.gossip.send(message, peer_id)
-                else:
-                    raise ValueError(f"Unknown node: {peer_id}")
-        else:
-            await self.gossip.send_gossip(message)
+        # registered before sending, responses may arrive before the caller starts receiving
+        correlation = self._correlate(message_id)
+        try:
+            if peer_ids:
+                for peer_id in peer_ids:
+                    if peer_id in self.gossip.topology:
+                        await self.gossip.send(message, peer_id)
+                    else:
+                        raise ValueError(f"Unknown node: {peer_id}")
+            else:
+                await self.gossip.send_gossip(message)
+        except BaseException:
+            self._expire(message_id, correlation)
+            raise
 
-        return self._recv(message_id, peer_ids=peer_ids)
+        return self._recv(message_id, correlation, peer_ids=peer_ids)
 
-    async def _recv(self, message_id, peer_ids=None):
+    def _correlate(self, message_id):
+        """
+        Register a published message id, to receive the messages in response to it for TIMEOUT seconds.
+        """
+        correlation = Correlation(loop=self._loop)
+        correlation.timer = self.timers.schedule(self.TIMEOUT, self._expire, message_id, correlation)
+
+        previous = self.correlations.get(message_id)
+        if previous is not None:
+            self._expire(message_id, previous)
+        self.correlations[message_id] = correlation
+        return correlation
+
+    def _expire(self, message_id, correlation):
+        correlation.timer.cancel()
+        correlation.close()
+        if self.correlations.get(message_id) is correlation:
+            del self.correlations[message_id]
+
+    async def _recv(self, message_id, correlation, peer_ids=None):
         """
         Receive messages with the given message ID.
 
         Args:
             message_id (str): The message ID to filter the received messages.
+            correlation (Correlation): The correlation of the message ID.
             peer_ids (list, optional):
                 The list of peer IDs to expect messages from.
                 If not provided, the message will be sent to all nodes in the gossip network.
@@ -158,31 +228,26 @@ class Broker:
         Yields:
             Message: The received messages.
         """
-        chan = Channel(loop=self._loop)
-        handler = self.subscribe(f"recv:{message_id}", chan.send)
-
         acks = set()
         if peer_ids:
             acks.update(peer_ids)
 
         try:
-            async with asyncio.timeout(self.TIMEOUT):
-                while True:
-                    message = await chan.recv()
+            while True:
+                message = await correlation.get()
+                if message is None:
+                    break
 
-                    if Message.Kind.ACK in message.kind:
-                        acks.add(message.routing.src_id)
-                        yield message  # FIXME: don't yield acks
+                if Message.Kind.ACK in message.kind:
+                    acks.add(message.routing.src_id)
+                    yield message  # FIXME: don't yield acks
 
-                    elif message.routing.src_id in acks:
-                        acks.remove(message.routing.src_id)
-                        yield message
+                elif message.routing.src_id in acks:
+                    acks.remove(message.routing.src_id)
+                    yield message
 
-                    else:
-                        raise ValueError(f"Unknown message: {message}")
+                else:
+                    raise ValueError(f"Unknown message: {message}")
 
-        except asyncio.TimeoutError:
-            pass
         finally:
-            await self.unsubscribe(handler)
-            await chan.close()
+            self._expire(message_id, correlation)
@@ -1,2 +1,5 @@
+from .bloom import BloomMutex  # noqa
 from .channel import Channel  # noqa
+from .mutex import Mutex  # noqa
 from .taskmanager import TaskManager  # noqa
+from .timerwheel import TimerWheel  # noqa
@@ -0,0 +1,165 @@
+import collections
+import hashlib
+import math
+import time
+
+from ..config import MUTEX_MAXSIZE, MUTEX_TTL
+from .mutex import Mutex
+
+
+class BloomFilter:
+    """
+    Bloom filter sized for a number of keys and a target false positive rate.
+
+    Bit indexes are derived from a single 128-bit blake2b digest of a key by enhanced double hashing.
+    """
+
+    def __init__(self, capacity, error_rate):
+        """
+        Initialize a BloomFilter instance.
+
+        Args:
+            capacity (int): The number of keys the filter is sized for.
+            error_rate (float): The false positive rate at capacity.
+        """
+        if capacity < 1:
+            raise ValueError(f"Capacity must be positive: {capacity}")
+        if not 0 < error_rate < 1:
+            raise ValueError(f"Error rate must be between 0 and 1: {error_rate}")
+
+        self.capacity = capacity
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0  # keys added
+        self.ones = 0  # bits set
+
+    @staticmethod
+    def digest(key):
+        if not isinstance(key, bytes):
+            key = str(key).encode()
+        digest = hashlib.blake2b(key, digest_size=16).digest()
+        return int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+
+    def indexes(self, digest):
+        h1, h2 = digest
+        indexes = []
+        for i in range(self.hashes):
+            indexes.append(h1 % self.size)
+            h1 += h2
+            h2 += i
+        return indexes
+
+    def contains(self, indexes):
+        bits = self.bits
+        return all(bits[i >> 3] & (1 << (i & 7)) for i in indexes)
+
+    def add(self, indexes):
+        bits = self.bits
+        for i in indexes:
+            bit = 1 << (i & 7)
+            if not bits[i >> 3] & bit:
+                bits[i >> 3] |= bit
+                self.ones += 1
+        self.count += 1
+
+    def __contains__(self, key):
+        return self.contains(self.indexes(self.digest(key)))
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def fill_ratio(self):
+        return self.ones / self.size
+
+    @property
+    def error_rate(self):
+        return self.fill_ratio**self.hashes
+
+
+class BloomMutex(Mutex):
+    """
+    Mutex backed by rotating generations of Bloom filters, holding ids in fixed memory.
+
+    Ids are added to the newest generation. A new generation replaces the oldest one every
+    `ttl / (generations - 1)` seconds, or once the newest generation holds its share of `capacity`
+    ids, so an id is held for at least `ttl` seconds unless more than `capacity` ids are acquired
+    within `ttl`. A false positive makes an id that was never acquired look held.
+    """
+
+    GENERATIONS = 2
+    ERROR_RATE = 0.001
+
+    def __init__(self, ttl=MUTEX_TTL, capacity=MUTEX_MAXSIZE, error_rate=None, generations=None):
+        """
+        Initialize a BloomMutex instance.
+
+        Args:
+            ttl (int, optional): The time-to-live (TTL) of an id in seconds. Defaults to MUTEX_TTL.
+            capacity (int, optional): The number of ids acquired within ttl the filters are sized for.
+                Defaults to MUTEX_MAXSIZE.
+            error_rate (float, optional): The target false positive rate. Defaults to ERROR_RATE.
+            generations (int, optional): The number of filters held. Defaults to GENERATIONS.
+        """
+        generations = generations or self.GENERATIONS
+        if generations < 2:
+            raise ValueError(f"At least 2 generations are required: {generations}")
+
+        super().__init__(ttl=ttl, maxsize=capacity)
+        self.generations = generations
+        self.error_rate_target = error_rate or self.ERROR_RATE
+
+        # every generation is checked on lookup, so each one gets a share of the error rate
+        self._capacity = math.ceil(capacity / (generations - 1))
+        self._error_rate = self.error_rate_target / generations
+        self._span = ttl / (generations - 1)
+
+        self._filters = collections.deque(maxlen=generations)
+        self._rotated = time.monotonic()
+        self._filters.append(BloomFilter(self._capacity, self._error_rate))
+
+    def _expire(self, now):
+        rotations = int((now - self._rotated) // self._span)
+        if rotations >= self.generations:
+            rotations, self._rotated = self.generations, now
+        else:
+            self._rotated += rotations * self._span
+        for _ in range(rotations):
+            self._filters.append(BloomFilter(self._capacity, self._error_rate))
+
+    def __len__(self):
+        self._expire(time.monotonic())
+        return sum(f.count for f in self._filters)
+
+    def __contains__(self, mutex_id):
+        self._expire(time.monotonic())
+        digest = BloomFilter.digest(mutex_id)
+        indexes = self._filters[-1].indexes(digest)
+        return any(f.contains(indexes) for f in self._filters)
+
+    def acquire(self, mutex_id):
+        now = time.monotonic()
+        self._expire(now)
+
+        indexes = self._filters[-1].indexes(BloomFilter.digest(mutex_id))
+        if any(f.contains(indexes) for f in self._filters):
+            self.hits += 1
+            return False
+
+        self.misses += 1
+        if self._filters[-1].count >= self._capacity:
+            self._filters.append(BloomFilter(self._capacity, self._error_rate))
+            self._rotated = now
+        self._filters[-1].add(indexes)
+        return True
+
+    @property
+    def fill_ratio(self):
+        """Fill ratio of the newest generation."""
+        return self._filters[-1].fill_ratio
+
+    @property
+    def error_rate(self):
+        """Estimated false positive rate of a lookup across all generations."""
+        return 1 - math.prod(1 - f.error_rate for f in self._filters)
@@ -2,39 +2,98 @@ import collections
 import functools
 import time
 
-from ..config import MUTEX_TTL
+from ..config import MUTEX_MAXSIZE, MUTEX_TTL
 
-MUTEX = collections.defaultdict(dict)
 
+class Mutex:
+    """
+    Mutual exclusion of functions by id, backed by a bounded cache of recently acquired ids.
+
+    An id is held for `ttl` seconds after it was acquired. Ids are kept in the order they were
+    acquired, so expired ids are always the oldest ones and, once `maxsize` ids are held, the oldest
+    id is evicted: both cost amortized O(1) per acquire.
 
-def mutex(owner, mutex_id, mutex_ttl=MUTEX_TTL):
+    Attributes:
+        hits (int): The number of acquires of an id that was already held.
+        misses (int): The number of acquires of an id that was not held.
     """
-    Decorator that provides mutual exclusion for a function based on the owner and mutex_id.
 
-    Args:
-        owner (str): The owner of the mutex.
-        mutex_id (str): The identifier of the mutex.
-        mutex_ttl (int, optional): The time-to-live (TTL) for the mutex in seconds. Defaults to MUTEX_TTL.
+    def __init__(self, ttl=MUTEX_TTL, maxsize=MUTEX_MAXSIZE):
+        """
+        Initialize a Mutex instance.
 
-    Returns:
-        function: The decorated function.
+        Args:
+            ttl (int, optional): The time-to-live (TTL) of an id in seconds. Defaults to MUTEX_TTL.
+            maxsize (int, optional): The maximum number of ids held. Defaults to MUTEX_MAXSIZE.
+        """
+        self.ttl = ttl
+        self.maxsize = maxsize
 
-    """
+        self._ids = collections.OrderedDict()  # id -> acquire time, oldest first
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        self._expire(time.monotonic())
+        return len(self._ids)
+
+    def __contains__(self, mutex_id):
+        self._expire(time.monotonic())
+        return mutex_id in self._ids
+
+    def _expire(self, now):
+        while self._ids:
+            acquired = self._ids[next(iter(self._ids))]
+            if now - acquired <= self.ttl:
+                break
+            self._ids.popitem(last=False)
+
+    def acquire(self, mutex_id):
+        """
+        Acquire an id unless it is already held.
+
+        Args:
+            mutex_id (Hashable): The identifier of the mutex.
+
+        Returns:
+            bool: True if the id was acquired, False if it is already held.
+        """
+        now = time.monotonic()
+        self._expire(now)
+
+        if mutex_id in self._ids:
+            self.hits += 1
+            return False
+
+        self.misses += 1
+        self._ids[mutex_id] = now
+        if len(self._ids) > self.maxsize:
+            self._ids.popitem(last=False)
+        return True
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def __call__(self, mutex_id):
+        """
+        Decorator that runs a function only if the mutex_id is acquired, and returns None otherwise.
+
+        Args:
+            mutex_id (Hashable): The identifier of the mutex.
+
+        Returns:
+            function: The decorator.
+        """
 
-    def decorator(func):
-        @functools.wraps(func)
-        async def wrapper(*args, **kwargs):
-            mut = MUTEX[owner].get(mutex_id)
-            if mut:
-                if time.time() - mut > mutex_ttl:
-                    MUTEX[owner][mutex_id] = time.time()
-                    return await func(*args, **kwargs)
-                else:
+        def decorator(func):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                if not self.acquire(mutex_id):
                     return
-            else:
-                MUTEX[owner][mutex_id] = time.time()
                 return await func(*args, **kwargs)
 
-        return wrapper
+            return wrapper
 
-    return decorator
+        return decorator
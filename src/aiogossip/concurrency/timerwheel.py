@@ -0,0 +1,173 @@
+import asyncio
+import math
+
+
+class Timer:
+    """
+    A callback scheduled on a TimerWheel.
+    """
+
+    __slots__ = ("wheel", "tick", "callback", "args", "level", "slot")
+
+    def __init__(self, wheel, tick, callback, args):
+        self.wheel = wheel
+        self.tick = tick
+        self.callback = callback
+        self.args = args
+        self.level = None
+        self.slot = None
+
+    def cancel(self):
+        """
+        Cancel the timer, if not fired yet.
+        """
+        if self.slot is not None:
+            self.wheel._remove(self)
+
+
+class TimerWheel:
+    """
+    A hierarchical timing wheel: many timers served by a single event loop callback.
+
+    Time is divided into ticks of `resolution` seconds. The first level has a slot per tick for
+    the next SLOTS ticks, and every further level has a slot per rotation of the level below,
+    SLOTS times coarser. A timer is stored in the slot of its deadline on the finest level that
+    covers it, and is moved down a level when the wheel below completes a rotation into its slot.
+    Scheduling and cancelling are O(1), and each tick only visits the slot of the current tick.
+
+    The wheel only ticks while it holds timers, and skips the ticks of an empty first level up to
+    the next rotation. Timers fire on the first tick at or after their deadline, up to `resolution`
+    seconds late.
+    """
+
+    RESOLUTION = 0.01
+    SLOTS = 256
+    LEVELS = 4
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, resolution=None, slots=None, levels=None):
+        """
+        Initialize a TimerWheel instance.
+
+        Args:
+            loop (asyncio.AbstractEventLoop): The event loop to run the timers on.
+            resolution (float, optional): The duration of a tick in seconds. Defaults to RESOLUTION.
+            slots (int, optional): The number of slots per level. Defaults to SLOTS.
+            levels (int, optional): The number of levels. Defaults to LEVELS.
+        """
+        self._loop = loop
+        self.resolution = resolution or self.RESOLUTION
+        self.slots = slots or self.SLOTS
+        self.levels = levels or self.LEVELS
+
+        self._wheels = [[set() for _ in range(self.slots)] for _ in range(self.levels)]
+        self._counts = [0] * self.levels
+        self._start = self._loop.time()
+        self._tick = 0  # last tick processed
+        self._handle = None
+        self._wakeup = None  # tick the handle fires at
+
+    def __len__(self):
+        return sum(self._counts)
+
+    def _now(self):
+        return math.floor((self._loop.time() - self._start) / self.resolution)
+
+    def _place(self, timer):
+        delta = timer.tick - self._tick
+        level = 0
+        while level < self.levels - 1 and delta >= self.slots ** (level + 1):
+            level += 1
+
+        timer.level = level
+        timer.slot = self._wheels[level][timer.tick // self.slots**level % self.slots]
+        timer.slot.add(timer)
+        self._counts[level] += 1
+
+    def _remove(self, timer):
+        timer.slot.discard(timer)
+        timer.slot = None
+        self._counts[timer.level] -= 1
+
+    def schedule(self, delay, callback, *args) -> Timer:
+        """
+        Call callback(*args) in delay seconds.
+
+        Args:
+            delay (float): The delay in seconds.
+            callback (callable): The function to call.
+
+        Returns:
+            Timer: The timer, to cancel it.
+        """
+        if not len(self):
+            self._tick = self._now()
+
+        tick = max(math.ceil((self._loop.time() - self._start + delay) / self.resolution), self._tick + 1)
+        timer = Timer(self, tick, callback, args)
+        self._place(timer)
+
+        self._schedule()
+        return timer
+
+    def _next_tick(self):
+        if self._counts[0]:
+            return self._tick + 1
+        return (self._tick // self.slots + 1) * self.slots
+
+    def _schedule(self):
+        wakeup = self._next_tick()
+        if self._handle is not None and self._wakeup <= wakeup:
+            return
+
+        if self._handle is not None:
+            self._handle.cancel()
+        self._wakeup = wakeup
+        self._handle = self._loop.call_at(self._start + wakeup * self.resolution, self._advance)
+
+    def _advance(self):
+        self._handle = None
+
+        # the handle fires at the time of its tick, which may round down to the tick before
+        now = max(self._now(), self._wakeup)
+        while self._tick < now and len(self):
+            self._tick = min(self._next_tick(), now)
+
+            # move the timers of the slots reached by the coarser levels down
+            for level in reversed(range(1, self.levels)):
+                if self._tick % self.slots**level:
+                    continue
+                slot = self._wheels[level][self._tick // self.slots**level % self.slots]
+                timers = list(slot)
+                for timer in timers:
+                    self._remove(timer)
+                for timer in timers:
+                    self._place(timer)
+
+            slot = self._wheels[0][self._tick % self.slots]
+            for timer in [timer for timer in slot if timer.tick <= self._tick]:
+                self._remove(timer)
+                self._fire(timer)
+
+        if len(self):
+            self._schedule()
+
+    def _fire(self, timer):
+        try:
+            timer.callback(*timer.args)
+        except Exception as exc:
+            self._loop.call_exception_handler({"message": "Exception in timer callback", "exception": exc})
+
+    def close(self):
+        """
+        Cancel every timer.
+        """
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+        for wheel in self._wheels:
+            for slot in wheel:
+                for timer in slot:
+                    timer.slot = None
+                slot.clear()
+        self._counts = [0] * self.levels
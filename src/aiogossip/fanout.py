@@ -0,0 +1,119 @@
+import collections
+
+
+class FanoutState:
+    __slots__ = ("fanout", "cycles", "received", "duplicates", "missed")
+
+    def __init__(self, fanout, cycles):
+        self.fanout = fanout
+        self.cycles = cycles
+        self.received = 0
+        self.duplicates = 0
+        self.missed = 0
+
+
+class AdaptiveFanout:
+    """
+    Fanout and cycles of push gossip tuned per message class from what this node receives.
+
+    Every WINDOW gossip messages of a class received, the fanout is:
+    - raised if some of them were missed by push gossip and recovered by anti-entropy,
+    - raised if they arrived with fewer than DUPLICATES_LOW duplicates each on average, as the
+      epidemic is then close to dying out before it reaches every node,
+    - lowered if they arrived with more than DUPLICATES_HIGH duplicates each on average.
+    Past the fanout bounds, the cycles are raised or lowered instead, within their own bounds.
+
+    The state of the CLASSES_SIZE most recently used classes is kept, e.g. classes of request
+    topics made unique per request are evicted once unused.
+
+    Attributes:
+        WINDOW (int): The number of messages received between adjustments.
+        DUPLICATES_LOW (float): The average duplicates per message below which fanout is raised.
+        DUPLICATES_HIGH (float): The average duplicates per message above which fanout is lowered.
+        CLASSES_SIZE (int): The maximum number of message classes tracked.
+    """
+
+    WINDOW = 32
+    DUPLICATES_LOW = 1.0
+    DUPLICATES_HIGH = 3.0
+    CLASSES_SIZE = 256
+
+    def __init__(self, fanout=(1, 10), cycles=(1, 10)):
+        """
+        Initialize an AdaptiveFanout instance.
+
+        Args:
+            fanout (tuple, optional): The minimum and maximum fanout. Defaults to (1, 10).
+            cycles (tuple, optional): The minimum and maximum cycles. Defaults to (1, 10).
+        """
+        if not 1 <= fanout[0] <= fanout[1]:
+            raise ValueError(f"Invalid fanout bounds: {fanout}")
+        if not 1 <= cycles[0] <= cycles[1]:
+            raise ValueError(f"Invalid cycles bounds: {cycles}")
+
+        self.fanout_min, self.fanout_max = fanout
+        self.cycles_min, self.cycles_max = cycles
+        self.classes = collections.OrderedDict()  # message class -> FanoutState, least recently used first
+
+    def _state(self, message_class, fanout=None, cycles=None):
+        state = self.classes.get(message_class)
+        if state is not None:
+            self.classes.move_to_end(message_class)
+            return state
+
+        fanout = min(max(fanout or self.fanout_min, self.fanout_min), self.fanout_max)
+        cycles = min(max(cycles or self.cycles_min, self.cycles_min), self.cycles_max)
+        state = self.classes[message_class] = FanoutState(fanout, cycles)
+        if len(self.classes) > self.CLASSES_SIZE:
+            self.classes.popitem(last=False)
+        return state
+
+    def get(self, message_class, fanout=None, cycles=None):
+        """
+        Returns the fanout and cycles of a message class.
+
+        Args:
+            message_class (str): The message class.
+            fanout (int, optional): The initial fanout of a new message class.
+            cycles (int, optional): The initial cycles of a new message class.
+
+        Returns:
+            tuple: The fanout and cycles.
+        """
+        state = self._state(message_class, fanout, cycles)
+        return state.fanout, state.cycles
+
+    def received(self, message_class, duplicate=False, missed=False):
+        """
+        Record a gossip message of a class received.
+
+        Args:
+            message_class (str): The message class.
+            duplicate (bool, optional): The message was received before. Defaults to False.
+            missed (bool, optional): The message was missed by push gossip. Defaults to False.
+        """
+        state = self._state(message_class)
+        if duplicate:
+            state.duplicates += 1
+            return
+
+        state.received += 1
+        state.missed += missed
+        if state.received >= self.WINDOW:
+            self._adjust(state)
+
+    def _adjust(self, state):
+        duplicates = state.duplicates / state.received
+
+        if state.missed or duplicates < self.DUPLICATES_LOW:
+            if state.fanout < self.fanout_max:
+                state.fanout += 1
+            elif state.cycles < self.cycles_max:
+                state.cycles += 1
+        elif duplicates > self.DUPLICATES_HIGH:
+            if state.fanout > self.fanout_min:
+                state.fanout -= 1
+            elif state.cycles > self.cycles_min:
+                state.cycles -= 1
+
+        state.received = state.duplicates = state.missed = 0
@@ -1,12 +1,20 @@
+import asyncio
+import collections
 import logging
 import math
 import sys
 import uuid
 
+from google.protobuf.message import DecodeError
+
 from . import config
-from .concurrency.mutex import mutex
-from .message_pb2 import Message
+from .antientropy import Buckets
+from .concurrency.mutex import Mutex
+from .concurrency.timerwheel import TimerWheel
+from .message_pb2 import Digest, Message
+from .plumtree import Plumtree
 from .topology import Routing, Topology
+from .transport import codec
 
 logger = logging.getLogger(__name__)
 logger.addHandler(logging.StreamHandler(sys.stdout))
@@ -19,11 +27,17 @@ class Gossip:
 
     Attributes:
         FANOUT (int): The default fanout value for the gossip protocol.
+        ENVELOPE_CACHE_SIZE (int): The number of gossip message envelopes to keep encoded.
+        DIGEST_INTERVAL (int): The default interval in seconds between anti-entropy digest exchanges.
+        DIGEST_SIZE (int): The maximum number of message ids exchanged per digest.
     """
 
     FANOUT = 5
+    ENVELOPE_CACHE_SIZE = 1024
+    DIGEST_INTERVAL = 1
+    DIGEST_SIZE = 128
 
-    def __init__(self, transport, fanout=None, peer_id=None):
+    def __init__(self, transport, fanout=None, peer_id=None, mutex=None, plumtree=False, adaptive=None, timers=None):
         """
         Initialize a Gossip instance.
 
@@ -31,6 +45,12 @@ class Gossip:
             transport (Transport): The transport object used for sending and receiving messages.
             fanout (int, optional): The fanout value for the gossip protocol. Defaults to None.
             peer_id (bytes, optional): The ID of the peer. Defaults to None.
+            mutex (Mutex, optional): The cache of gossip message ids already seen. Defaults to None.
+            plumtree (bool, optional): Broadcast gossip messages along a Plumtree instead of pushing
+                them to random peers. Defaults to False.
+            adaptive (AdaptiveFanout, optional): Tune the fanout and cycles per message topic from
+                the duplicates received and the messages recovered by anti-entropy. Defaults to None.
+            timers (TimerWheel, optional): The timer wheel to schedule the Plumtree graft timeouts on.
         """
         self.peer_id = peer_id or uuid.uuid4().bytes
         self.transport = transport
@@ -38,11 +58,27 @@ class Gossip:
         self.routing = Routing(self.topology)
 
         self._fanout = fanout or self.FANOUT
+        self.envelopes = collections.OrderedDict()
+        self.buckets = Buckets()  # summary of the ids of the cached gossip messages
+        self.mutex = mutex or Mutex()
+        self.rx_duplicates = 0
+        self.rx_errors = 0
+        self.tx_failures = 0
+
+        self.timers = timers or TimerWheel(loop=self.transport._loop)
+        self.plumtree = Plumtree(self) if plumtree else None
+
+        self.adaptive = adaptive
+        self.pulled = collections.OrderedDict()  # ids of gossip messages pulled by anti-entropy
+
+        self.members = None  # Members notified of the nodes joining the topology
 
     async def close(self):
         """
         Close the Gossip instance and the associated transport.
         """
+        if self.plumtree:
+            await self.plumtree.close()
         self.transport.close()
 
     @property
@@ -59,7 +95,17 @@ class Gossip:
 
         return math.ceil(math.log(len(self.topology), self.fanout))
 
-    async def send(self, message, peer_id):
+    def _fanout_cycles(self, message):
+        """
+        Returns the fanout and cycles to push a gossip message with, tuned for its topic if adaptive.
+        """
+        if self.adaptive is None:
+            return self.fanout, self.cycles
+
+        fanout, cycles = self.adaptive.get(message.topic, fanout=self.fanout, cycles=self.cycles)
+        return min(fanout, len(self.topology)), cycles
+
+    def _route(self, message, peer_id):
         if not message.id:
             raise ValueError("message id is required:", message)
 
@@ -72,12 +118,12 @@ class Gossip:
         if not message.routing.dst_id:
             raise ValueError("message routing.dst_id is required:", message)
 
-        msg = Message()
-        msg.CopyFrom(message)
-
         next_peer_id, next_peer_addr = self.topology.get_next_peer(peer_id)
-        msg = self.routing.set_send_route(msg, next_peer_id, next_peer_addr)
+        msg = self.routing.set_send_route(message, next_peer_id, next_peer_addr)
+        return msg, next_peer_addr
 
+    async def send(self, message, peer_id):
+        msg, next_peer_addr = self._route(message, peer_id)
         await self.transport.send(msg, next_peer_addr)
         return msg.id
 
@@ -92,10 +138,7 @@ class Gossip:
         return await self.send(msg, peer_id)
 
     async def send_forward(self, message):
-        msg = Message()
-        msg.CopyFrom(message)
-
-        return await self.send(msg, message.routing.dst_id)
+        return await self.send(message, message.routing.dst_id)
 
     async def send_ack(self, message):
         if message.Kind.SYN not in message.kind:
@@ -110,15 +153,52 @@ class Gossip:
 
         return await self.send(msg, message.routing.src_id)
 
-    async def send_gossip(self, message):
-        msg = Message()
-        msg.CopyFrom(message)
+    def _envelope(self, message):
+        """
+        Returns an envelope of a gossip message to be routed.
 
-        if not msg.id:
-            msg.id = uuid.uuid4().bytes
+        The head (id, kind, topic, payload) of a gossip message is encoded, and its payload compressed
+        if the transport compresses, once per message id and cached, so every envelope of the message
+        shares it and only differs in routing.
+        """
+        envelope = self.envelopes.get(message.id)
+        if envelope is not None:
+            self.envelopes.move_to_end(message.id)
+        else:
+            envelope = codec.Envelope()
+            if isinstance(message, codec.Envelope):
+                envelope.CopyFrom(message)
+            else:
+                algorithm, threshold = self.transport.compression, self.transport.COMPRESSION_THRESHOLD
+                dictionaries = self.transport.dictionaries
+                envelope.MergeFromString(
+                    codec.encode(message, algorithm=algorithm, threshold=threshold, dictionaries=dictionaries)
+                )
+            envelope.routing.Clear()
+
+            fields = Message()
+            if not envelope.id:
+                fields.id = uuid.uuid4().bytes
+            if Message.Kind.GOSSIP not in envelope.kind:
+                fields.kind.append(Message.Kind.GOSSIP)
+            if fields.ListFields():
+                envelope.MergeFromString(codec.encode(fields))
+
+            self.envelopes[envelope.id] = envelope
+            if Message.Kind.HANDSHAKE not in envelope.kind:
+                self.buckets.add(envelope.id)
+            if len(self.envelopes) > self.ENVELOPE_CACHE_SIZE:
+                _, evicted = self.envelopes.popitem(last=False)
+                if Message.Kind.HANDSHAKE not in evicted.kind:
+                    self.buckets.remove(evicted.id)
+
+        msg = codec.Envelope()
+        msg.CopyFrom(envelope)
+        msg.routing.CopyFrom(message.routing)
+        return msg
 
-        if Message.Kind.GOSSIP not in msg.kind:
-            msg.kind.append(Message.Kind.GOSSIP)
+    async def send_gossip(self, message):
+        msg = self._envelope(message)
 
         if not msg.routing.src_id:
             msg.routing.src_id = self.peer_id
@@ -127,22 +207,60 @@ class Gossip:
         gossip_ignore = set([self.peer_id])
         gossip_ignore.update([r.route_id for r in msg.routing.routes])
 
-        @mutex(self, msg.id)
+        @self.mutex(msg.id)
         async def multicast():
+            fanout, cycles = self._fanout_cycles(msg)
             cycle = 0
-            while cycle < self.cycles:
-                peer_ids = self.topology.sample(self.fanout, ignore=gossip_ignore)
-                for peer_id in peer_ids:
-                    m = Message()
-                    m.CopyFrom(msg)
-                    m.routing.dst_id = peer_id
-                    messages.add(await self.send(m, peer_id))
+            while cycle < cycles:
+                peer_ids = self.topology.sample(fanout, ignore=gossip_ignore)
+                messages.update(await self._send_many(msg, peer_ids))
                 gossip_ignore.update(peer_ids)
                 cycle += 1
 
-        await multicast()
+        @self.mutex(msg.id)
+        async def broadcast():
+            eager, lazy = self.plumtree.peers(ignore=gossip_ignore)
+            messages.update(await self._send_many(msg, eager))
+
+            ihave = Message()
+            ihave.id = msg.id
+            ihave.kind.append(Message.Kind.IHAVE)
+            ihave.routing.src_id = self.peer_id
+            await self._send_many(ihave, lazy)
+
+        if self.plumtree:
+            await broadcast()
+        else:
+            await multicast()
         return list(messages)
 
+    async def _send_many(self, message, peer_ids):
+        """
+        Send a message to every peer as one batch. A peer that cannot be reached is skipped and
+        does not affect the others.
+
+        Returns:
+            list: The ids of the messages routed.
+        """
+        msgs, addrs = [], []
+        for peer_id in peer_ids:
+            message.routing.dst_id = peer_id
+            try:
+                msg, addr = self._route(message, peer_id)
+            except ValueError as exc:
+                self.tx_failures += 1
+                logger.debug(f"DEBUG: {peer_id} route error: {exc}")
+                continue
+            msgs.append(msg)
+            addrs.append(addr)
+
+        exceptions = await self.transport.send_many(msgs, addrs, return_exceptions=True)
+        for addr, exc in zip(addrs, exceptions):
+            if exc is not None:
+                self.tx_failures += 1
+                logger.debug(f"DEBUG: {addr} send error: {exc}")
+        return [msg.id for msg in msgs]
+
     async def send_gossip_handshake(self):
         msg = Message()
         msg.id = uuid.uuid4().bytes
@@ -152,21 +270,178 @@ class Gossip:
 
         return await self.send_gossip(msg)
 
+    async def send_control(self, kind, message_id, peer_id, peer_addr=None):
+        """
+        Send a Plumtree control message (IHAVE, GRAFT or PRUNE) about a gossip message to a peer,
+        directly to peer_addr if given instead of routing it through the topology.
+        """
+        msg = Message()
+        msg.id = message_id
+        msg.kind.append(kind)
+        msg.routing.src_id = self.peer_id
+        msg.routing.dst_id = peer_id
+        if peer_addr is None:
+            return await self.send(msg, peer_id)
+
+        msg = self.routing.set_send_route(msg, peer_id, peer_addr)
+        await self.transport.send(msg, peer_addr)
+        return msg.id
+
+    # Anti-entropy #
+
+    def _digest_ids(self, buckets):
+        ids = []
+        for message_id, envelope in self.envelopes.items():
+            if Message.Kind.HANDSHAKE not in envelope.kind and self.buckets.bucket(message_id) in buckets:
+                ids.append(message_id)
+        return ids
+
+    async def _send_digest(self, peer_id, kinds, digest, message_id=None):
+        msg = Message()
+        msg.id = message_id or uuid.uuid4().bytes
+        msg.kind.extend(kinds)
+        msg.routing.src_id = self.peer_id
+        msg.routing.dst_id = peer_id
+        msg.payload = digest.SerializeToString()
+        return await self.send(msg, peer_id)
+
+    async def _send_envelope(self, message_id, peer_id):
+        msg = codec.Envelope()
+        msg.CopyFrom(self.envelopes[message_id])
+        msg.routing.src_id = self.peer_id
+        msg.routing.dst_id = peer_id
+        return await self.send(msg, peer_id)
+
+    async def _pull(self, peer_id, ids):
+        missing = [i for i in ids if i not in self.envelopes and i not in self.mutex]
+        if missing:
+            missing = missing[: self.DIGEST_SIZE]
+            for message_id in missing:
+                self.pulled[message_id] = None
+            while len(self.pulled) > self.ENVELOPE_CACHE_SIZE:
+                self.pulled.popitem(last=False)
+            digest = Digest(ids=missing)
+            await self._send_digest(peer_id, [Message.Kind.DIGEST, Message.Kind.PULL], digest)
+
+    async def send_digest(self, peer_id):
+        """
+        Start a push-pull anti-entropy exchange of the cached gossip messages with a peer.
+
+        The peer replies with its ids of the buckets that differ, then the ids the peer is missing
+        are offered to it and the messages missing here are pulled from it. Each side pulls only
+        the messages it has not seen yet.
+        """
+        digest = Digest(buckets=self.buckets.sums)
+        return await self._send_digest(peer_id, [Message.Kind.DIGEST, Message.Kind.SYN], digest)
+
+    async def recv_digest(self, message):
+        peer_id = message.routing.src_id
+        try:
+            digest = Digest.FromString(message.payload)
+        except DecodeError as exc:
+            self.rx_errors += 1
+            logger.debug(f"DEBUG: {peer_id} digest decode error: {exc}")
+            return
+
+        if Message.Kind.PULL in message.kind:
+            for message_id in digest.ids[: self.DIGEST_SIZE]:
+                if message_id in self.envelopes:
+                    await self._send_envelope(message_id, peer_id)
+            return
+
+        if Message.Kind.IHAVE in message.kind:
+            await self._pull(peer_id, digest.ids)
+            return
+
+        buckets = self.buckets.diff(digest.buckets)
+        if not buckets:
+            return
+
+        ids = self._digest_ids(buckets)
+        if Message.Kind.SYN in message.kind:
+            digest = Digest(buckets=self.buckets.sums, ids=ids[: self.DIGEST_SIZE])
+            kinds = [Message.Kind.DIGEST, Message.Kind.ACK]
+            await self._send_digest(peer_id, kinds, digest, message_id=message.id)
+            return
+
+        # offer the messages the peer may be missing, it pulls the ones it has not seen
+        peer_ids = set(digest.ids)
+        offered = [message_id for message_id in ids if message_id not in peer_ids]
+        if offered:
+            offer = Digest(ids=offered[: self.DIGEST_SIZE])
+            await self._send_digest(peer_id, [Message.Kind.DIGEST, Message.Kind.IHAVE], offer)
+
+        # pull the messages missing here
+        await self._pull(peer_id, digest.ids)
+
+    async def anti_entropy(self, interval=None):
+        """
+        Exchange digests with a random peer every interval seconds, forever.
+
+        Args:
+            interval (int, optional): The interval in seconds. Defaults to DIGEST_INTERVAL.
+        """
+        while True:
+            await asyncio.sleep(interval or self.DIGEST_INTERVAL)
+            for peer_id in self.topology.sample(1, ignore=[self.peer_id]):
+                try:
+                    await self.send_digest(peer_id)
+                except ValueError as exc:
+                    logger.debug(f"DEBUG: {peer_id} digest error: {exc}")
+
     async def recv(self):
         while True:
-            msg, peer_addr = await self.transport.recv()
+            # messages are decoded lazily: forwarded messages are re-routed without parsing the payload
+            try:
+                msg, peer_addr = await self.transport.recv(lazy=True)
+            except DecodeError as exc:
+                self.rx_errors += 1
+                logger.debug(f"DEBUG: {self.peer_id} decode error: {exc}")
+                continue
+
+            # drop gossip messages already seen, before any routing work
+            if Message.Kind.GOSSIP in msg.kind and msg.routing.dst_id == self.peer_id and msg.id in self.mutex:
+                self.rx_duplicates += 1
+                if self.adaptive:
+                    self.adaptive.received(msg.topic, duplicate=True)
+                if self.plumtree:
+                    # the sender may not be routable yet, reply to the address the duplicate came from
+                    await self.plumtree.prune(msg.id, msg.routing.routes[-2].route_id, peer_addr)
+                continue
+
             peer_id = msg.routing.routes[-1].route_id
             msg = self.routing.set_recv_route(msg, peer_id, peer_addr)
 
             route_ids = self.topology.update(msg.routing.routes)
             for route_id in route_ids:
                 await self.send_handshake(route_id)
+            if route_ids and self.members is not None:
+                self.members.join(route_ids)
 
             # forward message to destination
             if self.peer_id != msg.routing.dst_id:
                 await self.send_forward(msg)
                 continue
 
+            try:
+                envelope, msg = msg, msg.to_message(self.transport.dictionaries, self.transport.MESSAGE_SIZE)
+            except DecodeError as exc:
+                # e.g. compressed with a dictionary or an algorithm not available on this peer
+                self.rx_errors += 1
+                logger.debug(f"DEBUG: {peer_addr} decode error: {exc}")
+                continue
+
+            # anti-entropy message
+            if Message.Kind.DIGEST in msg.kind:
+                await self.recv_digest(msg)
+                continue
+
+            # plumtree message
+            if {Message.Kind.IHAVE, Message.Kind.GRAFT, Message.Kind.PRUNE}.intersection(msg.kind):
+                if self.plumtree:
+                    await self.plumtree.recv(msg)
+                continue
+
             # ack message
             if Message.Kind.ACK in msg.kind:
                 yield msg
@@ -178,7 +453,12 @@ class Gossip:
 
             # gossip message
             if Message.Kind.GOSSIP in msg.kind:
-                await self.send_gossip(msg)
+                if self.plumtree:
+                    self.plumtree.deliver(msg.id, msg.routing.routes[-2].route_id)
+                if self.adaptive and msg.id not in self.mutex:
+                    self.adaptive.received(msg.topic, missed=msg.id in self.pulled)
+                    self.pulled.pop(msg.id, None)
+                await self.send_gossip(envelope)
 
             # handshake message
             if Message.Kind.HANDSHAKE in msg.kind:
@@ -1,10 +1,17 @@
 import asyncio
+import ipaddress
 import logging
+import math
+import random
 import sys
+import uuid
+
+from google.protobuf.message import DecodeError
 
 from . import config
 from .concurrency import TaskManager
-from .message_pb2 import Message
+from .message_pb2 import Member, Membership, Message
+from .transport.address import Address
 
 logger = logging.getLogger(__name__)
 logger.addHandler(logging.StreamHandler(sys.stdout))
@@ -12,56 +19,374 @@ if config.DEBUG:
     logger.setLevel(logging.DEBUG)  # pragma: no cover
 
 
+def format_addr(addr):
+    """
+    Returns the address of a member as disseminated, empty if not reachable from other hosts.
+    """
+    if addr is None or addr.ip.is_loopback or addr.ip.is_unspecified:
+        return ""
+    return str(addr)
+
+
+def parse_member_addr(addr):
+    """
+    Returns the Address of a disseminated address, None if invalid or not reachable from other hosts.
+    """
+    try:
+        ip, port = addr.rsplit(":", 1)
+        addr = Address(ipaddress.ip_address(ip), int(port))
+    except ValueError:
+        return None
+    return addr if format_addr(addr) else None
+
+
 class Members:
-    SCHEDULER_INTERVAL = 5
+    """
+    SWIM failure detector and membership of the peers in the topology.
+
+    A single probe loop pings one member per protocol period, in a shuffled round-robin order.
+    A member that does not acknowledge within PING_TIMEOUT is pinged indirectly through
+    PING_REQ_HELPERS random neighbors, and is suspected if none of them gets an acknowledgement
+    before the end of the period. A suspected member that does not refute the suspicion, with a
+    higher incarnation, within SUSPECT_TIMEOUT is declared dead and marked unreachable.
+
+    Membership events (join, suspect, dead, address change) are kept in a buffer of the
+    EVENTS_SIZE most recent ones, and piggybacked in the free space of every datagram sent by the
+    transport, gossip and probes alike, each one RETRANSMIT_MULTIPLIER * log(N) times. Events
+    spread with the existing traffic, so the membership converges without any extra datagram.
+    Loopback and unspecified addresses are never disseminated. The address of an event only
+    updates the address of a node already in the topology, edges are set by the handshakes and
+    the routes observed.
+    """
+
+    TOPIC = "members"
 
-    PING_INTERVAL = 15
-    PING_TIMEOUT = 5
+    PROTOCOL_PERIOD = 1
+    PING_TIMEOUT = 0.3
+    PING_REQ_HELPERS = 3
+    SUSPECT_TIMEOUT = 5
+
+    RETRANSMIT_MULTIPLIER = 3
+    EVENTS_SIZE = 64
 
     def __init__(self, peer):
         self.peer = peer
+        self.incarnation = 0
+
+        self.members = {}  # peer id -> Member
+        self.events = {}  # peer id -> transmissions left of its latest event
+        self.addr = format_addr(self.peer.node.node_addr)  # address disseminated for this node
+        self.targets = []  # peer ids left to probe in this round
+
+        self.acks = {}  # probe message id -> future of its acknowledgement
+        self.relays = {}  # probe message id -> (peer id, message id) of the ping request relayed
+        self.suspicions = {}  # peer id -> timer of its suspicion
 
         self.task_manager = TaskManager(loop=self.peer._loop)
         self.task_manager.create_task(self.scheduler())
 
-        self.peer.response("keepalive:*")(self.pong)
+        self.peer.broker.subscribe(self.TOPIC, self.recv)
+        self.peer.gossip.members = self
+        self.peer.transport.piggyback = self
+
+        # announce this node
+        self._disseminate(self._member(self.peer.peer_id))
+
+    @property
+    def topology(self):
+        return self.peer.gossip.topology
+
+    # Membership #
+
+    def _member(self, peer_id):
+        if peer_id == self.peer.peer_id:
+            return Member(peer_id=peer_id, incarnation=self.incarnation, addr=self.addr)
+        return self.members[peer_id]
+
+    def _state(self, peer_id):
+        member = self.members.get(peer_id)
+        return Member.State.ALIVE if member is None else member.state
+
+    def _override(self, member):
+        """
+        Returns whether an update overrides the known state of a member, by incarnation and state.
+        """
+        current = self.members.get(member.peer_id)
+        if current is None:
+            return True
+        if member.state == Member.State.DEAD:
+            return current.state != Member.State.DEAD or member.incarnation > current.incarnation
+        if current.state == Member.State.DEAD:
+            return member.incarnation > current.incarnation
+        if member.state == Member.State.SUSPECT:
+            return member.incarnation > current.incarnation or (
+                member.incarnation == current.incarnation and current.state == Member.State.ALIVE
+            )
+        return member.incarnation > current.incarnation
+
+    def update(self, member):
+        """
+        Apply a membership update, and disseminate it if it changes the known state of the member.
+
+        Args:
+            member (Member): The update.
+
+        Returns:
+            bool: True if the update was applied.
+        """
+        if member.peer_id == self.peer.peer_id:
+            # refute a suspicion or death of this node
+            if member.state != Member.State.ALIVE and member.incarnation >= self.incarnation:
+                self.incarnation = member.incarnation + 1
+                self._disseminate(self._member(self.peer.peer_id))
+            return False
+
+        if not self._override(member):
+            return False
+
+        current = self.members.get(member.peer_id)
+        self.members[member.peer_id] = Member()
+        self.members[member.peer_id].CopyFrom(member)
+        if not member.addr and current is not None:
+            self.members[member.peer_id].addr = current.addr
+
+        if current is None:
+            logger.debug(f"Node joined: {member.peer_id}")
+
+        addr = parse_member_addr(member.addr)
+        if addr is not None and member.state != Member.State.DEAD and member.peer_id in self.topology:
+            if current is not None and current.addr != member.addr:
+                self.topology.create_node_addr(member.peer_id, addr)
+                logger.debug(f"Node address changed: {member.peer_id} {addr}")
+
+        self._disseminate(self.members[member.peer_id])
+
+        timer = self.suspicions.pop(member.peer_id, None)
+        if timer is not None:
+            timer.cancel()
+
+        if member.state == Member.State.SUSPECT:
+            timer = self.peer.timers.schedule(self.SUSPECT_TIMEOUT, self._suspect_timeout, member.peer_id)
+            self.suspicions[member.peer_id] = timer
+
+        if member.peer_id in self.topology:
+            if member.state == Member.State.DEAD:
+                self.topology.mark_unreachable(member.peer_id)
+                logger.debug(f"Node is unreachable: {member.peer_id}")
+            else:
+                self.topology.mark_reachable(member.peer_id)
+                logger.debug(f"Node is reachable: {member.peer_id}")
+        return True
+
+    def _suspect_timeout(self, peer_id):
+        self.suspicions.pop(peer_id, None)
+        member = self.members[peer_id]
+        self.update(Member(peer_id=peer_id, state=Member.State.DEAD, incarnation=member.incarnation))
+
+    def _change(self, peer_id, state):
+        member = self.members.get(peer_id)
+        incarnation = member.incarnation if member else 0
+        self.update(Member(peer_id=peer_id, state=state, incarnation=incarnation))
+
+    def join(self, peer_ids):
+        """
+        Disseminate the join of nodes first seen in the topology.
+
+        Args:
+            peer_ids (iterable): The IDs of the nodes.
+        """
+        for peer_id in peer_ids:
+            if peer_id == self.peer.peer_id or peer_id in self.members:
+                continue
+            addrs = self.topology.node_addrs(peer_id)
+            addr = next(filter(None, (format_addr(addrs.get(t)) for t in ("lan", "wan"))), "")
+            self.update(Member(peer_id=peer_id, addr=addr))
+
+    # Dissemination #
+
+    def _disseminate(self, member):
+        if member.peer_id not in self.events and len(self.events) >= self.EVENTS_SIZE:
+            # evict the event closest to the end of its dissemination
+            del self.events[min(self.events, key=self.events.get)]
+        self.events[member.peer_id] = self.RETRANSMIT_MULTIPLIER * math.ceil(math.log2(len(self.topology) + 1))
+
+    def pack(self, size):
+        """
+        Returns the most recent events fitting in size bytes, serialized as a Membership.
+
+        Args:
+            size (int): The free space of the datagram, in bytes.
+
+        Returns:
+            bytes: The serialized Membership, empty if no event fits.
+        """
+        if not self.events or size <= 0:
+            return b""
+
+        membership = Membership()
+        for peer_id in sorted(self.events, key=self.events.get, reverse=True):
+            member = self._member(peer_id)
+            member_size = member.ByteSize()
+            # a member field is a tag and a length prefix besides the member itself
+            size -= member_size + 2 + (member_size > 127)
+            if size < 0:
+                break
+            membership.members.append(member)
+
+            if self.events[peer_id] > 1:
+                self.events[peer_id] -= 1
+            else:
+                del self.events[peer_id]
+        return membership.SerializeToString()
+
+    def unpack(self, data, addr):
+        """
+        Apply the events piggybacked on a datagram.
+
+        Args:
+            data (bytes): The serialized Membership.
+            addr (Address): The address the datagram was received from.
+        """
+        try:
+            membership = Membership.FromString(data)
+        except DecodeError as exc:
+            logger.debug(f"DEBUG: {addr} piggyback error: {exc}")
+            return
+
+        for member in membership.members:
+            self.update(member)
+
+    # Probe #
+
+    def _next_target(self):
+        while self.targets:
+            peer_id = self.targets.pop()
+            if peer_id in self.topology and self._state(peer_id) != Member.State.DEAD:
+                return peer_id
+
+        self.targets = [n for n in self.peer.nodes if n != self.peer.peer_id and self._state(n) != Member.State.DEAD]
+        random.shuffle(self.targets)
+        return self.targets.pop() if self.targets else None
+
+    async def _send(self, peer_id, kinds, message_id=None, target_id=None):
+        message = Message()
+        message.id = message_id or uuid.uuid4().bytes
+        message.kind.extend(kinds)
+        message.routing.src_id = self.peer.peer_id
+        message.routing.dst_id = peer_id
+        message.topic = self.TOPIC
+
+        if target_id:
+            message.payload = Membership(target_id=target_id).SerializeToString()
+
+        try:
+            await self.peer.gossip.send(message, peer_id)
+        except ValueError as exc:
+            logger.debug(f"DEBUG: {peer_id} ping error: {exc}")
+        return message.id
+
+    async def _ping(self, peer_id, message_id=None):
+        return await self._send(peer_id, [Message.Kind.PING], message_id=message_id)
+
+    async def _wait_ack(self, ack, timeout):
+        try:
+            async with asyncio.timeout(timeout):
+                await asyncio.shield(ack)
+        except asyncio.TimeoutError:
+            pass
+        return ack.done()
+
+    async def probe(self, peer_id):
+        """
+        Probe a member directly, then indirectly through helpers, and suspect it if it does not
+        acknowledge before the end of the protocol period.
+
+        Args:
+            peer_id (bytes): The ID of the member.
+
+        Returns:
+            bool: True if the member acknowledged.
+        """
+        message_id = uuid.uuid4().bytes
+        ack = self.acks[message_id] = self.peer._loop.create_future()
+        try:
+            await self._ping(peer_id, message_id=message_id)
+            if await self._wait_ack(ack, self.PING_TIMEOUT):
+                return True
+
+            helpers = self.topology.sample(self.PING_REQ_HELPERS, ignore=[self.peer.peer_id, peer_id])
+            for helper_id in helpers:
+                await self._send(helper_id, [Message.Kind.PING, Message.Kind.PING_REQ], message_id, peer_id)
+            if await self._wait_ack(ack, self.PROTOCOL_PERIOD - self.PING_TIMEOUT):
+                return True
+        finally:
+            del self.acks[message_id]
+
+        if self._state(peer_id) == Member.State.ALIVE:
+            self._change(peer_id, Member.State.SUSPECT)
+            logger.debug(f"Node is suspected: {peer_id}")
+        return False
 
     async def scheduler(self):
         while True:
-            for node in self.peer.nodes:
-                if node == self.peer.peer_id:
-                    continue
+            start = self.peer._loop.time()
 
-                if node not in self.task_manager:
-                    self.task_manager.create_task(self.ping(node), name=node)
+            addr = format_addr(self.peer.node.node_addr)
+            if addr != self.addr:
+                self.addr = addr
+                self.incarnation += 1
+                self._disseminate(self._member(self.peer.peer_id))
 
-            await asyncio.sleep(self.SCHEDULER_INTERVAL)
+            peer_id = self._next_target()
+            if peer_id is not None:
+                await self.probe(peer_id)
 
-    async def ping(self, peer_id):
-        while True:
-            topic = "keepalive"
-            message = Message()
-            message.routing.src_id = self.peer.peer_id
-            message.routing.dst_id = peer_id
-
-            response = await self.peer.request(topic, message, peers=[peer_id], timeout=self.PING_TIMEOUT)
-            responses = []
-            async for r in response:
-                responses.append(r)
-
-            if len(responses):
-                self.peer.gossip.topology.mark_reachable(peer_id)
-                logger.debug(f"Node is reachable: {peer_id}")
-            else:
-                self.peer.gossip.topology.mark_unreachable(peer_id)
-                logger.debug(f"Node is unreachable: {peer_id}")
+            await asyncio.sleep(max(0, self.PROTOCOL_PERIOD - (self.peer._loop.time() - start)))
+
+    async def recv(self, message):
+        # e.g. a message published on the members topic
+        if Message.Kind.PING not in message.kind:
+            return
+
+        peer_id = message.routing.src_id
+        try:
+            membership = Membership.FromString(message.payload)
+        except DecodeError as exc:
+            logger.debug(f"DEBUG: {peer_id} membership error: {exc}")
+            return
+
+        if Message.Kind.ACK in message.kind:
+            relay = self.relays.pop(message.id, None)
+            if relay is not None:
+                relay[1].cancel()
+                await self._send(relay[0][0], [Message.Kind.PING, Message.Kind.ACK], relay[0][1])
+                return
+
+            ack = self.acks.get(message.id)
+            if ack is not None and not ack.done():
+                ack.set_result(message)
+            return
 
-            await asyncio.sleep(self.PING_INTERVAL)
+        if Message.Kind.PING_REQ in message.kind:
+            message_id = uuid.uuid4().bytes
+            timer = self.peer.timers.schedule(self.PROTOCOL_PERIOD, self.relays.pop, message_id, None)
+            self.relays[message_id] = ((peer_id, message.id), timer)
+            await self._ping(membership.target_id, message_id=message_id)
+            return
 
-    async def pong(self, message):
-        return Message()
+        await self._send(peer_id, [Message.Kind.PING, Message.Kind.ACK], message.id)
 
     async def close(self):
+        for timer in self.suspicions.values():
+            timer.cancel()
+        for _, timer in self.relays.values():
+            timer.cancel()
+        self.suspicions.clear()
+        self.relays.clear()
+        if self.peer.transport.piggyback is self:
+            self.peer.transport.piggyback = None
+        if self.peer.gossip.members is self:
+            self.peer.gossip.members = None
         await self.task_manager.close()
 
     def print_topology(self, *args, **kwargs):
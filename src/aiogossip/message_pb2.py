@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
 # Generated by the protocol buffer compiler.  DO NOT EDIT!
 # source: message.proto
-# Protobuf Python Version: 4.25.1
+# Protobuf Python Version: 4.25.0
 """Generated protocol buffer code."""
 from google.protobuf import descriptor as _descriptor
 from google.protobuf import descriptor_pool as _descriptor_pool
@@ -14,7 +14,7 @@ _sym_db = _symbol_database.Default()
 
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\rmessage.proto\"J\n\x05Route\x12\x10\n\x08route_id\x18\x01 \x01(\x0c\x12\x11\n\ttimestamp\x18\x02 \x01(\x03\x12\r\n\x05saddr\x18\x03 \x01(\t\x12\r\n\x05\x64\x61\x64\x64r\x18\x04 \x01(\t\"\x91\x02\n\x07Message\x12\n\n\x02id\x18\x01 \x01(\x0c\x12\x1b\n\x04kind\x18\x02 \x03(\x0e\x32\r.Message.Kind\x12!\n\x07routing\x18\x03 \x01(\x0b\x32\x10.Message.Routing\x12\r\n\x05topic\x18\x04 \x01(\t\x12\x0f\n\x07payload\x18\x05 \x01(\x0c\x1a\x41\n\x07Routing\x12\x0e\n\x06src_id\x18\x01 \x01(\x0c\x12\x0e\n\x06\x64st_id\x18\x02 \x01(\x0c\x12\x16\n\x06routes\x18\x03 \x03(\x0b\x32\x06.Route\"W\n\x04Kind\x12\r\n\tHANDSHAKE\x10\x00\x12\n\n\x06GOSSIP\x10\x01\x12\x07\n\x03SYN\x10\x02\x12\x07\n\x03\x41\x43K\x10\x03\x12\x07\n\x03PUB\x10\x04\x12\x07\n\x03SUB\x10\x05\x12\x07\n\x03REQ\x10\x06\x12\x07\n\x03RES\x10\x07\x62\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\rmessage.proto\"J\n\x05Route\x12\x10\n\x08route_id\x18\x01 \x01(\x0c\x12\x11\n\ttimestamp\x18\x02 \x01(\x03\x12\r\n\x05saddr\x18\x03 \x01(\t\x12\r\n\x05\x64\x61\x64\x64r\x18\x04 \x01(\t\"\x96\x04\n\x07Message\x12\n\n\x02id\x18\x01 \x01(\x0c\x12\x1b\n\x04kind\x18\x02 \x03(\x0e\x32\r.Message.Kind\x12!\n\x07routing\x18\x03 \x01(\x0b\x32\x10.Message.Routing\x12\r\n\x05topic\x18\x04 \x01(\t\x12\x0f\n\x07payload\x18\x05 \x01(\x0c\x12\r\n\x05\x62\x61tch\x18\x06 \x03(\x0c\x12\x1b\n\x08\x66ragment\x18\x07 \x01(\x0b\x32\t.Fragment\x12)\n\x0b\x63ompression\x18\x08 \x01(\x0e\x32\x14.Message.Compression\x12\x12\n\ndictionary\x18\t \x01(\x07\x12\x11\n\tpiggyback\x18\n \x01(\x0c\x1a\x41\n\x07Routing\x12\x0e\n\x06src_id\x18\x01 \x01(\x0c\x12\x0e\n\x06\x64st_id\x18\x02 \x01(\x0c\x12\x16\n\x06routes\x18\x03 \x03(\x0b\x32\x06.Route\"\xa6\x01\n\x04Kind\x12\r\n\tHANDSHAKE\x10\x00\x12\n\n\x06GOSSIP\x10\x01\x12\x07\n\x03SYN\x10\x02\x12\x07\n\x03\x41\x43K\x10\x03\x12\x07\n\x03PUB\x10\x04\x12\x07\n\x03SUB\x10\x05\x12\x07\n\x03REQ\x10\x06\x12\x07\n\x03RES\x10\x07\x12\n\n\x06\x44IGEST\x10\x08\x12\x08\n\x04PULL\x10\t\x12\t\n\x05IHAVE\x10\n\x12\t\n\x05GRAFT\x10\x0b\x12\t\n\x05PRUNE\x10\x0c\x12\x08\n\x04PING\x10\r\x12\x0c\n\x08PING_REQ\x10\x0e\"5\n\x0b\x43ompression\x12\x08\n\x04NONE\x10\x00\x12\x08\n\x04ZLIB\x10\x01\x12\x08\n\x04LZMA\x10\x02\x12\x08\n\x04ZSTD\x10\x03\"S\n\x08\x46ragment\x12\n\n\x02id\x18\x01 \x01(\x0c\x12\r\n\x05index\x18\x02 \x01(\r\x12\r\n\x05\x63ount\x18\x03 \x01(\r\x12\x0c\n\x04\x64\x61ta\x18\x04 \x01(\x0c\x12\x0f\n\x07missing\x18\x05 \x03(\r\"&\n\x06\x44igest\x12\x0f\n\x07\x62uckets\x18\x01 \x03(\x06\x12\x0b\n\x03ids\x18\x02 \x03(\x0c\"\x85\x01\n\x06Member\x12\x0f\n\x07peer_id\x18\x01 \x01(\x0c\x12\x1c\n\x05state\x18\x02 \x01(\x0e\x32\r.Member.State\x12\x13\n\x0bincarnation\x18\x03 \x01(\x04\x12\x0c\n\x04\x61\x64\x64r\x18\x04 \x01(\t\")\n\x05State\x12\t\n\x05\x41LIVE\x10\x00\x12\x0b\n\x07SUSPECT\x10\x01\x12\x08\n\x04\x44\x45\x41\x44\x10\x02\"9\n\nMembership\x12\x11\n\ttarget_id\x18\x01 \x01(\x0c\x12\x18\n\x07members\x18\x02 \x03(\x0b\x32\x07.Memberb\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
@@ -24,9 +24,21 @@ if _descriptor._USE_C_DESCRIPTORS == False:
   _globals['_ROUTE']._serialized_start=17
   _globals['_ROUTE']._serialized_end=91
   _globals['_MESSAGE']._serialized_start=94
-  _globals['_MESSAGE']._serialized_end=367
-  _globals['_MESSAGE_ROUTING']._serialized_start=213
-  _globals['_MESSAGE_ROUTING']._serialized_end=278
-  _globals['_MESSAGE_KIND']._serialized_start=280
-  _globals['_MESSAGE_KIND']._serialized_end=367
+  _globals['_MESSAGE']._serialized_end=628
+  _globals['_MESSAGE_ROUTING']._serialized_start=339
+  _globals['_MESSAGE_ROUTING']._serialized_end=404
+  _globals['_MESSAGE_KIND']._serialized_start=407
+  _globals['_MESSAGE_KIND']._serialized_end=573
+  _globals['_MESSAGE_COMPRESSION']._serialized_start=575
+  _globals['_MESSAGE_COMPRESSION']._serialized_end=628
+  _globals['_FRAGMENT']._serialized_start=630
+  _globals['_FRAGMENT']._serialized_end=713
+  _globals['_DIGEST']._serialized_start=715
+  _globals['_DIGEST']._serialized_end=753
+  _globals['_MEMBER']._serialized_start=756
+  _globals['_MEMBER']._serialized_end=889
+  _globals['_MEMBER_STATE']._serialized_start=848
+  _globals['_MEMBER_STATE']._serialized_end=889
+  _globals['_MEMBERSHIP']._serialized_start=891
+  _globals['_MEMBERSHIP']._serialized_end=948
 # @@protoc_insertion_point(module_scope)
@@ -4,7 +4,7 @@ import uuid
 
 from . import config
 from .broker import Broker
-from .concurrency import TaskManager
+from .concurrency import TaskManager, TimerWheel
 from .debug import debug
 from .gossip import Gossip
 from .members import Members
@@ -21,6 +21,10 @@ class Peer:
         port=0,
         fanout=None,
         peer_id=None,
+        anti_entropy=False,
+        plumtree=False,
+        coalesce=False,
+        compression=None,
         loop: asyncio.AbstractEventLoop = None,
     ):
         self._loop = loop or asyncio.get_event_loop()
@@ -30,12 +34,15 @@ class Peer:
         else:
             self.peer_id = uuid.uuid1().bytes
 
-        self.transport = Transport((host, port), loop=self._loop)
-        self.gossip = Gossip(self.transport, fanout=fanout, peer_id=self.peer_id)
-        self.broker = Broker(self.gossip, loop=self._loop)
+        self.transport = Transport((host, port), loop=self._loop, coalesce=coalesce, compression=compression)
+        self.timers = TimerWheel(loop=self._loop)  # shared by the timeouts of every component
+        self.gossip = Gossip(self.transport, fanout=fanout, peer_id=self.peer_id, plumtree=plumtree, timers=self.timers)
+        self.broker = Broker(self.gossip, loop=self._loop, timers=self.timers)
 
         self.task_manager = TaskManager(loop=self._loop)
         self.task_manager.create_task(self.broker.listen())
+        if anti_entropy:
+            self.task_manager.create_task(self.gossip.anti_entropy())
 
         self.members = Members(self)
         self._loop.add_signal_handler(signal.SIGHUP, self.members.print_topology)
@@ -79,6 +86,7 @@ class Peer:
         await self.members.close()
         await self.broker.close()
         await self.task_manager.close()
+        self.timers.close()
 
     async def publish(self, topic, message, peers=None, syn=False):
         if not message.id:
@@ -0,0 +1,110 @@
+import logging
+import sys
+
+from . import config
+from .concurrency import TaskManager
+from .message_pb2 import Message
+
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.StreamHandler(sys.stdout))
+logger.setLevel(getattr(logging, config.LOG_LEVEL))
+
+
+class Plumtree:
+    """
+    Epidemic broadcast tree (Plumtree) over the neighbors of a gossip node.
+
+    Gossip messages are pushed in full to eager peers and announced by id (IHAVE) to lazy peers.
+    A peer that delivers a duplicate is pruned to lazy (PRUNE), and a message announced but not
+    received within TIMEOUT is grafted (GRAFT) from its announcer, which becomes eager again. Every
+    neighbor starts eager, so eager links converge to a spanning tree that heals when links fail.
+
+    The graft timeouts are scheduled on the timer wheel of the gossip node.
+
+    Attributes:
+        TIMEOUT (float): The time in seconds to wait for an announced message before grafting it.
+    """
+
+    TIMEOUT = 0.5
+
+    def __init__(self, gossip):
+        self.gossip = gossip
+
+        self.lazy = set()  # pruned neighbors, every other neighbor is eager
+        self.missing = {}  # message id -> peers that announced it
+        self.grafts = {}  # message id -> graft timer
+        self.task_manager = TaskManager(loop=self.gossip.transport._loop)
+
+    async def close(self):
+        for timer in self.grafts.values():
+            timer.cancel()
+        self.grafts.clear()
+        self.missing.clear()
+        await self.task_manager.close()
+
+    def peers(self, ignore):
+        """
+        Returns the eager and the lazy neighbors that are not ignored.
+        """
+        eager, lazy = [], []
+        for peer_id in self.gossip.topology.neighbors:
+            if peer_id in ignore:
+                continue
+            if peer_id in self.lazy:
+                lazy.append(peer_id)
+            else:
+                eager.append(peer_id)
+        return eager, lazy
+
+    def deliver(self, message_id, peer_id):
+        """
+        A gossip message was received for the first time: the peer it came from becomes eager.
+        """
+        self.lazy.discard(peer_id)
+        self.missing.pop(message_id, None)
+        graft = self.grafts.pop(message_id, None)
+        if graft:
+            graft.cancel()
+
+    async def prune(self, message_id, peer_id, peer_addr=None):
+        """
+        A gossip message was received again: the peer it came from becomes lazy.
+        """
+        self.lazy.add(peer_id)
+        await self._send(Message.Kind.PRUNE, message_id, peer_id, peer_addr)
+
+    async def _send(self, kind, message_id, peer_id, peer_addr=None):
+        try:
+            await self.gossip.send_control(kind, message_id, peer_id, peer_addr=peer_addr)
+        except ValueError as exc:
+            logger.debug(f"DEBUG: {peer_id} {Message.Kind.Name(kind)} error: {exc}")
+
+    def _graft(self, message_id):
+        if not self.missing.get(message_id):
+            self.missing.pop(message_id, None)
+            self.grafts.pop(message_id, None)
+            return
+
+        # graft from the next announcer, until the message is delivered or no announcer is left
+        peer_id = self.missing[message_id].pop(0)
+        self.lazy.discard(peer_id)
+        self.task_manager.create_task(self._send(Message.Kind.GRAFT, message_id, peer_id))
+        self.grafts[message_id] = self.gossip.timers.schedule(self.TIMEOUT, self._graft, message_id)
+
+    async def recv(self, message):
+        peer_id = message.routing.src_id
+
+        if Message.Kind.IHAVE in message.kind:
+            if message.id in self.gossip.mutex:
+                return
+            self.missing.setdefault(message.id, []).append(peer_id)
+            if message.id not in self.grafts:
+                self.grafts[message.id] = self.gossip.timers.schedule(self.TIMEOUT, self._graft, message.id)
+
+        elif Message.Kind.GRAFT in message.kind:
+            self.lazy.discard(peer_id)
+            if message.id in self.gossip.envelopes:
+                await self.gossip._send_envelope(message.id, peer_id)
+
+        elif Message.Kind.PRUNE in message.kind:
+            self.lazy.add(peer_id)
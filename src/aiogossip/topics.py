@@ -0,0 +1,125 @@
+import fnmatch
+import re
+
+WILDCARDS = re.compile(r"[*?\[]")
+
+
+class TopicNode:
+    __slots__ = ("children", "patterns")
+
+    def __init__(self):
+        self.children = {}  # next character -> TopicNode
+        self.patterns = {}  # wildcard pattern -> compiled pattern
+
+
+class TopicIndex:
+    """
+    An index of topic patterns, matched with fnmatch semantics.
+
+    Literal topics are matched with a hash lookup. Wildcard patterns are stored in a character trie
+    under their literal prefix, the part before the first wildcard, so a topic is only matched
+    against the compiled patterns found on its path through the trie.
+    """
+
+    def __init__(self):
+        self.literals = set()
+        self.root = TopicNode()
+        self._len = 0
+
+    def __len__(self):
+        return self._len
+
+    def __contains__(self, pattern):
+        if not WILDCARDS.search(pattern):
+            return pattern in self.literals
+
+        node = self._find(pattern)
+        return node is not None and pattern in node.patterns
+
+    def __iter__(self):
+        yield from self.literals
+
+        nodes = [self.root]
+        while nodes:
+            node = nodes.pop()
+            yield from node.patterns
+            nodes.extend(node.children.values())
+
+    def _prefix(self, pattern):
+        return pattern[: WILDCARDS.search(pattern).start()]
+
+    def _find(self, pattern):
+        node = self.root
+        for char in self._prefix(pattern):
+            node = node.children.get(char)
+            if node is None:
+                return None
+        return node
+
+    def add(self, pattern):
+        """
+        Add a topic pattern to the index.
+
+        Args:
+            pattern (str): The topic, or a pattern with fnmatch wildcards.
+        """
+        if pattern in self:
+            return
+
+        self._len += 1
+        if not WILDCARDS.search(pattern):
+            self.literals.add(pattern)
+            return
+
+        node = self.root
+        for char in self._prefix(pattern):
+            node = node.children.setdefault(char, TopicNode())
+        node.patterns[pattern] = re.compile(fnmatch.translate(pattern)).match
+
+    def discard(self, pattern):
+        """
+        Remove a topic pattern from the index, if present.
+
+        Args:
+            pattern (str): The topic, or a pattern with fnmatch wildcards.
+        """
+        if pattern not in self:
+            return
+
+        self._len -= 1
+        if not WILDCARDS.search(pattern):
+            self.literals.discard(pattern)
+            return
+
+        path = [self.root]
+        for char in self._prefix(pattern):
+            path.append(path[-1].children[char])
+        del path[-1].patterns[pattern]
+
+        # prune the nodes left without patterns
+        for char, parent, node in zip(reversed(self._prefix(pattern)), reversed(path[:-1]), reversed(path)):
+            if node.children or node.patterns:
+                break
+            del parent.children[char]
+
+    def match(self, topic):
+        """
+        Returns the patterns matching a topic.
+
+        Args:
+            topic (str): The topic.
+
+        Returns:
+            list: The matching patterns.
+        """
+        patterns = [topic] if topic in self.literals else []
+
+        node = self.root
+        for char in topic:
+            patterns.extend(pattern for pattern, match in node.patterns.items() if match(topic))
+            node = node.children.get(char)
+            if node is None:
+                return patterns
+
+        patterns.extend(pattern for pattern, match in node.patterns.items() if match(topic))
+        return patterns
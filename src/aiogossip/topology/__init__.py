@@ -0,0 +1,11 @@
+from .base import Node  # noqa
+from .compact import CompactTopology  # noqa
+from .routing import Routing  # noqa
+
+try:
+    from .graph import GraphTopology  # noqa
+except ImportError:  # pragma: no cover
+    # networkx is optional
+    Topology = CompactTopology
+else:
+    Topology = GraphTopology
@@ -0,0 +1,301 @@
+import abc
+import collections
+import heapq
+import itertools
+import math
+
+from ..transport.address import parse_addr
+from .neighbors import Neighbors
+
+Node = collections.namedtuple("Node", ["node_id", "node_addr"])
+
+
+def get_addr_type(addr):
+    if addr.ip.is_loopback:
+        return "local"
+    elif addr.ip.is_private:
+        return "lan"
+    elif addr.ip.is_global:
+        return "wan"
+    raise ValueError(f"Unknown address type {addr}")
+
+
+class BaseTopology(abc.ABC):
+    """
+    Topology of the gossip network as seen from this node.
+
+    Next hops are routed by hop count, or by smoothed edge latency when `metric` is "latency".
+    Nodes marked unreachable are never used to relay messages to other nodes.
+
+    Subclasses store the nodes and edges; routing works on opaque node handles returned by `_handle`.
+    """
+
+    METRICS = ("hops", "latency")
+
+    LATENCY_ALPHA = 0.2  # weight of a new latency sample in the moving average
+    LATENCY_TOLERANCE = 0.1  # relative latency change that triggers a routing recomputation
+    LATENCY_UNKNOWN = 1_000_000  # latency in nanoseconds assumed for edges without samples
+
+    def __init__(self, metric="hops"):
+        # next hop for every reachable node, recomputed on the first lookup after a routing change
+        self._next_peers = None
+        self._latencies = {}
+        self.metric = metric
+
+        # out-neighbors of this node, for sampling
+        self.neighbors = Neighbors()
+
+    @property
+    def metric(self):
+        return self._metric
+
+    @metric.setter
+    def metric(self, metric):
+        if metric not in self.METRICS:
+            raise ValueError(f"Unknown routing metric: {metric}")
+        self._metric = metric
+        self._next_peers = None
+
+    # Storage #
+
+    @abc.abstractmethod
+    def _handle(self, node_id):
+        ...
+
+    @abc.abstractmethod
+    def _node_id(self, handle):
+        ...
+
+    @abc.abstractmethod
+    def _successors(self, handle):
+        """Yields (handle, latency) of the out-edges of a node."""
+
+    @abc.abstractmethod
+    def _predecessors(self, handle):
+        """Yields (handle, latency) of the in-edges of a node."""
+
+    @abc.abstractmethod
+    def _edge_latency(self, src_id, dst_id):
+        """Returns the latency of an edge, None if it has no samples. Raises KeyError if there is no edge."""
+
+    @abc.abstractmethod
+    def _edge_daddr(self, src_id, dst_id):
+        ...
+
+    @abc.abstractmethod
+    def _set_edge(self, src_id, dst_id, attrs):
+        ...
+
+    @abc.abstractmethod
+    def _remove_edge(self, src_id, dst_id):
+        ...
+
+    @abc.abstractmethod
+    def _set_node_addr(self, node_id, node_addr_type, node_addr):
+        ...
+
+    @abc.abstractmethod
+    def _get_reachable(self, node_id):
+        ...
+
+    @abc.abstractmethod
+    def _set_reachable(self, node_id, reachable):
+        ...
+
+    @abc.abstractmethod
+    def create_node(self, node_id, node_addr=None):
+        ...
+
+    @abc.abstractmethod
+    def node_addrs(self, node_id):
+        """Returns the addresses of a node by address type: local, lan and wan."""
+
+    # Node #
+
+    @property
+    def node(self):
+        return Node(self.node_id, self.node_addr)
+
+    def create_node_addr(self, node_id, node_addr):
+        node_addr = parse_addr(node_addr)
+        self._set_node_addr(node_id, get_addr_type(node_addr), node_addr)
+
+    def create_node_edge(self, node):
+        if node.node_id == self.node_id:
+            return
+
+        self.create_node(node.node_id, node_addr=node.node_addr)
+        self.add_edge(
+            self.node_id,
+            node.node_id,
+            saddr=self.node_addr,
+            daddr=node.node_addr,
+        )
+
+    def add_edge(self, src_id, dst_id, **attrs):
+        try:
+            edge_latency = self._edge_latency(src_id, dst_id)
+        except KeyError:
+            self._next_peers = None
+            edge_latency = None
+            if src_id == self.node_id:
+                self.neighbors.add(dst_id)
+
+        if "latency" in attrs and edge_latency is not None:
+            latency = self.LATENCY_ALPHA * attrs["latency"] + (1 - self.LATENCY_ALPHA) * edge_latency
+            attrs["latency"] = latency
+
+            routed = self._latencies.get((self._handle(src_id), self._handle(dst_id)))
+            if routed is not None and abs(latency - routed) > self.LATENCY_TOLERANCE * routed:
+                self._next_peers = None
+
+        self._set_edge(src_id, dst_id, attrs)
+
+    def remove_edge(self, src_id, dst_id):
+        try:
+            self._edge_latency(src_id, dst_id)
+        except KeyError:
+            return
+
+        self._remove_edge(src_id, dst_id)
+        self._next_peers = None
+        if src_id == self.node_id:
+            self.neighbors.discard(dst_id)
+
+    def sample(self, k, ignore=None):
+        return self.neighbors.sample(k, ignore=ignore)
+
+    def update(self, routes):
+        if len(routes) < 2:
+            raise ValueError("Empty route")
+
+        nodes = set()
+        for r in routes:
+            if r.route_id not in self:
+                self.create_node(r.route_id)
+                nodes.add(r.route_id)
+            self.create_node_addr(r.route_id, r.daddr)
+
+        def edge(src, dst):
+            return {
+                "saddr": parse_addr(src.daddr),
+                "daddr": parse_addr(dst.daddr),
+                "latency": abs(src.timestamp - dst.timestamp),
+            }
+
+        hops = ((routes[r], routes[r + 1]) for r in range(len(routes) - 1))
+        for src, dst in hops:
+            self.add_edge(src.route_id, dst.route_id, **edge(src, dst))
+        self.add_edge(dst.route_id, src.route_id, **edge(dst, src))
+
+        return nodes
+
+    def latency(self, src_id, dst_id):
+        """
+        Returns the smoothed latency of an edge in nanoseconds, None if it has no samples.
+        """
+        return self._edge_latency(src_id, dst_id)
+
+    # Reachability #
+
+    def mark_reachable(self, node_id):
+        if self._get_reachable(node_id) is False:
+            self._next_peers = None
+        self._set_reachable(node_id, True)
+
+    def mark_unreachable(self, node_id):
+        if self._get_reachable(node_id) is not False:
+            self._next_peers = None
+        self._set_reachable(node_id, False)
+
+    def is_relay(self, node_id):
+        return self._get_reachable(node_id) is not False
+
+    # Addr #
+
+    def _compute_next_peers(self):
+        """
+        Breadth-first search over the undirected topology, starting from the out-edges of this node.
+
+        Returns:
+            dict: The next peer handle on a shortest path to every reachable node handle.
+        """
+        node = self._handle(self.node_id)
+
+        next_peers = {}
+        queue = collections.deque()
+        for peer, _ in self._successors(node):
+            next_peers[peer] = peer
+            queue.append(peer)
+
+        while queue:
+            handle = queue.popleft()
+            if not self.is_relay(self._node_id(handle)):
+                continue
+            for neighbor, _ in itertools.chain(self._successors(handle), self._predecessors(handle)):
+                if neighbor not in next_peers and neighbor != node:
+                    next_peers[neighbor] = next_peers[handle]
+                    queue.append(neighbor)
+
+        return next_peers
+
+    def _compute_next_peers_latency(self):
+        """
+        Dijkstra over the undirected topology weighted by smoothed edge latency, starting from the
+        out-edges of this node. The latencies used are kept to detect when routes need recomputing.
+
+        Returns:
+            dict: The next peer handle on a lowest latency path to every reachable node handle.
+        """
+        node = self._handle(self.node_id)
+        self._latencies = {}
+
+        def latency(src, dst, edge_latency):
+            if edge_latency is None:
+                edge_latency = self.LATENCY_UNKNOWN
+            self._latencies[src, dst] = edge_latency
+            return edge_latency
+
+        next_peers = {}
+        distances = {}
+        counter = itertools.count()
+        heap = []
+        for peer, edge_latency in self._successors(node):
+            distances[peer] = latency(node, peer, edge_latency)
+            heapq.heappush(heap, (distances[peer], next(counter), peer, peer))
+
+        while heap:
+            distance, _, handle, next_peer = heapq.heappop(heap)
+            if handle in next_peers:
+                continue
+            next_peers[handle] = next_peer
+
+            if not self.is_relay(self._node_id(handle)):
+                continue
+
+            edges = itertools.chain(
+                ((neighbor, latency(handle, neighbor, e)) for neighbor, e in self._successors(handle)),
+                ((neighbor, latency(neighbor, handle, e)) for neighbor, e in self._predecessors(handle)),
+            )
+            for neighbor, weight in edges:
+                if neighbor in next_peers or neighbor == node:
+                    continue
+                if distance + weight < distances.get(neighbor, math.inf):
+                    distances[neighbor] = distance + weight
+                    heapq.heappush(heap, (distance + weight, next(counter), neighbor, next_peer))
+
+        return next_peers
+
+    def get_next_peer(self, node_id):
+        if self._next_peers is None:
+            if self.metric == "latency":
+                self._next_peers = self._compute_next_peers_latency()
+            else:
+                self._next_peers = self._compute_next_peers()
+
+        next_peer = self._next_peers.get(self._handle(node_id))
+        if next_peer is None:
+            raise ValueError(f"No route to node: {node_id}")
+
+        next_peer_id = self._node_id(next_peer)
+        return next_peer_id, parse_addr(self._edge_daddr(self.node_id, next_peer_id))
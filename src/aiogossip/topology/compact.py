@@ -0,0 +1,201 @@
+import array
+import ipaddress
+import math
+
+from ..transport.address import Address, parse_addr
+from .base import BaseTopology
+
+NODE_ADDR_TYPES = ("local", "lan", "wan")
+
+
+class Addresses:
+    """
+    A column of optional IPv4/IPv6 addresses stored in arrays.
+    """
+
+    def __init__(self):
+        self.version = array.array("B")
+        self.ip_hi = array.array("Q")
+        self.ip_lo = array.array("Q")
+        self.port = array.array("H")
+
+    def __len__(self):
+        return len(self.version)
+
+    def __getitem__(self, index):
+        version = self.version[index]
+        if not version:
+            return None
+
+        ip = self.ip_hi[index] << 64 | self.ip_lo[index]
+        ip = ipaddress.IPv4Address(ip) if version == 4 else ipaddress.IPv6Address(ip)
+        return Address(ip, self.port[index])
+
+    def __setitem__(self, index, addr):
+        ip = int(addr.ip)
+        self.version[index] = addr.ip.version
+        self.ip_hi[index] = ip >> 64
+        self.ip_lo[index] = ip & 0xFFFFFFFFFFFFFFFF
+        self.port[index] = addr.port
+
+    def clear(self, index):
+        self.version[index] = 0
+
+    def append(self, addr=None):
+        self.version.append(0)
+        self.ip_hi.append(0)
+        self.ip_lo.append(0)
+        self.port.append(0)
+        if addr is not None:
+            self[len(self) - 1] = addr
+
+
+class CompactTopology(BaseTopology):
+    """
+    Topology stored in columns, without networkx.
+
+    Node ids are interned to integer indices. Node addresses, reachability and edges (with their
+    addresses and latencies) are kept in arrays indexed by node or edge index.
+    """
+
+    def __init__(self, node_id, node_addr, metric="hops"):
+        super().__init__(metric=metric)
+
+        self._ids = []
+        self._index = {}
+        self._node_addrs = {node_addr_type: Addresses() for node_addr_type in NODE_ADDR_TYPES}
+        self._reachable = array.array("b")  # -1 unknown, 0 unreachable, 1 reachable
+        self._succ = []  # out-edge indices per node
+        self._pred = []  # in-edge indices per node
+
+        self._edges = {}  # src index << 32 | dst index -> edge index
+        self._edge_srcs = array.array("L")
+        self._edge_dsts = array.array("L")
+        self._edge_latencies = array.array("d")  # nan without samples
+        self._edge_saddrs = Addresses()
+        self._edge_daddrs = Addresses()
+        self._edge_free = []  # indices of removed edges, reused by new edges
+
+        self.node_id = node_id
+        self.node_addr = parse_addr(node_addr)
+        self.create_node(node_id, node_addr=self.node_addr)
+
+    # Storage #
+
+    def _handle(self, node_id):
+        return self._index.get(node_id)
+
+    def _node_id(self, handle):
+        return self._ids[handle]
+
+    def _latency(self, edge):
+        latency = self._edge_latencies[edge]
+        return None if math.isnan(latency) else latency
+
+    def _successors(self, handle):
+        return ((self._edge_dsts[e], self._latency(e)) for e in self._succ[handle])
+
+    def _predecessors(self, handle):
+        return ((self._edge_srcs[e], self._latency(e)) for e in self._pred[handle])
+
+    def _edge(self, src_id, dst_id):
+        return self._edges[self._index[src_id] << 32 | self._index[dst_id]]
+
+    def _edge_latency(self, src_id, dst_id):
+        return self._latency(self._edge(src_id, dst_id))
+
+    def _edge_daddr(self, src_id, dst_id):
+        return self._edge_daddrs[self._edge(src_id, dst_id)]
+
+    def _set_edge(self, src_id, dst_id, attrs):
+        for node_id in (src_id, dst_id):
+            if node_id not in self._index:
+                self.create_node(node_id)
+
+        src, dst = self._index[src_id], self._index[dst_id]
+        edge = self._edges.get(src << 32 | dst)
+        if edge is None and self._edge_free:
+            edge = self._edge_free.pop()
+            self._edge_srcs[edge] = src
+            self._edge_dsts[edge] = dst
+            self._edge_latencies[edge] = math.nan
+            self._edge_saddrs.clear(edge)
+            self._edge_daddrs.clear(edge)
+        elif edge is None:
+            edge = len(self._edge_srcs)
+            self._edge_srcs.append(src)
+            self._edge_dsts.append(dst)
+            self._edge_latencies.append(math.nan)
+            self._edge_saddrs.append()
+            self._edge_daddrs.append()
+
+        if src << 32 | dst not in self._edges:
+            self._edges[src << 32 | dst] = edge
+            self._succ[src].append(edge)
+            self._pred[dst].append(edge)
+
+        if attrs.get("saddr"):
+            self._edge_saddrs[edge] = parse_addr(attrs["saddr"])
+        if attrs.get("daddr"):
+            self._edge_daddrs[edge] = parse_addr(attrs["daddr"])
+        if attrs.get("latency") is not None:
+            self._edge_latencies[edge] = attrs["latency"]
+
+    def _remove_edge(self, src_id, dst_id):
+        src, dst = self._index[src_id], self._index[dst_id]
+        edge = self._edges.pop(src << 32 | dst)
+        self._succ[src].remove(edge)
+        self._pred[dst].remove(edge)
+        self._edge_free.append(edge)
+
+    def _set_node_addr(self, node_id, node_addr_type, node_addr):
+        self._node_addrs[node_addr_type][self._index[node_id]] = node_addr
+
+    def _get_reachable(self, node_id):
+        reachable = self._reachable[self._index[node_id]]
+        return None if reachable < 0 else bool(reachable)
+
+    def _set_reachable(self, node_id, reachable):
+        self._reachable[self._index[node_id]] = int(reachable)
+
+    def create_node(self, node_id, node_addr=None):
+        if node_id not in self._index:
+            self._index[node_id] = len(self._ids)
+            self._ids.append(node_id)
+            for addrs in self._node_addrs.values():
+                addrs.append()
+            self._reachable.append(-1)
+            self._succ.append(array.array("L"))
+            self._pred.append(array.array("L"))
+
+        if node_addr:
+            self.create_node_addr(node_id, node_addr)
+
+    def node_addrs(self, node_id):
+        index = self._index[node_id]
+        return {node_addr_type: addrs[index] for node_addr_type, addrs in self._node_addrs.items()}
+
+    # Node #
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __iter__(self):
+        return iter(self._ids)
+
+    def __contains__(self, node_id):
+        return node_id in self._index
+
+    def __getitem__(self, node_id):
+        node = {"node_id": node_id, "node_addrs": self.node_addrs(node_id)}
+        reachable = self._get_reachable(node_id)
+        if reachable is not None:
+            node["reachable"] = reachable
+        return node
+
+    def to_dict(self):
+        nodes = {}
+        for node_id in self._ids:
+            node_addrs = {k: str(v) for k, v in self.node_addrs(node_id).items()}
+            nodes[node_id.decode()] = node_addrs
+        return nodes
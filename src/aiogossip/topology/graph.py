@@ -0,0 +1,105 @@
+import networkx as nx
+
+from ..transport.address import parse_addr
+from .base import BaseTopology
+
+
+class GraphTopology(BaseTopology):
+    """
+    Topology stored in a networkx DiGraph, with node and edge attributes kept in dicts.
+    """
+
+    def __init__(self, node_id, node_addr, metric="hops"):
+        super().__init__(metric=metric)
+
+        node_addr = parse_addr(node_addr)
+        self.g = nx.DiGraph(node_id=node_id, node_addr=node_addr)
+        self.create_node(node_id, node_addr=node_addr)
+
+    # Storage #
+
+    def _handle(self, node_id):
+        return node_id
+
+    def _node_id(self, handle):
+        return handle
+
+    def _successors(self, handle):
+        return ((node_id, edge.get("latency")) for node_id, edge in self.g.succ[handle].items())
+
+    def _predecessors(self, handle):
+        return ((node_id, edge.get("latency")) for node_id, edge in self.g.pred[handle].items())
+
+    def _edge_latency(self, src_id, dst_id):
+        return self.g.adj[src_id][dst_id].get("latency")
+
+    def _edge_daddr(self, src_id, dst_id):
+        return self.g.adj[src_id][dst_id]["daddr"]
+
+    def _set_edge(self, src_id, dst_id, attrs):
+        self.g.add_edge(src_id, dst_id, **attrs)
+
+    def _remove_edge(self, src_id, dst_id):
+        self.g.remove_edge(src_id, dst_id)
+
+    def _set_node_addr(self, node_id, node_addr_type, node_addr):
+        self.g.nodes[node_id]["node_addrs"][node_addr_type] = node_addr
+
+    def _get_reachable(self, node_id):
+        return self.g.nodes[node_id].get("reachable")
+
+    def _set_reachable(self, node_id, reachable):
+        self.g.nodes[node_id]["reachable"] = reachable
+
+    def create_node(self, node_id, node_addr=None):
+        self.g.add_node(node_id)
+        node = self.g.nodes[node_id]
+
+        if "node_id" not in node:
+            node["node_id"] = node_id
+
+        if "node_addrs" not in node:
+            node["node_addrs"] = {
+                "local": None,
+                "lan": None,
+                "wan": None,
+            }
+
+        if node_addr:
+            self.create_node_addr(node_id, node_addr)
+
+    def node_addrs(self, node_id):
+        return self.g.nodes[node_id]["node_addrs"]
+
+    # Node #
+    @property
+    def node_id(self):
+        return self.g.graph["node_id"]
+
+    @property
+    def node_addr(self):
+        return self.g.graph["node_addr"]
+
+    @property
+    def _node(self):
+        return self.g.nodes[self.node_id]
+
+    def __len__(self):
+        return len(self.g)
+
+    def __iter__(self):
+        return iter(self.g.nodes)
+
+    def __contains__(self, node_id):
+        return node_id in self.g
+
+    def __getitem__(self, node_id):
+        return self.g.nodes[node_id]
+
+    def to_dict(self):
+        nodes = {}
+        for node_id in self.g.nodes:
+            node_addrs = self.g.nodes[node_id]["node_addrs"]
+            node_addrs = {k: str(v) for k, v in node_addrs.items()}
+            nodes[node_id.decode()] = node_addrs
+        return nodes
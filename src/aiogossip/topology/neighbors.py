@@ -0,0 +1,71 @@
+import random
+
+
+class Neighbors:
+    """
+    Neighbors of a node kept in a list, indexed by node id for O(1) swap-remove, to sample peers
+    without copying the list.
+    """
+
+    def __init__(self):
+        self.nodes = []
+        self.index = {}
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def __iter__(self):
+        return iter(self.nodes)
+
+    def __contains__(self, node_id):
+        return node_id in self.index
+
+    def add(self, node_id):
+        if node_id not in self.index:
+            self.index[node_id] = len(self.nodes)
+            self.nodes.append(node_id)
+
+    def discard(self, node_id):
+        index = self.index.pop(node_id, None)
+        if index is None:
+            return
+
+        last = self.nodes.pop()
+        if index < len(self.nodes):
+            self.nodes[index] = last
+            self.index[last] = index
+
+    def sample(self, k, ignore=None):
+        """
+        Returns up to k distinct random neighbors that are not ignored.
+
+        Neighbors are drawn at random and rejected if ignored or already drawn, which takes O(k)
+        expected time while the ignored neighbors are a minority. When too many draws are rejected,
+        the neighbors that are not ignored are scanned instead.
+
+        Args:
+            k (int): The number of neighbors to sample.
+            ignore (Iterable, optional): The node ids to exclude. Defaults to None.
+
+        Returns:
+            list: The sampled node ids.
+        """
+        nodes = self.nodes
+        if not ignore:
+            return random.sample(nodes, min(k, len(nodes)))
+
+        if not isinstance(ignore, (set, frozenset, dict)):
+            ignore = set(ignore)
+
+        sample = {}
+        attempts = 4 * k + 16
+        while nodes and len(sample) < k and attempts:
+            node_id = nodes[random.randrange(len(nodes))]
+            if node_id not in ignore:
+                sample[node_id] = None
+            attempts -= 1
+
+        if len(sample) < k:
+            nodes = [node_id for node_id in nodes if node_id not in ignore]
+            return random.sample(nodes, min(k, len(nodes)))
+        return list(sample)
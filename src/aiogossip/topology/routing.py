@@ -0,0 +1,48 @@
+import time
+
+from ..message_pb2 import Route
+from .base import get_addr_type
+
+
+class Routing:
+    def __init__(self, topology):
+        self.topology = topology
+
+    def set_send_route(self, message, peer_id, peer_addr):
+        """
+        Returns a copy of the message with the route to the next peer appended.
+        """
+        msg = type(message)()
+        msg.CopyFrom(message)
+
+        if not msg.routing.routes:
+            msg.routing.routes.append(Route(route_id=self.topology.node_id))
+            msg.routing.routes.append(Route(route_id=peer_id))
+        elif msg.routing.routes[-1].route_id == self.topology.node_id:
+            msg.routing.routes.append(Route(route_id=peer_id))
+
+        peer_addr_type = get_addr_type(peer_addr)
+
+        node_saddrs = self.topology.node_addrs(self.topology.node_id)
+        node_saddr = (
+            node_saddrs.get(peer_addr_type)
+            or node_saddrs.get("wan")
+            or node_saddrs.get("lan")
+            or node_saddrs.get("local")
+        )
+        if not node_saddr:
+            raise ValueError(f"Unknown address type {peer_addr}")
+
+        msg.routing.routes[-1].daddr = f"{peer_addr[0]}:{peer_addr[1]}"
+        msg.routing.routes[-2].saddr = f"{node_saddr.ip}:{node_saddr.port}"
+        msg.routing.routes[-2].timestamp = int(time.time_ns())
+        return msg
+
+    def set_recv_route(self, msg, peer_id, peer_addr):
+        """
+        Completes the last hop of the route of a received message, in place.
+        """
+        msg.routing.routes[-2].daddr = f"{peer_addr[0]}:{peer_addr[1]}"
+        msg.routing.routes[-1].saddr = f"{self.topology.node_addr.ip}:{self.topology.node_addr.port}"
+        msg.routing.routes[-1].timestamp = int(time.time_ns())
+        return msg
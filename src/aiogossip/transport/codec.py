@@ -1,27 +1,319 @@
-from ..message_pb2 import Message
+from google.protobuf.message import DecodeError
 
+from ..message_pb2 import Fragment, Message
+from . import compression
 
-def decode(data: bytes) -> Message:
+WIRETYPE_VARINT = 0
+WIRETYPE_FIXED64 = 1
+WIRETYPE_LENGTH_DELIMITED = 2
+WIRETYPE_FIXED32 = 5
+
+FIELD_ID = Message.DESCRIPTOR.fields_by_name["id"].number
+FIELD_KIND = Message.DESCRIPTOR.fields_by_name["kind"].number
+FIELD_ROUTING = Message.DESCRIPTOR.fields_by_name["routing"].number
+FIELD_TOPIC = Message.DESCRIPTOR.fields_by_name["topic"].number
+FIELD_BATCH = Message.DESCRIPTOR.fields_by_name["batch"].number
+FIELD_FRAGMENT = Message.DESCRIPTOR.fields_by_name["fragment"].number
+FIELD_PIGGYBACK = Message.DESCRIPTOR.fields_by_name["piggyback"].number
+
+BATCH_TAG = FIELD_BATCH << 3 | WIRETYPE_LENGTH_DELIMITED
+FRAGMENT_TAG = FIELD_FRAGMENT << 3 | WIRETYPE_LENGTH_DELIMITED
+
+
+def _decode_varint(data, pos):
+    result = 0
+    shift = 0
+    while True:
+        if pos >= len(data):
+            raise DecodeError("Truncated varint")
+        b = data[pos]
+        pos += 1
+        result |= (b & 0x7F) << shift
+        if not b & 0x80:
+            return result, pos
+        shift += 7
+
+
+def _encode_varint(value):
+    data = bytearray()
+    while value > 0x7F:
+        data.append((value & 0x7F) | 0x80)
+        value >>= 7
+    data.append(value)
+    return bytes(data)
+
+
+def _decode_fields(data):
+    """
+    Iterate over the top-level fields of a serialized protobuf message.
+
+    Yields:
+        tuple: The field number, wire type, value, and the start and end offsets of the field.
+            The value is an int for varints, and a slice of data otherwise.
+    """
+    pos = 0
+    while pos < len(data):
+        start = pos
+        key, pos = _decode_varint(data, pos)
+        number, wire_type = key >> 3, key & 0x7
+
+        if wire_type == WIRETYPE_VARINT:
+            value, pos = _decode_varint(data, pos)
+            yield number, wire_type, value, start, pos
+            continue
+
+        if wire_type == WIRETYPE_LENGTH_DELIMITED:
+            size, pos = _decode_varint(data, pos)
+        elif wire_type == WIRETYPE_FIXED64:
+            size = 8
+        elif wire_type == WIRETYPE_FIXED32:
+            size = 4
+        else:
+            raise DecodeError(f"Unsupported wire type: {wire_type}")
+
+        end = pos + size
+        if end > len(data):
+            raise DecodeError("Truncated message")
+
+        yield number, wire_type, data[pos:end], start, end
+        pos = end
+
+
+def encode_field(number, value: bytes) -> bytes:
+    """
+    Encode a length-delimited field.
+
+    Args:
+        number (int): The field number.
+        value (bytes): The serialized field value.
+
+    Returns:
+        bytes: The serialized field.
+    """
+    return _encode_varint(number << 3 | WIRETYPE_LENGTH_DELIMITED) + _encode_varint(len(value)) + value
+
+
+def batch_size(data: bytes) -> int:
+    """
+    Returns the size of a serialized message once packed in a batch.
+    """
+    return len(_encode_varint(BATCH_TAG)) + len(_encode_varint(len(data))) + len(data)
+
+
+def pack(datagrams) -> bytes:
+    """
+    Pack serialized messages into one batch datagram.
+
+    Args:
+        datagrams (list): The serialized messages.
+
+    Returns:
+        bytes: The serialized batch, a message with only the `batch` field set.
+    """
+    return b"".join(encode_field(FIELD_BATCH, data) for data in datagrams)
+
+
+def unpack(data: bytes | memoryview) -> list:
+    """
+    Unpack the serialized messages of a batch datagram.
+
+    Args:
+        data (bytes, memoryview): The datagram.
+
+    Returns:
+        list: The serialized messages, slices of data; data itself if it is not a batch.
+
+    Raises:
+        DecodeError: If the batch is malformed.
+    """
+    if not data or data[0] != BATCH_TAG:
+        return [data]
+
+    datagrams = []
+    for number, wire_type, value, _, _ in _decode_fields(data):
+        if number != FIELD_BATCH or wire_type != WIRETYPE_LENGTH_DELIMITED:
+            raise DecodeError(f"Unexpected field in batch: {number}")
+        datagrams.append(value)
+    return datagrams
+
+
+def fragment(data: bytes, size: int, fragment_id: bytes) -> list:
     """
-    Decode the given data using the Message.FromString method.
+    Split a serialized message into fragment datagrams.
 
     Args:
-        data (bytes): The data to be decoded.
+        data (bytes): The serialized message.
+        size (int): The maximum size of the message data carried by a fragment.
+        fragment_id (bytes): The id shared by the fragments of the message.
 
     Returns:
-        Message: The decoded message object.
+        list: The serialized fragments, messages with only the `fragment` field set.
+    """
+    count = -(-len(data) // size)
+    fragments = []
+    for index in range(count):
+        start = index * size
+        end = start + size
+        fragment = Fragment(id=fragment_id, index=index, count=count, data=data[start:end])
+        fragments.append(encode_field(FIELD_FRAGMENT, fragment.SerializeToString()))
+    return fragments
+
+
+def is_fragment(data: bytes | memoryview) -> bool:
+    """
+    Returns whether a datagram is a fragment, see `fragment`.
+    """
+    return bool(data) and data[0] == FRAGMENT_TAG
+
+
+class Envelope:
+    """
+    A lazily decoded message.
+
+    Only `id`, `kind` and `routing` are decoded, every other field (`topic`, `payload`, ...) is kept
+    as raw wire bytes in `head` and re-emitted as is. `routing` may be changed freely, `id` and `kind`
+    are read-only views of `head`. `piggyback` is split off the message and never re-emitted.
+    """
+
+    __slots__ = ("id", "kind", "routing", "head", "piggyback")
+
+    def __init__(self):
+        self.id = b""
+        self.kind = []
+        self.routing = Message.Routing()
+        self.head = b""
+        self.piggyback = b""
+
+    def __repr__(self):
+        return f"<Envelope: {self.id.hex()} {len(self.head)} bytes>"
+
+    @classmethod
+    def FromString(cls, data: bytes | memoryview):
+        """
+        Decode the envelope of a serialized message.
+
+        Args:
+            data (bytes, memoryview): The serialized message.
+
+        Returns:
+            Envelope: The decoded envelope.
+        """
+        envelope = cls()
+        envelope.MergeFromString(data)
+        return envelope
+
+    def MergeFromString(self, data: bytes | memoryview):
+        """
+        Merge a serialized message into the envelope, following protobuf merge semantics:
+        `id` is replaced, `kind` is extended and `routing` is merged.
+
+        Args:
+            data (bytes, memoryview): The serialized message.
+        """
+        head = [self.head]
+        for number, wire_type, value, start, end in _decode_fields(data):
+            if number == FIELD_ROUTING:
+                self.routing.MergeFromString(value)
+                continue
+            if number == FIELD_PIGGYBACK:
+                self.piggyback = bytes(value)
+                continue
+
+            if number == FIELD_ID:
+                self.id = bytes(value)
+            elif number == FIELD_KIND and wire_type == WIRETYPE_VARINT:
+                self.kind.append(value)
+            elif number == FIELD_KIND:
+                pos = 0
+                while pos < len(value):
+                    kind, pos = _decode_varint(value, pos)
+                    self.kind.append(kind)
+            head.append(data[start:end])
+
+        self.head = b"".join(head)
+
+    @property
+    def topic(self) -> str:
+        """
+        The topic of the message, decoded from `head` on access.
+        """
+        topic = ""
+        for number, _, value, _, _ in _decode_fields(self.head):
+            if number == FIELD_TOPIC:
+                topic = bytes(value).decode()
+        return topic
+
+    def CopyFrom(self, other):
+        self.id = other.id
+        self.kind = list(other.kind)
+        self.routing = Message.Routing()
+        self.routing.CopyFrom(other.routing)
+        self.head = other.head
+
+    def SerializeToString(self) -> bytes:
+        routing = self.routing.SerializeToString()
+        if not routing:
+            return self.head
+        return self.head + encode_field(FIELD_ROUTING, routing)
+
+    def to_message(self, dictionaries=None, max_size=compression.MAX_SIZE) -> Message:
+        """
+        Fully decode the envelope, decompressing the payload.
+
+        Args:
+            dictionaries (Dictionaries, optional): The compression dictionaries. Defaults to None.
+            max_size (int, optional): The maximum size of the decompressed payload.
+
+        Returns:
+            Message: The decoded message object.
+
+        Raises:
+            DecodeError: If the payload cannot be decompressed.
+        """
+        message = compression.decompress(Message.FromString(self.head), dictionaries, max_size)
+        if self.routing.ByteSize():
+            message.routing.CopyFrom(self.routing)
+        return message
+
+
+def decode(
+    data: bytes | memoryview, lazy=False, dictionaries=None, max_size=compression.MAX_SIZE
+) -> Message | Envelope:
+    """
+    Decode the given data using the Message.FromString method, decompressing the payload.
+
+    Args:
+        data (bytes, memoryview): The data to be decoded.
+        lazy (bool, optional): Decode only the envelope of the message, the payload is kept
+            compressed. Defaults to False.
+        dictionaries (Dictionaries, optional): The compression dictionaries. Defaults to None.
+        max_size (int, optional): The maximum size of the decompressed payload.
+
+    Returns:
+        Message: The decoded message object, or its Envelope if lazy.
+
+    Raises:
+        DecodeError: If the data or the payload cannot be decoded.
     """
-    return Message.FromString(data)
+    if lazy:
+        return Envelope.FromString(data)
+    return compression.decompress(Message.FromString(data), dictionaries, max_size)
 
 
-def encode(data: Message) -> bytes:
+def encode(data: Message | Envelope, algorithm=None, threshold=0, dictionaries=None) -> bytes:
     """
     Encodes the given data object into a serialized byte string.
 
     Args:
         data: The data object to be encoded.
+        algorithm (str, optional): Compress the payload of a Message with zlib, lzma or zstd,
+            see `compression.compress`. Envelopes are encoded as is. Defaults to None.
+        threshold (int, optional): The minimum payload size to compress. Defaults to 0.
+        dictionaries (Dictionaries, optional): The compression dictionaries. Defaults to None.
 
     Returns:
         str: The serialized string representation of the data object.
     """
+    if algorithm and isinstance(data, Message):
+        data = compression.compress(data, algorithm, threshold=threshold, dictionaries=dictionaries)
     return data.SerializeToString()
@@ -0,0 +1,182 @@
+import lzma
+import zlib
+
+from google.protobuf.message import DecodeError
+
+from ..message_pb2 import Message
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    # zstandard is optional
+    zstandard = None
+
+ALGORITHMS = {
+    "zlib": Message.Compression.ZLIB,
+    "lzma": Message.Compression.LZMA,
+    "zstd": Message.Compression.ZSTD,
+}
+
+ERRORS = (zlib.error, lzma.LZMAError) + ((zstandard.ZstdError,) if zstandard else ())
+
+MAX_SIZE = 1 << 20  # the maximum size of a decompressed payload
+
+
+def dictionary_id(zdict: bytes) -> int:
+    return zlib.crc32(zdict)
+
+
+class Dictionaries:
+    """
+    The compression dictionaries of a transport, by id and by topic.
+    """
+
+    def __init__(self):
+        self.dictionaries = {}  # dictionary id -> dictionary
+        self.topics = {}  # topic -> dictionary id
+
+    def register(self, topic: str, zdict: bytes) -> int:
+        """
+        Register a dictionary trained on the payloads of a topic.
+
+        Payloads of the topic are compressed with the dictionary, and every payload compressed with it
+        can be decompressed, whatever its topic. Peers must register the same dictionaries.
+
+        Args:
+            topic (str): The topic.
+            zdict (bytes): The dictionary, e.g. samples of typical payloads of the topic.
+
+        Returns:
+            int: The id of the dictionary.
+        """
+        self.dictionaries[dictionary_id(zdict)] = zdict
+        self.topics[topic] = dictionary_id(zdict)
+        return self.topics[topic]
+
+    def get(self, dictionary: int) -> bytes | None:
+        return self.dictionaries.get(dictionary)
+
+    def topic(self, topic: str) -> int:
+        """
+        Returns the id of the dictionary of a topic, 0 if none.
+        """
+        return self.topics.get(topic, 0)
+
+
+def _compress(data, algorithm, zdict):
+    if algorithm == Message.Compression.ZLIB and zdict:
+        compressor = zlib.compressobj(zdict=zdict)
+        return compressor.compress(data) + compressor.flush()
+    if algorithm == Message.Compression.ZLIB:
+        return zlib.compress(data)
+    if algorithm == Message.Compression.LZMA:
+        return lzma.compress(data)
+    dict_data = zstandard.ZstdCompressionDict(zdict) if zdict else None
+    return zstandard.ZstdCompressor(dict_data=dict_data).compress(data)
+
+
+def _decompress(data, algorithm, zdict, max_size):
+    if algorithm == Message.Compression.ZLIB:
+        decompressor = zlib.decompressobj(zdict=zdict) if zdict else zlib.decompressobj()
+        payload = decompressor.decompress(data, max_size)
+        if decompressor.unconsumed_tail:
+            raise DecodeError(f"Decompressed payload exceeds {max_size} bytes")
+        if not decompressor.eof:
+            raise DecodeError("Truncated compressed payload")
+        return payload
+
+    if algorithm == Message.Compression.LZMA:
+        decompressor = lzma.LZMADecompressor()
+        payload = decompressor.decompress(data, max_length=max_size)
+        if not decompressor.eof:
+            if decompressor.needs_input:
+                raise DecodeError("Truncated compressed payload")
+            raise DecodeError(f"Decompressed payload exceeds {max_size} bytes")
+        return payload
+
+    # the content size of the frame header, if any, is allocated as is
+    if zstandard.frame_content_size(data) > max_size:
+        raise DecodeError(f"Decompressed payload exceeds {max_size} bytes")
+    dict_data = zstandard.ZstdCompressionDict(zdict) if zdict else None
+    return zstandard.ZstdDecompressor(dict_data=dict_data).decompress(data, max_output_size=max_size)
+
+
+def compress(message: Message, algorithm: str, threshold: int = 0, dictionaries: Dictionaries = None) -> Message:
+    """
+    Compress the payload of a message, if at least threshold bytes and smaller once compressed.
+
+    Dictionaries are not supported by lzma.
+
+    Args:
+        message (Message): The message.
+        algorithm (str): The compression algorithm: zlib, lzma or zstd.
+        threshold (int, optional): The minimum payload size to compress. Defaults to 0.
+        dictionaries (Dictionaries, optional): The dictionaries by topic. Defaults to None.
+
+    Returns:
+        Message: A copy of the message with its payload compressed, or the message itself.
+
+    Raises:
+        ValueError: If the algorithm is unknown or not available.
+    """
+    if algorithm not in ALGORITHMS:
+        raise ValueError(f"Unknown compression algorithm: {algorithm}")
+    if algorithm == "zstd" and zstandard is None:
+        raise ValueError("Compression algorithm not available: zstd")
+
+    if message.compression or len(message.payload) < max(threshold, 1):
+        return message
+
+    algorithm = ALGORITHMS[algorithm]
+    dictionary = 0
+    if dictionaries is not None and algorithm != Message.Compression.LZMA:
+        dictionary = dictionaries.topic(message.topic)
+    payload = _compress(message.payload, algorithm, dictionaries.get(dictionary) if dictionary else None)
+    if len(payload) >= len(message.payload):
+        return message
+
+    msg = Message()
+    msg.CopyFrom(message)
+    msg.payload = payload
+    msg.compression = algorithm
+    msg.dictionary = dictionary
+    return msg
+
+
+def decompress(message: Message, dictionaries: Dictionaries = None, max_size: int = MAX_SIZE) -> Message:
+    """
+    Decompress the payload of a message in place, if compressed.
+
+    Args:
+        message (Message): The message.
+        dictionaries (Dictionaries, optional): The dictionaries by id. Defaults to None.
+        max_size (int, optional): The maximum size of the decompressed payload. Defaults to MAX_SIZE.
+
+    Returns:
+        Message: The message.
+
+    Raises:
+        DecodeError: If the payload cannot be decompressed, or exceeds max_size once decompressed.
+    """
+    if not message.compression:
+        return message
+
+    if message.compression not in ALGORITHMS.values():
+        raise DecodeError(f"Unknown compression algorithm: {message.compression}")
+    zdict = None
+    if message.dictionary:
+        zdict = dictionaries.get(message.dictionary) if dictionaries is not None else None
+        if zdict is None:
+            raise DecodeError(f"Unknown compression dictionary: {message.dictionary}")
+    if message.compression == Message.Compression.ZSTD and zstandard is None:
+        raise DecodeError("Compression algorithm not available: zstd")
+
+    try:
+        payload = _decompress(message.payload, message.compression, zdict, max_size)
+    except ERRORS as exc:
+        raise DecodeError(f"Invalid compressed payload: {exc}") from exc
+
+    message.payload = payload
+    message.ClearField("compression")
+    message.ClearField("dictionary")
+    return message
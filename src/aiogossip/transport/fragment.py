@@ -0,0 +1,134 @@
+import collections
+import itertools
+import time
+
+
+class Partial:
+    __slots__ = ("count", "fragments", "size", "addr", "expires")
+
+    def __init__(self, count, addr, expires):
+        self.count = count
+        self.fragments = {}  # index -> data
+        self.size = 0
+        self.addr = addr
+        self.expires = expires
+
+
+class Reassembly:
+    """
+    The messages being reassembled from their fragments.
+
+    Fragments are kept one by one as received and joined only once the last one arrives, so a
+    partial message holds no more than the data received so far, plus PARTIAL_OVERHEAD bytes.
+    Partial messages are evicted once their timeout expires, and the oldest ones first once more
+    than maxsize bytes or more than maxpartials partial messages are held. Fragments without data,
+    of messages of more than maxcount fragments, or whose count differs from the fragments already
+    received, are rejected.
+    """
+
+    PARTIAL_OVERHEAD = 256  # bytes a partial message is accounted for besides its data
+
+    def __init__(self, maxsize: int, timeout: float, maxcount: int, maxpartials: int):
+        """
+        Initialize a Reassembly instance.
+
+        Args:
+            maxsize (int): The maximum number of bytes held by the partial messages.
+            timeout (float): The time in seconds a partial message is kept without progress.
+            maxcount (int): The maximum number of fragments of a message.
+            maxpartials (int): The maximum number of partial messages.
+        """
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self.maxcount = maxcount
+        self.maxpartials = maxpartials
+
+        self.partials = collections.OrderedDict()
+        self.size = 0
+        self.evicted = 0
+        self.rejected = 0
+
+    def __len__(self):
+        return len(self.partials)
+
+    def __contains__(self, fragment_id):
+        return fragment_id in self.partials
+
+    def _discard(self, fragment_id):
+        partial = self.partials.pop(fragment_id)
+        self.size -= partial.size
+        return partial
+
+    def expire(self):
+        """
+        Evict the partial messages past their timeout.
+        """
+        now = time.monotonic()
+        while self.partials:
+            fragment_id, partial = next(iter(self.partials.items()))
+            if partial.expires > now:
+                break
+            self._discard(fragment_id)
+            self.evicted += 1
+
+    def add(self, fragment, addr) -> bytes | None:
+        """
+        Add a fragment.
+
+        Args:
+            fragment (Fragment): The fragment.
+            addr: The address the fragment was received from.
+
+        Returns:
+            bytes: The reassembled message if the fragment was the last one missing, None otherwise.
+        """
+        self.expire()
+
+        if not fragment.data or fragment.index >= fragment.count or fragment.count > self.maxcount:
+            self.rejected += 1
+            return None
+
+        partial = self.partials.get(fragment.id)
+        if partial is None:
+            partial = self.partials[fragment.id] = Partial(fragment.count, addr, 0)
+            partial.size = self.PARTIAL_OVERHEAD
+            self.size += self.PARTIAL_OVERHEAD
+        elif partial.count != fragment.count:
+            self.rejected += 1
+            return None
+        if fragment.index in partial.fragments:
+            return None
+
+        partial.fragments[fragment.index] = fragment.data
+        partial.size += len(fragment.data)
+        partial.expires = time.monotonic() + self.timeout
+        self.partials.move_to_end(fragment.id)
+        self.size += len(fragment.data)
+
+        if len(partial.fragments) == partial.count:
+            self._discard(fragment.id)
+            return b"".join(partial.fragments[index] for index in range(partial.count))
+
+        while self.size > self.maxsize or len(self.partials) > self.maxpartials:
+            self._discard(next(iter(self.partials)))
+            self.evicted += 1
+        return None
+
+    def missing(self, fragment_id, limit: int = None) -> list | None:
+        """
+        Returns the indices of the fragments missing from a partial message, up to limit if any,
+        None if the message is not being reassembled (anymore).
+        """
+        self.expire()
+
+        partial = self.partials.get(fragment_id)
+        if partial is None:
+            return None
+        missing = (index for index in range(partial.count) if index not in partial.fragments)
+        return list(itertools.islice(missing, limit))
+
+    def addr(self, fragment_id):
+        """
+        Returns the address the fragments of a partial message are received from.
+        """
+        return self.partials[fragment_id].addr
@@ -0,0 +1,270 @@
+import ctypes
+import ctypes.util
+import errno
+import os
+import socket
+import sys
+
+MSG_DONTWAIT = 0x40
+
+
+class iovec(ctypes.Structure):
+    _fields_ = [
+        ("iov_base", ctypes.c_void_p),
+        ("iov_len", ctypes.c_size_t),
+    ]
+
+
+class sockaddr_in(ctypes.Structure):
+    _fields_ = [
+        ("sin_family", ctypes.c_ushort),
+        ("sin_port", ctypes.c_uint16),
+        ("sin_addr", ctypes.c_uint8 * 4),
+        ("sin_zero", ctypes.c_uint8 * 8),
+    ]
+
+
+class msghdr(ctypes.Structure):
+    _fields_ = [
+        ("msg_name", ctypes.c_void_p),
+        ("msg_namelen", ctypes.c_uint32),
+        ("msg_iov", ctypes.c_void_p),
+        ("msg_iovlen", ctypes.c_size_t),
+        ("msg_control", ctypes.c_void_p),
+        ("msg_controllen", ctypes.c_size_t),
+        ("msg_flags", ctypes.c_int),
+    ]
+
+
+class mmsghdr(ctypes.Structure):
+    _fields_ = [
+        ("msg_hdr", msghdr),
+        ("msg_len", ctypes.c_uint),
+    ]
+
+
+def _load_libc():
+    """
+    Load recvmmsg(2) and sendmmsg(2) from the C library.
+
+    Returns:
+        tuple: The recvmmsg and sendmmsg functions, or None if not available.
+    """
+    if not sys.platform.startswith("linux"):
+        return None  # pragma: no cover
+
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        recvmmsg, sendmmsg = libc.recvmmsg, libc.sendmmsg
+    except (OSError, AttributeError):  # pragma: no cover
+        return None
+
+    recvmmsg.argtypes = [ctypes.c_int, ctypes.POINTER(mmsghdr), ctypes.c_uint, ctypes.c_int, ctypes.c_void_p]
+    recvmmsg.restype = ctypes.c_int
+    sendmmsg.argtypes = [ctypes.c_int, ctypes.POINTER(mmsghdr), ctypes.c_uint, ctypes.c_int]
+    sendmmsg.restype = ctypes.c_int
+    return recvmmsg, sendmmsg
+
+
+LIBC = _load_libc()
+
+
+def _raise_errno():
+    """
+    Raise the errno of the last C library call, unless it means the call would block.
+
+    Returns:
+        int: Zero if the call would block.
+    """
+    err = ctypes.get_errno()
+    if err in (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR):
+        return 0
+    raise OSError(err, os.strerror(err))
+
+
+class Batch:
+    """
+    Batched datagram I/O for a non-blocking IPv4 UDP socket.
+
+    Uses recvmmsg(2) and sendmmsg(2) on Linux to move many datagrams per syscall, and falls back
+    to one recvfrom/sendto per datagram elsewhere. Neither method blocks: they stop as soon as
+    the socket would block.
+    """
+
+    def __init__(self, sock: socket.socket, size: int, vlen: int):
+        """
+        Initialize a Batch instance.
+
+        Args:
+            sock (socket.socket): The socket to read from and write to.
+            size (int): The maximum size of a received datagram.
+            vlen (int): The maximum number of datagrams per syscall.
+        """
+        self.sock = sock
+        self.size = size
+        self.vlen = vlen
+        self.mmsg = LIBC is not None
+
+        if self.mmsg:
+            self._buffers = [ctypes.create_string_buffer(size) for _ in range(vlen)]
+            self._iov = (iovec * vlen)()
+            self._names = (sockaddr_in * vlen)()
+            self._msgs = (mmsghdr * vlen)()
+            self._prepare(self._msgs, self._iov, self._names, vlen)
+            for i, buffer in enumerate(self._buffers):
+                self._iov[i].iov_base = ctypes.addressof(buffer)
+                self._iov[i].iov_len = size
+
+    @staticmethod
+    def _prepare(msgs, iov, names, n):
+        for i in range(n):
+            msgs[i].msg_hdr.msg_name = ctypes.addressof(names) + i * ctypes.sizeof(sockaddr_in)
+            msgs[i].msg_hdr.msg_namelen = ctypes.sizeof(sockaddr_in)
+            msgs[i].msg_hdr.msg_iov = ctypes.addressof(iov) + i * ctypes.sizeof(iovec)
+            msgs[i].msg_hdr.msg_iovlen = 1
+
+    def recv(self, n):
+        """
+        Receive up to n datagrams that are already queued on the socket.
+
+        Args:
+            n (int): The maximum number of datagrams to receive.
+
+        Returns:
+            list: The received (data, addr) tuples.
+        """
+        if n <= 0:
+            return []
+
+        if not self.mmsg:
+            return self._recv(n)
+
+        datagrams = []
+        while n > 0:
+            vlen = min(n, self.vlen)
+            for i in range(vlen):
+                self._msgs[i].msg_hdr.msg_namelen = ctypes.sizeof(sockaddr_in)
+
+            received = LIBC[0](self.sock.fileno(), self._msgs, vlen, MSG_DONTWAIT, None)
+            if received < 0:
+                received = _raise_errno()
+
+            for i in range(received):
+                data = ctypes.string_at(self._buffers[i], self._msgs[i].msg_len)
+                name = self._names[i]
+                datagrams.append((data, (socket.inet_ntoa(bytes(name.sin_addr)), socket.ntohs(name.sin_port))))
+
+            if received < vlen:
+                break
+            n -= received
+        return datagrams
+
+    def _recv(self, n):
+        datagrams = []
+        for _ in range(n):
+            try:
+                datagrams.append(self.sock.recvfrom(self.size))
+            except (BlockingIOError, InterruptedError):
+                break
+        return datagrams
+
+    def recv_into(self, buffers):
+        """
+        Receive datagrams that are already queued on the socket into the given buffers,
+        at most one datagram per buffer.
+
+        Args:
+            buffers (list): The writable buffers (e.g. bytearray) to receive into.
+
+        Returns:
+            list: The (nbytes, addr) tuples, one per filled buffer, in order.
+        """
+        if not self.mmsg:
+            return self._recv_into(buffers)
+
+        datagrams = []
+        while len(datagrams) < len(buffers):
+            start = len(datagrams)
+            end = start + self.vlen
+            chunk = buffers[start:end]
+            vlen = len(chunk)
+
+            iov = (iovec * vlen)()
+            names = (sockaddr_in * vlen)()
+            msgs = (mmsghdr * vlen)()
+            self._prepare(msgs, iov, names, vlen)
+            views = [(ctypes.c_char * len(buffer)).from_buffer(buffer) for buffer in chunk]
+            for i, view in enumerate(views):
+                iov[i].iov_base = ctypes.addressof(view)
+                iov[i].iov_len = len(view)
+
+            received = LIBC[0](self.sock.fileno(), msgs, vlen, MSG_DONTWAIT, None)
+            del views
+            if received < 0:
+                received = _raise_errno()
+
+            for i in range(received):
+                name = names[i]
+                datagrams.append(
+                    (msgs[i].msg_len, (socket.inet_ntoa(bytes(name.sin_addr)), socket.ntohs(name.sin_port)))
+                )
+
+            if received < vlen:
+                break
+        return datagrams
+
+    def _recv_into(self, buffers):
+        datagrams = []
+        for buffer in buffers:
+            try:
+                datagrams.append(self.sock.recvfrom_into(buffer))
+            except (BlockingIOError, InterruptedError):
+                break
+        return datagrams
+
+    def send(self, datagrams):
+        """
+        Send datagrams until the socket would block.
+
+        Args:
+            datagrams (list): The (data, addr) tuples to send, where addr is an (ip, port) tuple.
+
+        Returns:
+            int: The number of datagrams sent, in order.
+        """
+        if not self.mmsg:
+            return self._send(datagrams)
+
+        sent = 0
+        while sent < len(datagrams):
+            end = sent + self.vlen
+            chunk = datagrams[sent:end]
+            vlen = len(chunk)
+
+            iov = (iovec * vlen)()
+            names = (sockaddr_in * vlen)()
+            msgs = (mmsghdr * vlen)()
+            self._prepare(msgs, iov, names, vlen)
+            for i, (data, (host, port)) in enumerate(chunk):
+                iov[i].iov_base = ctypes.cast(ctypes.c_char_p(data), ctypes.c_void_p)
+                iov[i].iov_len = len(data)
+                names[i].sin_family = socket.AF_INET
+                names[i].sin_port = socket.htons(port)
+                names[i].sin_addr[:] = socket.inet_aton(host)
+
+            result = LIBC[1](self.sock.fileno(), msgs, vlen, MSG_DONTWAIT)
+            if result < 0:
+                result = _raise_errno()
+
+            sent += result
+            if result < vlen:
+                break
+        return sent
+
+    def _send(self, datagrams):
+        for i, (data, addr) in enumerate(datagrams):
+            try:
+                self.sock.sendto(data, addr)
+            except (BlockingIOError, InterruptedError):
+                return i
+        return len(datagrams)
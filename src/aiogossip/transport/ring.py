@@ -0,0 +1,60 @@
+import collections
+
+
+class Ring:
+    """
+    A ring of preallocated receive buffers.
+
+    Buffers are acquired by index, filled in place (e.g. with recvfrom_into) and read through
+    memoryview slices, then released back to the ring once their contents have been handed off.
+    """
+
+    def __init__(self, size: int, count: int):
+        """
+        Initialize a Ring instance.
+
+        Args:
+            size (int): The size of each buffer in bytes.
+            count (int): The number of buffers.
+        """
+        self.buffers = [bytearray(size) for _ in range(count)]
+        self.views = [memoryview(buffer) for buffer in self.buffers]
+        self._free = collections.deque(range(count))
+
+    def __len__(self):
+        """
+        Returns the number of free buffers.
+        """
+        return len(self._free)
+
+    def acquire(self, n):
+        """
+        Acquire up to n free buffers.
+
+        Args:
+            n (int): The maximum number of buffers to acquire.
+
+        Returns:
+            list: The indices of the acquired buffers.
+        """
+        n = min(n, len(self._free))
+        return [self._free.popleft() for _ in range(n)]
+
+    def release(self, index):
+        """
+        Release a buffer back to the ring.
+
+        Args:
+            index (int): The index of the buffer.
+        """
+        self._free.append(index)
+
+    def view(self, index, nbytes):
+        """
+        Returns a memoryview of the first nbytes of a buffer.
+
+        Args:
+            index (int): The index of the buffer.
+            nbytes (int): The number of bytes to view.
+        """
+        return self.views[index][:nbytes]
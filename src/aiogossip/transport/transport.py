@@ -1,12 +1,21 @@
 import asyncio
 import ipaddress
 import logging
+import math
 import os
 import socket
 import sys
+import uuid
 
+from google.protobuf.message import DecodeError
+
+from ..message_pb2 import Fragment, Message
 from . import codec
 from .address import Address
+from .compression import ALGORITHMS, Dictionaries
+from .fragment import Reassembly
+from .mmsg import Batch
+from .ring import Ring
 
 logger = logging.getLogger(__name__)
 logger.addHandler(logging.StreamHandler(sys.stdout))
@@ -14,24 +23,122 @@ if os.environ.get("DEBUG"):
     logger.setLevel(logging.DEBUG)  # pragma: no cover
 
 
+class Protocol(asyncio.DatagramProtocol):
+    """
+    Datagram protocol that hands received datagrams over to the transport.
+    """
+
+    def __init__(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        self.transport.datagram_received(data, addr)
+
+    def error_received(self, exc):
+        logger.debug(f"DEBUG: {self.transport.sock.getsockname()[1]} error: {exc}\n")
+
+
 class Transport:
     """
     Represents a transport layer for sending and receiving messages over UDP.
+
+    The socket is bound on creation and attached to the event loop with a datagram endpoint
+    on first use, so received datagrams are pushed into a bounded queue by the event loop
+    instead of being polled per packet.
+
+    In batch mode every wakeup drains the datagrams already queued on the socket, and
+    `send_many` flushes many datagrams at once, with recvmmsg/sendmmsg where available.
+    In zero-copy mode the drained datagrams are received into a preallocated ring of buffers
+    and decoded straight from memoryview slices.
+
+    In coalesce mode messages passed to `send` are queued per destination and flushed after
+    COALESCE_DELAY seconds, packed into one batch datagram per destination up to PACKET_SIZE.
+    Batch datagrams are unpacked on receive, whatever the mode.
+
+    Messages larger than PACKET_SIZE, up to MESSAGE_SIZE, are split into fragment datagrams and
+    reassembled on receive. Fragments still missing FRAGMENT_RETRANSMIT seconds after the first
+    one of a message are requested again from the sender, up to MISSING_REQUESTS times with an
+    exponential backoff, and the sender keeps the fragments it sent for FRAGMENT_TIMEOUT seconds.
+    Partial messages are dropped after FRAGMENT_TIMEOUT seconds without progress, or once more than
+    REASSEMBLY_SIZE bytes or REASSEMBLY_PARTIALS messages are held.
+
+    With compression, payloads of at least COMPRESSION_THRESHOLD bytes are compressed with zlib,
+    lzma or zstd, see `compression`, with the dictionaries registered on the transport. Compressed
+    payloads are decompressed on receive, whatever the compression of the transport, up to
+    MESSAGE_SIZE bytes.
+
+    With a `piggyback`, the free space of every datagram up to PACKET_SIZE, once coalesced, is
+    filled with the data returned by `piggyback.pack(size)`, carried by the last message of the
+    datagram, and the data piggybacked on received messages is passed to `piggyback.unpack(data, addr)`,
+    so other protocols ride on existing traffic without any extra datagram. Fragments carry no
+    piggybacked data.
     """
 
     PACKET_SIZE = 4096
+    QUEUE_SIZE = 1024
+    BATCH_SIZE = 64
+    RING_SIZE = 256
+    COALESCE_DELAY = 0.001
+    MESSAGE_SIZE = 1 << 20
+    FRAGMENT_OVERHEAD = 64  # bytes of a fragment datagram besides the message data
+    FRAGMENT_RETRANSMIT = 0.05
+    FRAGMENT_TIMEOUT = 1.0
+    REASSEMBLY_SIZE = 1 << 24
+    REASSEMBLY_PARTIALS = 1024  # the maximum number of messages being reassembled
+    MISSING_SIZE = 256  # the maximum number of fragments requested again at once
+    MISSING_REQUESTS = 3  # the maximum number of requests for the missing fragments of a message
+    COMPRESSION_THRESHOLD = 256
+    PIGGYBACK_OVERHEAD = 4  # bytes of the piggyback field besides its data, and of its batch framing
+
+    def __init__(
+        self,
+        bind,
+        loop: asyncio.AbstractEventLoop,
+        batch=True,
+        zerocopy=False,
+        coalesce=False,
+        compression=None,
+    ):
+        if compression is not None and compression not in ALGORITHMS:
+            raise ValueError(f"Unknown compression algorithm: {compression}")
 
-    def __init__(self, bind, loop: asyncio.AbstractEventLoop):
         self._loop = loop
 
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         self.sock.bind(bind)
         self.sock.setblocking(False)
 
+        self._endpoint = None
+        self._queue = asyncio.Queue(maxsize=self.QUEUE_SIZE)
+
+        self.batch = Batch(self.sock, self.PACKET_SIZE, self.BATCH_SIZE) if batch else None
+        self.ring = Ring(self.PACKET_SIZE, self.RING_SIZE) if batch and zerocopy else None
+
+        self.coalesce = coalesce
+        self.compression = compression
+        self.dictionaries = Dictionaries()
+        self._outbox = {}  # sockaddr -> serialized messages waiting to be flushed
+        self._outbox_sizes = {}  # sockaddr -> size of the messages once packed in a batch
+        self._flush_handle = None
+
+        self.piggyback = None  # see class docstring
+
+        maxcount = math.ceil(self.MESSAGE_SIZE / (self.PACKET_SIZE - self.FRAGMENT_OVERHEAD))
+        self.reassembly = Reassembly(self.REASSEMBLY_SIZE, self.FRAGMENT_TIMEOUT, maxcount, self.REASSEMBLY_PARTIALS)
+        self._fragments = {}  # fragment id -> fragments sent, their address and expiry handle
+
         self.rx_bytes = 0
         self.rx_packets = 0
+        self.rx_batches = 0
+        self.rx_dropped = 0
+        self.rx_errors = 0
+        self.rx_fragments = 0
         self.tx_bytes = 0
         self.tx_packets = 0
+        self.tx_batches = 0
+        self.tx_coalesced = 0
+        self.tx_fragments = 0
+        self.tx_retransmits = 0
 
     @property
     def addr(self):
@@ -42,21 +149,129 @@ class Transport:
         ip = ipaddress.ip_address(ip)
         return Address(ip, port)
 
-    async def send(self, message, addr: Address):
+    def register_dictionary(self, topic, zdict):
         """
-        Sends a message to the specified address.
+        Register a compression dictionary for the payloads of a topic, see `Dictionaries.register`.
 
         Args:
-            message: The message to send.
-            addr: The address to send the message to.
+            topic (str): The topic.
+            zdict (bytes): The dictionary.
 
-        Raises:
-            TypeError: If the address is not of type Address.
-            ValueError: If the message size exceeds the packet size.
+        Returns:
+            int: The id of the dictionary.
+        """
+        return self.dictionaries.register(topic, zdict)
+
+    async def connect(self):
+        """
+        Attaches the socket to the event loop, if not attached yet.
 
         Returns:
-            None
+            The datagram transport of the event loop.
+        """
+        if self._endpoint is None:
+            self._endpoint = self._loop.create_task(
+                self._loop.create_datagram_endpoint(lambda: Protocol(self), sock=self.sock)
+            )
+        endpoint, _ = await self._endpoint
+        return endpoint
+
+    def datagram_received(self, data, addr):
+        """
+        Queues a received datagram. Datagrams are dropped when the queue is full.
+
+        In batch mode the datagrams already waiting on the socket are drained as well,
+        up to the free space of the queue.
+
+        Args:
+            data: The received datagram.
+            addr: The address the datagram was received from.
         """
+        datagrams = [(data, addr, None)]
+        if self.batch:
+            try:
+                datagrams.extend(self._drain(self._queue.maxsize - self._queue.qsize() - 1))
+            except OSError as exc:
+                logger.debug(f"DEBUG: {self.sock.getsockname()[1]} error: {exc}\n")
+
+        rx_bytes = 0
+        rx_packets = 0
+        for data, addr, index in datagrams:
+            nbytes = len(data)
+            if codec.is_fragment(data):
+                data = self._recv_fragment(data, addr)
+                if index is not None:
+                    self.ring.release(index)
+                    index = None
+                if data is None:
+                    rx_bytes += nbytes
+                    rx_packets += 1
+                    continue
+
+            try:
+                messages = codec.unpack(data)
+            except DecodeError as exc:
+                logger.debug(f"DEBUG: {self.sock.getsockname()[1]} error: {exc}\n")
+                messages = [data]
+
+            if len(messages) > 1 and index is not None:
+                # messages of a batch outlive the ring buffer slot of the datagram
+                messages = codec.unpack(bytes(data))
+                self.ring.release(index)
+                index = None
+
+            queued = 0
+            for message in messages:
+                try:
+                    self._queue.put_nowait((message, addr, index))
+                except asyncio.QueueFull:
+                    self.rx_dropped += 1
+                    if index is not None:
+                        self.ring.release(index)
+                    continue
+                queued += 1
+
+            if queued:
+                rx_bytes += nbytes
+                rx_packets += 1
+
+        self.rx_bytes += rx_bytes
+        self.rx_packets += rx_packets
+        self.rx_batches += 1
+
+    def _drain(self, n):
+        if not self.ring:
+            return [(data, addr, None) for data, addr in self.batch.recv(n)]
+
+        indices = self.ring.acquire(n)
+        received = []
+        try:
+            received = self.batch.recv_into([self.ring.buffers[i] for i in indices])
+        finally:
+            filled = len(received)
+            for index in indices[filled:]:
+                self.ring.release(index)
+
+        return [(self.ring.view(index, nbytes), addr, index) for index, (nbytes, addr) in zip(indices, received)]
+
+    def _decode(self, datagram, lazy=False):
+        data, addr, index = datagram
+        try:
+            message = codec.decode(data, lazy=lazy, dictionaries=self.dictionaries, max_size=self.MESSAGE_SIZE)
+        finally:
+            if index is not None:
+                self.ring.release(index)
+
+        addr = Address(ipaddress.ip_address(addr[0]), int(addr[1]))
+
+        piggyback = message.piggyback
+        if piggyback:
+            message.piggyback = b""
+            if self.piggyback is not None:
+                self.piggyback.unpack(piggyback, addr)
+        return message, addr
+
+    def _encode(self, message, addr: Address):
         if not isinstance(addr, Address):
             raise TypeError(f"Address must be a tuple, got: {type(addr)}")
         if not isinstance(addr.ip, (ipaddress.IPv4Address, ipaddress.IPv6Address)):
@@ -64,35 +279,269 @@ class Transport:
         if not isinstance(addr.port, int):
             raise TypeError(f"Port must be an integer, got: {type(addr.port)}")
 
-        msg = codec.encode(message)
-        if len(msg) > self.PACKET_SIZE:
-            raise ValueError(f"Message size exceeds packet size of {self.PACKET_SIZE} bytes: {len(msg)}")
+        msg = codec.encode(
+            message,
+            algorithm=self.compression,
+            threshold=self.COMPRESSION_THRESHOLD,
+            dictionaries=self.dictionaries,
+        )
+        if len(msg) > self.MESSAGE_SIZE:
+            raise ValueError(f"Message size exceeds message size of {self.MESSAGE_SIZE} bytes: {len(msg)}")
+
+        sockaddr = (addr.ip.exploded, addr.port)
+        if len(msg) <= self.PACKET_SIZE:
+            return [(msg, sockaddr)]
+        return [(fragment, sockaddr) for fragment in self._fragment(msg, sockaddr)]
+
+    def _piggyback(self, msg, size):
+        """
+        Returns the last message of a datagram of size bytes, with data piggybacked in its free space.
+        """
+        if self.piggyback is None:
+            return msg
+        piggyback = self.piggyback.pack(self.PACKET_SIZE - size - self.PIGGYBACK_OVERHEAD)
+        if not piggyback:
+            return msg
+        return msg + codec.encode_field(codec.FIELD_PIGGYBACK, piggyback)
+
+    # Fragmentation #
+
+    def _fragment(self, msg, sockaddr):
+        fragment_id = uuid.uuid4().bytes
+        fragments = codec.fragment(msg, self.PACKET_SIZE - self.FRAGMENT_OVERHEAD, fragment_id)
+        expiry = self._loop.call_later(self.FRAGMENT_TIMEOUT, self._fragments.pop, fragment_id, None)
+        self._fragments[fragment_id] = (fragments, sockaddr, expiry)
+        self.tx_fragments += len(fragments)
+        return fragments
+
+    def _recv_fragment(self, data, addr):
+        try:
+            fragment = Message.FromString(data).fragment
+        except DecodeError as exc:
+            logger.debug(f"DEBUG: {self.sock.getsockname()[1]} error: {exc}\n")
+            return None
+
+        if fragment.missing:
+            self._retransmit(fragment, addr)
+            return None
 
-        await self._loop.sock_sendto(self.sock, msg, (addr.ip.exploded, addr.port))
+        self.rx_fragments += 1
+        partial = fragment.id in self.reassembly
+        data = self.reassembly.add(fragment, addr)
+        if not partial and fragment.id in self.reassembly:
+            self._loop.call_later(self.FRAGMENT_RETRANSMIT, self._request_missing, fragment.id)
+        return data
+
+    def _request_missing(self, fragment_id, requests=0):
+        missing = self.reassembly.missing(fragment_id, limit=self.MISSING_SIZE)
+        endpoint, _ = self._endpoint.result()
+        if not missing or endpoint.is_closing() or requests >= self.MISSING_REQUESTS:
+            return
+
+        msg = codec.encode(Message(fragment=Fragment(id=fragment_id, missing=missing)))
+        endpoint.sendto(msg, self.reassembly.addr(fragment_id))
         self.tx_packets += 1
         self.tx_bytes += len(msg)
+        # backs off exponentially
+        delay = self.FRAGMENT_RETRANSMIT * 2 ** (requests + 1)
+        self._loop.call_later(delay, self._request_missing, fragment_id, requests + 1)
+
+    def _retransmit(self, fragment, addr):
+        fragments, sockaddr, _ = self._fragments.get(fragment.id, ([], None, None))
+        # only to the address the fragments were sent to
+        if tuple(addr[:2]) != sockaddr:
+            return
+        datagrams = [(fragments[index], addr) for index in sorted(set(fragment.missing)) if index < len(fragments)]
+        if datagrams:
+            endpoint, _ = self._endpoint.result()
+            self._sendto(endpoint, datagrams)
+            self.tx_retransmits += len(datagrams)
+
+    async def send(self, message, addr: Address):
+        """
+        Sends a message to the specified address.
+
+        Args:
+            message: The message to send.
+            addr: The address to send the message to.
+
+        Raises:
+            TypeError: If the address is not of type Address.
+            ValueError: If the message size exceeds the message size.
+
+        Returns:
+            None
+        """
+        datagrams = self._encode(message, addr)
+
+        endpoint = await self.connect()
+        if len(datagrams) > 1:
+            self._sendto(endpoint, datagrams)
+        elif self.coalesce:
+            self._coalesce(*datagrams[0])
+        else:
+            msg, sockaddr = datagrams[0]
+            msg = self._piggyback(msg, len(msg))
+            endpoint.sendto(msg, sockaddr)
+            self.tx_packets += 1
+            self.tx_bytes += len(msg)
 
         logger.debug(f"DEBUG: {self.addr[1]} > {addr[1]} send: {message}\n")
 
-    async def recv(self):
+    async def send_many(self, messages, addrs, return_exceptions=False):
+        """
+        Sends messages to the specified addresses as one batch.
+
+        Args:
+            messages: The messages to send.
+            addrs: The addresses to send the messages to, one per message.
+            return_exceptions: Skip the messages that cannot be sent and return their exceptions,
+                instead of raising the first one and sending none.
+
+        Raises:
+            TypeError: If an address is not of type Address.
+            ValueError: If a message size exceeds the message size, or the number of
+                messages and addresses differ.
+
+        Returns:
+            list: If return_exceptions, the exception of every message, None if it was sent.
+        """
+        if len(messages) != len(addrs):
+            raise ValueError(f"Expected one address per message, got: {len(messages)} != {len(addrs)}")
+
+        datagrams, exceptions = [], []
+        for message, addr in zip(messages, addrs):
+            try:
+                datagrams.extend(self._encode(message, addr))
+                exceptions.append(None)
+            except (TypeError, ValueError) as exc:
+                if not return_exceptions:
+                    raise
+                exceptions.append(exc)
+
+        if not datagrams:
+            return exceptions if return_exceptions else None
+
+        datagrams = [(msg if codec.is_fragment(msg) else self._piggyback(msg, len(msg)), a) for msg, a in datagrams]
+        self._sendto(await self.connect(), datagrams)
+
+        logger.debug(f"DEBUG: {self.addr[1]} > {[a[1] for a in addrs]} send: {len(datagrams)} datagrams\n")
+        if return_exceptions:
+            return exceptions
+
+    def _sendto(self, endpoint, datagrams):
+        sent = 0
+        if self.batch and not endpoint.get_write_buffer_size():
+            try:
+                sent = self.batch.send(datagrams)
+            except OSError as exc:
+                logger.debug(f"DEBUG: {self.addr[1]} error: {exc}\n")
+
+        # datagrams the socket did not take are buffered by the datagram transport
+        for msg, sockaddr in datagrams[sent:]:
+            endpoint.sendto(msg, sockaddr)
+
+        self.tx_packets += len(datagrams)
+        self.tx_bytes += sum(len(msg) for msg, _ in datagrams)
+        self.tx_batches += 1
+
+    def _coalesce(self, msg, sockaddr):
+        size = codec.batch_size(msg)
+        if sockaddr in self._outbox and self._outbox_sizes[sockaddr] + size > self.PACKET_SIZE:
+            self._flush([sockaddr])
+
+        if size > self.PACKET_SIZE:
+            # too large to be packed in a batch, sent as is
+            endpoint, _ = self._endpoint.result()
+            self._sendto(endpoint, [(self._piggyback(msg, len(msg)), sockaddr)])
+            return
+
+        self._outbox.setdefault(sockaddr, []).append(msg)
+        self._outbox_sizes[sockaddr] = self._outbox_sizes.get(sockaddr, 0) + size
+
+        if self._flush_handle is None:
+            self._flush_handle = self._loop.call_later(self.COALESCE_DELAY, self.flush)
+
+    def _flush(self, sockaddrs):
+        datagrams = []
+        for sockaddr in sockaddrs:
+            msgs = self._outbox.pop(sockaddr)
+            size = self._outbox_sizes.pop(sockaddr)
+            if len(msgs) == 1:
+                datagrams.append((self._piggyback(msgs[0], len(msgs[0])), sockaddr))
+            else:
+                msgs[-1] = self._piggyback(msgs[-1], size)
+                datagrams.append((codec.pack(msgs), sockaddr))
+                self.tx_coalesced += len(msgs)
+
+        if datagrams:
+            endpoint, _ = self._endpoint.result()
+            self._sendto(endpoint, datagrams)
+
+    def flush(self):
+        """
+        Sends the messages queued by `send` in coalesce mode now.
+        """
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        self._flush(list(self._outbox))
+
+    async def recv(self, lazy=False):
         """
         Receives a message from the transport.
 
+        Args:
+            lazy: Decode only the envelope of the message, see `codec.Envelope`.
+
         Returns:
             A tuple containing the received message and the address it was received from.
         """
-        msg, addr = await self._loop.sock_recvfrom(self.sock, self.PACKET_SIZE)
-        self.rx_packets += 1
-        self.rx_bytes += len(msg)
-
-        addr = Address(ipaddress.ip_address(addr[0]), int(addr[1]))
-        message = codec.decode(msg)
+        await self.connect()
+        message, addr = self._decode(await self._queue.get(), lazy=lazy)
         logger.debug(f"DEBUG: {self.addr.port} < {addr.port} recv: {message}\n")
 
         return message, addr
 
+    async def recv_batch(self, max_n, lazy=False):
+        """
+        Receives up to max_n messages from the transport, waiting only for the first one.
+
+        Args:
+            max_n: The maximum number of messages to receive.
+            lazy: Decode only the envelopes of the messages, see `codec.Envelope`.
+
+        Returns:
+            A list of tuples containing the received message and the address it was received from.
+
+        Raises:
+            DecodeError: If the first message cannot be decoded. The later messages that cannot be
+                decoded are counted in rx_errors and skipped, the ones decoded are still returned.
+        """
+        messages = [await self.recv(lazy=lazy)]
+        while len(messages) < max_n and not self._queue.empty():
+            try:
+                messages.append(self._decode(self._queue.get_nowait(), lazy=lazy))
+            except DecodeError as exc:
+                self.rx_errors += 1
+                logger.debug(f"DEBUG: {self.addr.port} decode error: {exc}\n")
+        return messages
+
     def close(self):
         """
         Closes the transport.
         """
+        for _, _, expiry in self._fragments.values():
+            expiry.cancel()
+        self._fragments.clear()
+
+        endpoint = self._endpoint
+        if endpoint is not None and endpoint.done() and not endpoint.cancelled() and not endpoint.exception():
+            self.flush()
+            endpoint, _ = endpoint.result()
+            endpoint.close()
+            return
+
+        if endpoint is not None:
+            endpoint.cancel()
         self.sock.close()
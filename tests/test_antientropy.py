@@ -0,0 +1,21 @@
+import uuid
+
+from aiogossip.antientropy import Buckets
+
+
+def test_buckets():
+    ids = [uuid.uuid4().bytes for _ in range(100)]
+    buckets1 = Buckets()
+    buckets2 = Buckets()
+    for message_id in ids:
+        buckets1.add(message_id)
+    for message_id in reversed(ids):
+        buckets2.add(message_id)
+    assert buckets1.diff(buckets2.sums) == set()
+
+    buckets2.remove(ids[0])
+    assert buckets1.diff(buckets2.sums) == {buckets1.bucket(ids[0])}
+
+    buckets2.add(ids[0])
+    assert buckets1.diff(buckets2.sums) == set()
+    assert buckets1.diff([0] * 8) == set(range(Buckets.BUCKETS))
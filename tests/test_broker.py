@@ -3,6 +3,8 @@ from unittest.mock import MagicMock
 
 import pytest
 
+from aiogossip.message_pb2 import Message
+
 
 class AsyncMagicMock(MagicMock):
     async def __call__(self, *args, **kwargs):
@@ -77,9 +79,10 @@ async def test_connect_cleans_up_empty_topics(brokers, message):
 
     handler = broker.subscribe(topic, MagicMock())
     assert topic in broker.handlers
+    assert topic in broker.topics
     await broker.unsubscribe(handler)
-    assert topic in broker.handlers
-    assert len(broker.handlers[topic]) == 0
+    assert topic not in broker.handlers
+    assert topic not in broker.topics
 
     await broker.listen()
     assert topic not in broker.handlers
@@ -128,3 +131,34 @@ async def test_publish_to_specific_nodes(brokers, message):
 
     await pub.close()
     await sub.close()
+
+
+@pytest.mark.parametrize("random_seed", [0])
+@pytest.mark.parametrize("instances", [1])
+@pytest.mark.asyncio
+async def test_publish_correlation(brokers, message):
+    broker = brokers[0]
+    broker.TIMEOUT = 0.05
+
+    ack = Message(id=message.id, kind=[Message.Kind.ACK])
+
+    async def recv():
+        yield ack
+
+    broker.gossip.recv = recv
+
+    response = await broker.publish("test", message)
+    assert message.id in broker.correlations
+    assert not broker.handlers
+
+    await broker.listen()
+    assert [m async for m in response] == [ack]
+    assert message.id not in broker.correlations
+
+    # expires without being received
+    await broker.publish("test", message)
+    assert len(broker.timers) == 1
+    await asyncio.sleep(0.1)
+    assert message.id not in broker.correlations
+    assert len(broker.timers) == 0
+    await broker.close()
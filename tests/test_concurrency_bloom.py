@@ -0,0 +1,71 @@
+import time
+import uuid
+
+import pytest
+
+from aiogossip.concurrency.bloom import BloomFilter, BloomMutex
+
+
+def test_bloom_filter():
+    bloom = BloomFilter(1000, 0.01)
+    assert bloom.hashes == 7
+    assert bloom.fill_ratio == 0.0
+
+    keys = [uuid.uuid4().bytes for _ in range(1000)]
+    for key in keys:
+        bloom.add(bloom.indexes(bloom.digest(key)))
+    assert all(key in bloom for key in keys)
+    assert len(bloom) == 1000
+    assert 0.4 < bloom.fill_ratio < 0.6
+    assert bloom.error_rate == pytest.approx(0.01, rel=0.5)
+
+    false_positives = sum(uuid.uuid4().bytes in bloom for _ in range(10000))
+    assert false_positives < 300
+
+    with pytest.raises(ValueError):
+        BloomFilter(0, 0.01)
+    with pytest.raises(ValueError):
+        BloomFilter(1000, 1)
+
+
+def test_bloom_mutex():
+    mutex = BloomMutex(capacity=1000)
+    assert mutex.acquire(b"a")
+    assert not mutex.acquire(b"a")
+    assert b"a" in mutex
+    assert "b" not in mutex
+    assert mutex.hit_rate == 0.5
+    assert mutex.fill_ratio > 0
+    assert mutex.error_rate < 0.001
+
+    with pytest.raises(ValueError):
+        BloomMutex(generations=1)
+
+
+def test_bloom_mutex_rotation():
+    mutex = BloomMutex(capacity=100, generations=3)
+
+    # the newest generation rotates at its share of capacity, the oldest is dropped
+    ids = [b"id%d" % i for i in range(200)]
+    for mutex_id in ids[:150]:
+        assert mutex.acquire(mutex_id)
+    assert len(mutex._filters) == 3
+    assert len(mutex) == 150
+    assert ids[0] in mutex
+
+    for mutex_id in ids[150:]:
+        assert mutex.acquire(mutex_id)
+    assert len(mutex) == 150
+    assert ids[0] not in mutex
+    assert ids[-1] in mutex
+
+
+def test_bloom_mutex_ttl():
+    mutex = BloomMutex(ttl=0.02, capacity=100)
+    assert mutex.acquire(b"a")
+    time.sleep(0.025)
+    assert b"a" in mutex
+    time.sleep(0.025)
+    assert b"a" not in mutex
+    assert len(mutex) == 0
+    assert mutex.acquire(b"a")
@@ -1,8 +1,9 @@
 import asyncio
+import time
 
 import pytest
 
-from aiogossip.concurrency.mutex import MUTEX, mutex
+from aiogossip.concurrency.mutex import Mutex
 
 
 @pytest.mark.asyncio
@@ -16,27 +17,56 @@ async def test_mutex():
         return True
 
     mutex_id = "test_mutex"
+    mutex1 = Mutex()
+    mutex2 = Mutex()
 
-    assert mutex_id not in MUTEX[func1]
-    assert mutex_id not in MUTEX[func2]
+    assert mutex_id not in mutex1
+    assert mutex_id not in mutex2
 
-    decorated_func1 = mutex(func1, mutex_id)(func1)
-    decorated_func2 = mutex(func2, mutex_id)(func2)
+    decorated_func1 = mutex1(mutex_id)(func1)
+    decorated_func2 = mutex2(mutex_id)(func2)
 
     decorated_func_task1 = asyncio.create_task(decorated_func1())
     decorated_func_task2 = asyncio.create_task(decorated_func2())
 
     await asyncio.sleep(0.01)
 
-    assert mutex_id in MUTEX[func1]
-    assert mutex_id in MUTEX[func2]
+    assert mutex_id in mutex1
+    assert mutex_id in mutex2
 
     assert (await decorated_func1()) is None
     assert (await decorated_func2()) is None
 
     await asyncio.sleep(0.02)
     assert (await decorated_func_task1) is True
-    assert mutex_id in MUTEX[func1]
-    assert mutex_id in MUTEX[func2]
+    assert mutex_id in mutex1
+    assert mutex_id in mutex2
 
     assert (await decorated_func_task2) is True
+    assert mutex1.hit_rate == 0.5
+
+
+def test_mutex_ttl():
+    mutex = Mutex(ttl=0.01)
+    assert mutex.acquire("a")
+    assert not mutex.acquire("a")
+
+    time.sleep(0.02)
+    assert "a" not in mutex
+    assert mutex.acquire("a")
+    assert len(mutex) == 1
+
+
+def test_mutex_maxsize():
+    mutex = Mutex(maxsize=3)
+    assert mutex.hit_rate == 0.0
+
+    for mutex_id in range(5):
+        assert mutex.acquire(mutex_id)
+    assert len(mutex) == 3
+    assert list(mutex._ids) == [2, 3, 4]
+
+    assert not mutex.acquire(4)
+    assert mutex.acquire(0)
+    assert list(mutex._ids) == [3, 4, 0]
+    assert (mutex.hits, mutex.misses) == (1, 6)
@@ -0,0 +1,83 @@
+import asyncio
+
+import pytest
+
+from aiogossip.concurrency import TimerWheel
+
+
+@pytest.mark.asyncio
+async def test_timerwheel(event_loop):
+    wheel = TimerWheel(loop=event_loop, resolution=0.01, slots=4)
+    fired = []
+
+    for delay in (0.05, 0.01, 0.03, 0):
+        wheel.schedule(delay, fired.append, delay)
+    cancelled = wheel.schedule(0.02, fired.append, 0.02)
+    assert len(wheel) == 5
+
+    cancelled.cancel()
+    cancelled.cancel()
+    assert len(wheel) == 4
+
+    await asyncio.sleep(0.02)
+    assert sorted(fired) == [0, 0.01]
+    assert 0.05 not in fired
+
+    # the timer more than a rotation away fires on a later rotation
+    await asyncio.sleep(0.06)
+    assert sorted(fired) == [0, 0.01, 0.03, 0.05]
+    assert len(wheel) == 0
+    assert wheel._handle is None
+
+
+@pytest.mark.asyncio
+async def test_timerwheel_reschedule(event_loop):
+    wheel = TimerWheel(loop=event_loop, resolution=0.01)
+    fired = []
+
+    def callback(n):
+        fired.append(n)
+        if n < 3:
+            wheel.schedule(0.01, callback, n + 1)
+
+    def error():
+        raise RuntimeError("test_timerwheel_reschedule")
+
+    exceptions = []
+    event_loop.set_exception_handler(lambda loop, context: exceptions.append(context["exception"]))
+
+    wheel.schedule(0.01, callback, 0)
+    wheel.schedule(0.01, error)
+    await asyncio.sleep(0.1)
+    assert fired == [0, 1, 2, 3]
+    assert [type(e) for e in exceptions] == [RuntimeError]
+
+
+@pytest.mark.asyncio
+async def test_timerwheel_close(event_loop):
+    wheel = TimerWheel(loop=event_loop)
+    fired = []
+    timer = wheel.schedule(0.01, fired.append, 1)
+    wheel.close()
+    timer.cancel()
+    assert len(wheel) == 0
+
+    await asyncio.sleep(0.05)
+    assert fired == []
+
+
+@pytest.mark.asyncio
+async def test_timerwheel_levels(event_loop):
+    # two levels of 4 slots cover 16 ticks, later timers wait on the last level
+    wheel = TimerWheel(loop=event_loop, resolution=0.005, slots=4, levels=2)
+    fired = []
+    start = event_loop.time()
+
+    for delay in (0.1, 0.03, 0.005):
+        wheel.schedule(delay, lambda delay: fired.append((delay, event_loop.time() - start)), delay)
+    assert wheel._counts == [1, 2]
+
+    await asyncio.sleep(0.15)
+    assert [delay for delay, _ in fired] == [0.005, 0.03, 0.1]
+    assert all(elapsed >= delay for delay, elapsed in fired)
+    assert len(wheel) == 0
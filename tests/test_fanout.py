@@ -0,0 +1,65 @@
+import pytest
+
+from aiogossip.fanout import AdaptiveFanout
+
+
+def receive(adaptive, message_class, duplicates=0, missed=False):
+    for _ in range(adaptive.WINDOW):
+        adaptive.received(message_class, missed=missed)
+        for _ in range(duplicates):
+            adaptive.received(message_class, duplicate=True)
+
+
+def test_adaptive_fanout():
+    adaptive = AdaptiveFanout(fanout=(2, 4), cycles=(1, 3))
+    assert adaptive.get("a", fanout=3, cycles=2) == (3, 2)
+    assert adaptive.get("b", fanout=10, cycles=0) == (4, 1)
+
+    # too many duplicates: fanout first, then cycles
+    receive(adaptive, "a", duplicates=5)
+    assert adaptive.get("a") == (2, 2)
+    receive(adaptive, "a", duplicates=5)
+    assert adaptive.get("a") == (2, 1)
+    receive(adaptive, "a", duplicates=5)
+    assert adaptive.get("a") == (2, 1)
+
+    # within the target duplicate ratio
+    receive(adaptive, "a", duplicates=2)
+    assert adaptive.get("a") == (2, 1)
+
+    # messages missed: fanout first, then cycles
+    receive(adaptive, "a", duplicates=2, missed=True)
+    assert adaptive.get("a") == (3, 1)
+    receive(adaptive, "a", duplicates=2, missed=True)
+    receive(adaptive, "a", duplicates=2, missed=True)
+    assert adaptive.get("a") == (4, 2)
+    receive(adaptive, "a", duplicates=2, missed=True)
+    receive(adaptive, "a", duplicates=2, missed=True)
+    assert adaptive.get("a") == (4, 3)
+
+    # classes are tuned independently
+    assert adaptive.get("b") == (4, 1)
+
+
+def test_adaptive_fanout_few_duplicates():
+    adaptive = AdaptiveFanout(fanout=(1, 10), cycles=(1, 10))
+    adaptive.get("a", fanout=3, cycles=2)
+    receive(adaptive, "a")
+    assert adaptive.get("a") == (4, 2)
+
+
+def test_adaptive_fanout_classes_size():
+    adaptive = AdaptiveFanout()
+    adaptive.CLASSES_SIZE = 2
+    adaptive.get("a")
+    adaptive.get("b")
+    adaptive.received("a")
+    adaptive.get("c")
+    assert list(adaptive.classes) == ["a", "c"]
+
+
+def test_adaptive_fanout_bounds():
+    with pytest.raises(ValueError):
+        AdaptiveFanout(fanout=(0, 1))
+    with pytest.raises(ValueError):
+        AdaptiveFanout(cycles=(3, 2))
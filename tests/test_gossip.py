@@ -1,7 +1,12 @@
 import asyncio
+import uuid
 
 import pytest
 
+from aiogossip.concurrency import BloomMutex
+from aiogossip.fanout import AdaptiveFanout
+from aiogossip.message_pb2 import Digest, Message
+
 
 @pytest.mark.asyncio
 async def test_gossip(gossips, message):
@@ -30,6 +35,34 @@ async def test_gossip(gossips, message):
         gossip.transport.close()
 
 
+@pytest.mark.parametrize("random_seed", [0])
+@pytest.mark.parametrize("instances", [10])
+@pytest.mark.asyncio
+async def test_gossip_bloom_mutex(gossips, message):
+    for gossip in gossips:
+        gossip.mutex = BloomMutex(capacity=1000)
+
+    await gossips[0].send_gossip(message)
+    await gossips[0].send_gossip(message)
+    assert message.id in gossips[0].mutex
+    assert gossips[0].mutex.hits == 1
+
+    async def listener(gossip):
+        try:
+            async with asyncio.timeout(0.1):
+                async for message in gossip.recv():
+                    pass
+        except asyncio.TimeoutError:
+            pass
+
+    await asyncio.gather(*[listener(g) for g in gossips])
+    assert sum(message.id in g.mutex for g in gossips) > 1
+    assert sum(g.transport.rx_packets for g in gossips) <= 2 ** len(gossips)
+
+    for g in gossips:
+        await g.close()
+
+
 @pytest.mark.parametrize("random_seed", [0])
 @pytest.mark.parametrize("instances", [2])
 @pytest.mark.asyncio
@@ -42,3 +75,263 @@ async def test_send_and_receive(gossips, message):
 
     received_message = await anext(gossips[1].recv())
     assert received_message.payload == message.payload
+
+
+@pytest.mark.parametrize("random_seed", [0])
+@pytest.mark.parametrize("instances", [2])
+@pytest.mark.asyncio
+async def test_send_gossip_envelope_cache(gossips, message):
+    gossip = gossips[0]
+    gossip.ENVELOPE_CACHE_SIZE = 2
+
+    message.payload = b"test_send_gossip_envelope_cache"
+    await gossip.send_gossip(message)
+    assert message.id in gossip.envelopes
+    assert message.Kind.GOSSIP not in message.kind
+
+    envelope = gossip._envelope(message)
+    assert envelope.head is gossip.envelopes[message.id].head
+    assert message.Kind.GOSSIP in envelope.kind
+
+    for _ in range(3):
+        await gossip.send_gossip(Message(id=uuid.uuid4().bytes))
+    assert len(gossip.envelopes) == 2
+    assert message.id not in gossip.envelopes
+
+    for g in gossips:
+        await g.close()
+
+
+@pytest.mark.parametrize("random_seed", [0])
+@pytest.mark.parametrize("instances", [2])
+@pytest.mark.asyncio
+async def test_recv_duplicate(gossips, message):
+    message.kind.append(Message.Kind.GOSSIP)
+    message.routing.src_id = gossips[0].peer_id
+    message.routing.dst_id = gossips[1].peer_id
+    msg, addr = gossips[0]._route(message, gossips[1].peer_id)
+    await gossips[0].transport.send(msg, addr)
+    await gossips[0].transport.send(msg, addr)
+
+    messages = []
+    try:
+        async with asyncio.timeout(0.1):
+            async for m in gossips[1].recv():
+                messages.append(m)
+    except asyncio.TimeoutError:
+        pass
+
+    assert [m.id for m in messages] == [message.id]
+    assert gossips[1].rx_duplicates == 1
+
+    for g in gossips:
+        await g.close()
+
+
+@pytest.mark.parametrize("random_seed", [0])
+@pytest.mark.parametrize("instances", [2])
+@pytest.mark.asyncio
+async def test_recv_decode_error(gossips, message):
+    gossips[0].transport.compression = "zlib"
+    gossips[0].transport.register_dictionary("test", b"test_recv_decode_error" * 8)
+
+    for topic in ["test", "other"]:
+        msg = Message()
+        msg.CopyFrom(message)
+        msg.id = uuid.uuid4().bytes
+        msg.kind.append(Message.Kind.REQ)
+        msg.topic = topic
+        msg.payload = b"test_recv_decode_error" * 64
+        msg.routing.src_id = gossips[0].peer_id
+        msg.routing.dst_id = gossips[1].peer_id
+        await gossips[0].send(msg, gossips[1].peer_id)
+
+    # the message compressed with a dictionary unknown to the receiver is dropped
+    received_message = await anext(gossips[1].recv())
+    assert received_message.topic == "other"
+    assert gossips[1].rx_errors == 1
+
+    for g in gossips:
+        await g.close()
+
+
+@pytest.mark.parametrize("random_seed", [0])
+@pytest.mark.parametrize("instances", [5])
+@pytest.mark.asyncio
+async def test_send_gossip_failure_isolation(gossips, message, monkeypatch):
+    gossip = gossips[0]
+    peer_ids = gossip.topology.sample(gossip.fanout, ignore=[gossip.peer_id])
+    get_next_peer = gossip.topology.get_next_peer
+
+    def get_next_peer_unreachable(peer_id):
+        if peer_id == peer_ids[0]:
+            raise ValueError(f"No route to node: {peer_id}")
+        return get_next_peer(peer_id)
+
+    monkeypatch.setattr(gossip.topology, "get_next_peer", get_next_peer_unreachable)
+    await gossip.send_gossip(message)
+    assert gossip.tx_failures == 1
+    assert gossip.transport.tx_packets == len(peer_ids) - 1
+
+    for g in gossips:
+        await g.close()
+
+
+@pytest.mark.parametrize("random_seed", [0])
+@pytest.mark.parametrize("instances", [2])
+@pytest.mark.asyncio
+async def test_anti_entropy(gossips):
+    # every gossip has a message the other one missed
+    messages = [Message(id=uuid.uuid4().bytes, payload=b"test_anti_entropy") for _ in gossips]
+    for gossip, message in zip(gossips, messages):
+        gossip._envelope(message)
+    assert gossips[0].buckets.sums != gossips[1].buckets.sums
+    gossips[0].adaptive = AdaptiveFanout()
+
+    await gossips[0].send_digest(gossips[1].peer_id)
+
+    async def listener(gossip):
+        received = []
+        try:
+            async with asyncio.timeout(0.1):
+                async for message in gossip.recv():
+                    received.append(message.id)
+        except asyncio.TimeoutError:
+            pass
+        return received
+
+    received = await asyncio.gather(*[listener(g) for g in gossips])
+    assert received == [[messages[1].id], [messages[0].id]]
+    assert gossips[0].buckets.sums == gossips[1].buckets.sums
+    assert gossips[0].adaptive.classes[""].missed == 1
+
+    for g in gossips:
+        await g.close()
+
+
+@pytest.mark.parametrize("random_seed", [0])
+@pytest.mark.parametrize("instances", [2])
+@pytest.mark.asyncio
+async def test_anti_entropy_seen(gossips, message):
+    # the peer has seen the message, but no longer caches it
+    gossips[0]._envelope(message)
+    gossips[1].mutex.acquire(message.id)
+
+    await gossips[0].send_digest(gossips[1].peer_id)
+
+    async def listener(gossip):
+        try:
+            async with asyncio.timeout(0.1):
+                async for _ in gossip.recv():
+                    pass
+        except asyncio.TimeoutError:
+            pass
+
+    tx_packets = gossips[0].transport.tx_packets
+    await asyncio.gather(*[listener(g) for g in gossips])
+    # only the ids are offered, the message is not pulled
+    assert gossips[0].transport.tx_packets == tx_packets + 1
+    assert gossips[1].rx_duplicates == 0
+    assert message.id not in gossips[1].pulled
+
+    for g in gossips:
+        await g.close()
+
+
+@pytest.mark.parametrize("random_seed", [0])
+@pytest.mark.parametrize("instances", [2])
+@pytest.mark.asyncio
+async def test_anti_entropy_interval(gossips, message):
+    gossips[1]._envelope(message)
+
+    async def listener(gossip):
+        async for _ in gossip.recv():
+            pass
+
+    tasks = [asyncio.create_task(listener(g)) for g in gossips]
+    tasks.append(asyncio.create_task(gossips[0].anti_entropy(interval=0.01)))
+    await asyncio.sleep(0.1)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    assert message.id in gossips[0].envelopes
+
+    for g in gossips:
+        await g.close()
+
+
+@pytest.mark.parametrize("random_seed", [0])
+@pytest.mark.parametrize("instances", [2])
+@pytest.mark.asyncio
+async def test_gossip_adaptive_fanout(gossips):
+    gossip = gossips[1]
+    gossip.adaptive = AdaptiveFanout(fanout=(1, 5), cycles=(1, 2))
+    gossip.adaptive.WINDOW = 2
+    assert gossip.adaptive.get("test", fanout=3, cycles=1) == (3, 1)
+
+    async def send(message, times=1):
+        message.kind.append(Message.Kind.GOSSIP)
+        message.routing.src_id = gossips[0].peer_id
+        message.routing.dst_id = gossip.peer_id
+        msg, addr = gossips[0]._route(message, gossip.peer_id)
+        for _ in range(times):
+            await gossips[0].transport.send(msg, addr)
+
+    async def listener():
+        try:
+            async with asyncio.timeout(0.1):
+                async for _ in gossip.recv():
+                    pass
+        except asyncio.TimeoutError:
+            pass
+
+    # too many duplicates: fanout lowered
+    await send(Message(id=uuid.uuid4().bytes, topic="test"), times=9)
+    await send(Message(id=uuid.uuid4().bytes, topic="test"))
+    await listener()
+    assert gossip.rx_duplicates == 8
+    assert gossip.adaptive.get("test") == (2, 1)
+
+    # messages missed by push gossip: fanout raised
+    for _ in range(2):
+        message = Message(id=uuid.uuid4().bytes, topic="test")
+        gossip.pulled[message.id] = None
+        await send(message)
+    await listener()
+    assert gossip.adaptive.get("test") == (3, 1)
+
+    for g in gossips:
+        await g.close()
+
+
+@pytest.mark.parametrize("random_seed", [0])
+@pytest.mark.parametrize("instances", [2])
+@pytest.mark.asyncio
+async def test_recv_digest_limits(gossips, monkeypatch):
+    gossip = gossips[0]
+    message = Message(kind=[Message.Kind.DIGEST, Message.Kind.SYN], payload=b"\xff\xff")
+    message.routing.src_id = gossips[1].peer_id
+
+    # the malformed digest is dropped
+    await gossip.recv_digest(message)
+    assert gossip.rx_errors == 1
+
+    # the pulled messages are answered up to the digest size
+    ids = [uuid.uuid4().bytes for _ in range(gossip.DIGEST_SIZE + 1)]
+    for message_id in ids:
+        gossip._envelope(Message(id=message_id, payload=b"test_recv_digest_limits"))
+    sent = []
+
+    async def _send_envelope(message_id, peer_id):
+        sent.append(message_id)
+
+    monkeypatch.setattr(gossip, "_send_envelope", _send_envelope)
+    del message.kind[:]
+    message.kind.extend([Message.Kind.DIGEST, Message.Kind.PULL])
+    message.payload = Digest(ids=ids).SerializeToString()
+    await gossip.recv_digest(message)
+    assert sent == ids[: gossip.DIGEST_SIZE]
+
+    for g in gossips:
+        await g.close()
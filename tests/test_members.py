@@ -0,0 +1,206 @@
+import asyncio
+import ipaddress
+import math
+
+import pytest
+
+from aiogossip.message_pb2 import Member, Membership, Message
+from aiogossip.transport.address import Address
+
+
+def configure(peers):
+    for peer in peers:
+        peer.broker.TIMEOUT = 0.1
+        members = peer.members
+        members.PROTOCOL_PERIOD = 0.1
+        members.PING_TIMEOUT = 0.03
+        members.SUSPECT_TIMEOUT = 0.2
+
+
+@pytest.mark.parametrize("random_seed", [0])
+@pytest.mark.parametrize("instances", [3])
+@pytest.mark.asyncio
+async def test_members_probe(peers):
+    for peer in peers[1:]:
+        peers[0].connect([peer.node])
+    await asyncio.sleep(0.1)
+
+    assert await peers[0].members.probe(peers[1].peer_id)
+    assert peers[0].members._state(peers[1].peer_id) == Member.State.ALIVE
+    assert not peers[0].members.acks
+
+    for peer in peers:
+        await peer.disconnect()
+
+
+@pytest.mark.parametrize("random_seed", [0])
+@pytest.mark.parametrize("instances", [3])
+@pytest.mark.asyncio
+async def test_members_ping_req(peers, monkeypatch):
+    configure(peers)
+    for peer in peers[1:]:
+        peers[0].connect([peer.node])
+    peers[1].connect([peers[2].node])
+    await asyncio.sleep(0.1)
+
+    # messages from the first peer to the last one are lost
+    send = peers[0].gossip.send
+    target = peers[2].peer_id
+
+    async def lossy_send(message, peer_id):
+        if peer_id == target and message.routing.src_id == peers[0].peer_id:
+            return message.id
+        return await send(message, peer_id)
+
+    monkeypatch.setattr(peers[0].gossip, "send", lossy_send)
+
+    assert await peers[0].members.probe(target)
+    assert peers[0].members._state(target) == Member.State.ALIVE
+    assert not peers[1].members.relays
+
+    for peer in peers:
+        await peer.disconnect()
+
+
+@pytest.mark.parametrize("random_seed", [0])
+@pytest.mark.parametrize("instances", [3])
+@pytest.mark.asyncio
+async def test_members_failure(peers):
+    configure(peers)
+    for peer in peers[1:]:
+        peers[0].connect([peer.node])
+    await asyncio.sleep(0.1)
+
+    failed = peers[2]
+    await failed.disconnect()
+
+    assert not await peers[0].members.probe(failed.peer_id)
+    assert peers[0].members._state(failed.peer_id) == Member.State.SUSPECT
+    assert failed.peer_id in peers[0].members.events
+
+    await asyncio.sleep(0.3)
+    assert peers[0].members._state(failed.peer_id) == Member.State.DEAD
+    assert not peers[0].gossip.topology.is_relay(failed.peer_id)
+    assert peers[0].members._next_target() == peers[1].peer_id
+
+    # the death is piggybacked on the probes of the other peers
+    await peers[0].members.probe(peers[1].peer_id)
+    assert peers[1].members._state(failed.peer_id) == Member.State.DEAD
+
+    for peer in peers[:2]:
+        await peer.disconnect()
+
+
+@pytest.mark.parametrize("random_seed", [0])
+@pytest.mark.parametrize("instances", [1])
+@pytest.mark.asyncio
+async def test_members_refute(peers):
+    members = peers[0].members
+
+    suspect = Member(peer_id=peers[0].peer_id, state=Member.State.SUSPECT, incarnation=0)
+    assert not members.update(suspect)
+    assert members.incarnation == 1
+    refutation = Member(peer_id=peers[0].peer_id, incarnation=1, addr=members.addr)
+    assert Membership.FromString(members.pack(1024)).members == [refutation]
+
+    peer_id = b"peer"
+    assert members.update(Member(peer_id=peer_id, state=Member.State.SUSPECT, incarnation=1))
+    assert not members.update(Member(peer_id=peer_id, state=Member.State.ALIVE, incarnation=1))
+    assert members.update(Member(peer_id=peer_id, state=Member.State.ALIVE, incarnation=2))
+    assert members.update(Member(peer_id=peer_id, state=Member.State.DEAD, incarnation=2))
+    assert not members.update(Member(peer_id=peer_id, state=Member.State.SUSPECT, incarnation=2))
+    assert members._state(peer_id) == Member.State.DEAD
+    assert not members.suspicions
+
+    await peers[0].disconnect()
+
+
+@pytest.mark.parametrize("random_seed", [0])
+@pytest.mark.parametrize("instances", [1])
+@pytest.mark.asyncio
+async def test_members_events(peers):
+    members = peers[0].members
+    members.EVENTS_SIZE = 4
+    members.events.clear()
+
+    # each event is transmitted RETRANSMIT_MULTIPLIER * log(N) times
+    members.update(Member(peer_id=b"peer", addr="127.0.0.1:1"))
+    transmissions = members.events[b"peer"]
+    assert transmissions == members.RETRANSMIT_MULTIPLIER * math.ceil(math.log2(len(members.topology) + 1))
+    for _ in range(transmissions):
+        assert Membership.FromString(members.pack(1024)).members[0].peer_id == b"peer"
+    assert not members.events
+    assert members.pack(1024) == b""
+
+    # the buffer keeps the most recent events
+    for i in range(8):
+        members.update(Member(peer_id=b"peer%d" % i, addr=f"127.0.0.1:{i + 2}"))
+    assert len(members.events) == members.EVENTS_SIZE
+
+    # only the events fitting in the free space are packed
+    size = Member(peer_id=b"peer0", addr="127.0.0.1:2").ByteSize() + 2
+    assert len(Membership.FromString(members.pack(size)).members) == 1
+    assert members.pack(size - 1) == b""
+
+    await peers[0].disconnect()
+
+
+@pytest.mark.parametrize("random_seed", [0])
+@pytest.mark.parametrize("instances", [3])
+@pytest.mark.asyncio
+async def test_members_join(peers):
+    # the probe loops wait a protocol period before their first probe
+    peers[0].connect([peers[1].node])
+    await asyncio.sleep(0.1)
+
+    # loopback addresses are not disseminated
+    assert peers[0].members.addr == ""
+
+    # the join of the last peer is piggybacked on the traffic between the first ones
+    members = peers[0].members
+    members.update(Member(peer_id=peers[2].peer_id, addr="10.0.0.2:8000"))
+    tx_packets = peers[0].transport.tx_packets + peers[1].transport.tx_packets
+
+    assert await members.probe(peers[1].peer_id)
+    assert tx_packets + 2 == peers[0].transport.tx_packets + peers[1].transport.tx_packets
+    assert peers[1].members._state(peers[2].peer_id) == Member.State.ALIVE
+    assert peers[1].members.members[peers[2].peer_id].addr == "10.0.0.2:8000"
+    # no edge is created from the address of an event
+    assert peers[2].peer_id not in peers[1].gossip.topology
+
+    # an address change is applied to the topology, unless not reachable from other hosts
+    topology = peers[1].gossip.topology
+    peers[1].members.update(Member(peer_id=peers[0].peer_id, incarnation=1, addr="127.0.0.2:1"))
+    assert Address(ipaddress.ip_address("127.0.0.2"), 1) not in topology.node_addrs(peers[0].peer_id).values()
+    peers[1].members.update(Member(peer_id=peers[0].peer_id, incarnation=2, addr="10.0.0.1:1"))
+    assert topology.node_addrs(peers[0].peer_id)["lan"] == Address(ipaddress.ip_address("10.0.0.1"), 1)
+
+    for peer in peers:
+        await peer.disconnect()
+
+
+@pytest.mark.parametrize("random_seed", [0])
+@pytest.mark.parametrize("instances", [1])
+@pytest.mark.asyncio
+async def test_members_recv_invalid(peers, monkeypatch):
+    members = peers[0].members
+    sent = []
+
+    async def _send(peer_id, kinds, *args):
+        sent.append(kinds)
+
+    monkeypatch.setattr(members, "_send", _send)
+
+    # messages that are not pings are not acknowledged
+    message = Message(topic=members.TOPIC, kind=[Message.Kind.GOSSIP], payload=Membership().SerializeToString())
+    await members.recv(message)
+    # nor are malformed pings
+    message = Message(topic=members.TOPIC, kind=[Message.Kind.PING], payload=b"\xff\xff")
+    await members.recv(message)
+    assert not sent
+
+    message.payload = Membership().SerializeToString()
+    await members.recv(message)
+    assert sent == [[Message.Kind.PING, Message.Kind.ACK]]
+
+    await peers[0].disconnect()
@@ -0,0 +1,87 @@
+import asyncio
+import uuid
+
+import pytest
+
+from aiogossip.message_pb2 import Message
+from aiogossip.plumtree import Plumtree
+
+
+async def broadcast(gossips, message):
+    received = {g.peer_id: [] for g in gossips}
+
+    async def listener(gossip):
+        try:
+            async with asyncio.timeout(0.2):
+                async for m in gossip.recv():
+                    received[gossip.peer_id].append(m.id)
+        except asyncio.TimeoutError:
+            pass
+
+    listeners = [asyncio.create_task(listener(g)) for g in gossips]
+    await gossips[0].send_gossip(message)
+    await asyncio.gather(*listeners)
+    return received
+
+
+@pytest.mark.parametrize("random_seed", [0])
+@pytest.mark.parametrize("instances", [10])
+@pytest.mark.asyncio
+async def test_plumtree_broadcast(gossips):
+    for gossip in gossips:
+        gossip.plumtree = Plumtree(gossip)
+
+    message = Message(id=uuid.uuid4().bytes, payload=b"test_plumtree_broadcast")
+    received = await broadcast(gossips, message)
+    assert all(received[g.peer_id].count(message.id) == 1 for g in gossips[1:])
+    duplicates = sum(g.rx_duplicates for g in gossips)
+    assert duplicates > 0
+    assert any(g.plumtree.lazy for g in gossips)
+
+    # duplicates pruned eager links, the tree delivers a single copy
+    message = Message(id=uuid.uuid4().bytes, payload=b"test_plumtree_broadcast")
+    received = await broadcast(gossips, message)
+    assert all(received[g.peer_id].count(message.id) == 1 for g in gossips[1:])
+    assert sum(g.rx_duplicates for g in gossips) == duplicates
+
+    for g in gossips:
+        await g.close()
+
+
+@pytest.mark.parametrize("random_seed", [0])
+@pytest.mark.parametrize("instances", [2])
+@pytest.mark.asyncio
+async def test_plumtree_graft(gossips, message):
+    for gossip in gossips:
+        gossip.plumtree = Plumtree(gossip)
+        gossip.plumtree.TIMEOUT = 0.01
+    gossips[0].plumtree.lazy.add(gossips[1].peer_id)
+
+    # the message is announced, grafted after the timeout and received in full
+    received = await broadcast(gossips, message)
+    assert received[gossips[1].peer_id].count(message.id) == 1
+    assert gossips[1].peer_id not in gossips[0].plumtree.lazy
+    assert not gossips[1].plumtree.grafts
+    assert len(gossips[1].timers) == 0
+
+    for g in gossips:
+        await g.close()
+
+
+@pytest.mark.parametrize("random_seed", [0])
+@pytest.mark.parametrize("instances", [2])
+@pytest.mark.asyncio
+async def test_plumtree_close(gossips, message):
+    plumtree = gossips[1].plumtree = Plumtree(gossips[1])
+
+    # a graft pending on close is cancelled
+    message.kind.append(Message.Kind.IHAVE)
+    message.routing.src_id = gossips[0].peer_id
+    await plumtree.recv(message)
+    assert message.id in plumtree.grafts
+    assert len(gossips[1].timers) == 1
+
+    for g in gossips:
+        await g.close()
+    assert not plumtree.grafts
+    assert len(gossips[1].timers) == 0
@@ -0,0 +1,39 @@
+import fnmatch
+
+from aiogossip.topics import TopicIndex
+
+PATTERNS = ["test", "test.*", "test.1", "t?st.*", "*", "[ab].*", "recv:1", "test.1.*", "test*"]
+TOPICS = ["test", "test.1", "test.2", "tost.1", "a.1", "c.1", "recv:1", "test.1.2", ""]
+
+
+def test_topic_index():
+    index = TopicIndex()
+    for pattern in PATTERNS:
+        index.add(pattern)
+    index.add("test.*")
+    assert len(index) == len(PATTERNS)
+    assert sorted(index) == sorted(PATTERNS)
+    assert all(pattern in index for pattern in PATTERNS)
+    assert "test.?" not in index
+
+    for topic in TOPICS:
+        expected = [p for p in PATTERNS if fnmatch.fnmatchcase(topic, p)]
+        assert sorted(index.match(topic)) == sorted(expected), topic
+
+
+def test_topic_index_discard():
+    index = TopicIndex()
+    for pattern in PATTERNS:
+        index.add(pattern)
+
+    index.discard("test.1.*")
+    index.discard("test.1")
+    index.discard("test.?")
+    assert len(index) == len(PATTERNS) - 2
+    assert sorted(index.match("test.1.2")) == sorted(["test.*", "t?st.*", "*", "test*"])
+
+    for pattern in PATTERNS:
+        index.discard(pattern)
+    assert len(index) == 0
+    assert not index.root.children
+    assert index.match("test.1") == []
@@ -1,3 +1,22 @@
+import ipaddress
+
+import pytest
+
+from aiogossip.message_pb2 import Route
+from aiogossip.topology import CompactTopology, Node
+from aiogossip.topology.base import BaseTopology
+from aiogossip.topology.neighbors import Neighbors
+from aiogossip.transport.address import Address
+
+TOPOLOGIES = [CompactTopology]
+try:
+    from aiogossip.topology import GraphTopology
+except ImportError:  # pragma: no cover
+    # networkx is optional
+    pass
+else:
+    TOPOLOGIES.insert(0, GraphTopology)
+
 # import ipaddress
 
 # import pytest
@@ -82,3 +101,170 @@
 #     assert peer_id == "node2"
 #     assert peer_addr.ip == ipaddress.ip_address("127.0.0.1")
 #     assert peer_addr.port == 8002
+
+
+def get_addr(port):
+    return Address(ipaddress.ip_address("127.0.0.1"), port)
+
+
+@pytest.fixture(params=TOPOLOGIES, ids=lambda x: x.__name__)
+def Topology(request):
+    return request.param
+
+
+def test_base_topology_storage():
+    class PartialTopology(BaseTopology):
+        def _handle(self, node_id):
+            return node_id
+
+    # the storage primitives must all be implemented
+    with pytest.raises(TypeError):
+        PartialTopology()
+
+
+def test_get_next_peer(Topology):
+    topology = Topology(b"node1", get_addr(8001))
+    topology.create_node_edge(Node(b"node2", get_addr(8002)))
+
+    assert topology.get_next_peer(b"node2") == (b"node2", get_addr(8002))
+    with pytest.raises(ValueError):
+        topology.get_next_peer(b"node3")
+
+
+def test_get_next_peer_invalidated_on_update(Topology):
+    topology = Topology(b"node1", get_addr(8001))
+    topology.create_node_edge(Node(b"node2", get_addr(8002)))
+    next_peers = topology._compute_next_peers()
+    assert topology.get_next_peer(b"node2") == (b"node2", get_addr(8002))
+
+    # node3 -> node2 -> node1
+    routes = [
+        Route(route_id=b"node3", daddr="127.0.0.1:8003", timestamp=1),
+        Route(route_id=b"node2", daddr="127.0.0.1:8002", timestamp=2),
+        Route(route_id=b"node1", daddr="127.0.0.1:8001", timestamp=3),
+    ]
+    topology.update(routes)
+    assert topology.get_next_peer(b"node3") == (b"node2", get_addr(8002))
+    assert topology._next_peers != next_peers
+
+    next_peers = topology._next_peers
+    topology.update(routes)
+    assert topology._next_peers is next_peers
+
+
+def get_latency_topology(Topology):
+    topology = Topology(b"node1", get_addr(8001), metric="latency")
+    topology.create_node_edge(Node(b"node2", get_addr(8002)))
+    topology.create_node_edge(Node(b"node3", get_addr(8003)))
+    topology.add_edge(b"node1", b"node2", latency=100_000_000)
+    topology.add_edge(b"node1", b"node3", latency=1_000_000)
+    topology.add_edge(b"node3", b"node2", latency=1_000_000)
+    return topology
+
+
+def test_get_next_peer_latency(Topology):
+    topology = get_latency_topology(Topology)
+    assert topology.get_next_peer(b"node2") == (b"node3", get_addr(8003))
+
+    topology.metric = "hops"
+    assert topology.get_next_peer(b"node2") == (b"node2", get_addr(8002))
+
+    with pytest.raises(ValueError):
+        topology.metric = "unknown"
+
+
+def test_get_next_peer_latency_smoothing(Topology):
+    topology = get_latency_topology(Topology)
+    assert topology.get_next_peer(b"node2")[0] == b"node3"
+
+    # a single fast sample is smoothed, the slow direct edge is still avoided
+    topology.add_edge(b"node1", b"node2", latency=0)
+    assert topology.latency(b"node1", b"node2") == 80_000_000
+    assert topology.get_next_peer(b"node2")[0] == b"node3"
+
+    for _ in range(20):
+        topology.add_edge(b"node1", b"node2", latency=0)
+    assert topology.get_next_peer(b"node2")[0] == b"node2"
+
+
+def test_get_next_peer_skips_unreachable(Topology):
+    topology = get_latency_topology(Topology)
+    assert topology.get_next_peer(b"node2")[0] == b"node3"
+
+    topology.mark_unreachable(b"node3")
+    assert topology.get_next_peer(b"node2")[0] == b"node2"
+    assert topology.get_next_peer(b"node3")[0] == b"node3"
+
+    topology.mark_reachable(b"node3")
+    assert topology.get_next_peer(b"node2")[0] == b"node3"
+
+
+def test_topology_nodes(Topology):
+    topology = Topology(b"node1", get_addr(8001))
+    topology.create_node_edge(Node(b"node2", get_addr(8002)))
+    topology.create_node_edge(Node(b"node3", "10.0.0.3:8003"))
+    topology.mark_unreachable(b"node3")
+
+    assert len(topology) == 3
+    assert list(topology) == [b"node1", b"node2", b"node3"]
+    assert b"node2" in topology
+    assert b"node4" not in topology
+    assert topology.latency(b"node1", b"node2") is None
+    assert sorted(topology.sample(5, ignore=[b"node2"])) == [b"node3"]
+
+    node = topology[b"node3"]
+    assert node["node_addrs"]["lan"] == Address(ipaddress.ip_address("10.0.0.3"), 8003)
+    assert node["node_addrs"]["local"] is None
+    assert node["reachable"] is False
+    assert "reachable" not in topology[b"node2"]
+
+    assert topology.to_dict()["node3"] == {"local": "None", "lan": "10.0.0.3:8003", "wan": "None"}
+
+
+def test_neighbors():
+    neighbors = Neighbors()
+    for node_id in range(5):
+        neighbors.add(node_id)
+    neighbors.add(0)
+    assert list(neighbors) == [0, 1, 2, 3, 4]
+
+    neighbors.discard(1)
+    neighbors.discard(4)
+    neighbors.discard(5)
+    assert list(neighbors) == [0, 3, 2]
+    assert neighbors.index == {0: 0, 3: 1, 2: 2}
+    assert 1 not in neighbors
+
+
+def test_neighbors_sample(random_seed):
+    neighbors = Neighbors()
+    for node_id in range(1000):
+        neighbors.add(node_id)
+
+    sample = neighbors.sample(10, ignore={0, 1, 2})
+    assert len(set(sample)) == 10
+    assert not set(sample) & {0, 1, 2}
+
+    # mostly ignored neighbors are scanned
+    assert sorted(neighbors.sample(10, ignore=range(995))) == [995, 996, 997, 998, 999]
+    assert neighbors.sample(10, ignore=range(1000)) == []
+    assert len(neighbors.sample(2000)) == 1000
+
+
+def test_topology_remove_edge(Topology):
+    topology = Topology(b"node1", get_addr(8001))
+    topology.create_node_edge(Node(b"node2", get_addr(8002)))
+    topology.create_node_edge(Node(b"node3", get_addr(8003)))
+    assert topology.get_next_peer(b"node2") == (b"node2", get_addr(8002))
+
+    topology.remove_edge(b"node1", b"node2")
+    topology.remove_edge(b"node1", b"node2")
+    assert topology.sample(5) == [b"node3"]
+    assert b"node2" in topology
+    with pytest.raises(ValueError):
+        topology.get_next_peer(b"node2")
+
+    topology.create_node_edge(Node(b"node2", get_addr(8012)))
+    assert sorted(topology.sample(5)) == [b"node2", b"node3"]
+    assert topology.get_next_peer(b"node2") == (b"node2", get_addr(8012))
+    assert topology.latency(b"node1", b"node2") is None
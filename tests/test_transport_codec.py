@@ -1,7 +1,79 @@
-from aiogossip.transport.codec import decode, encode
+import pytest
+from google.protobuf.message import DecodeError
+
+from aiogossip.message_pb2 import Message, Route
+from aiogossip.transport.codec import Envelope, batch_size, decode, encode, pack, unpack
 
 
 def test_encode_decode(message):
     encoded_message = encode(message)
     decoded_message = decode(encoded_message)
     assert decoded_message == message
+
+
+def test_decode_lazy(message):
+    message.kind.append(message.Kind.GOSSIP)
+    message.kind.append(message.Kind.SYN)
+    message.routing.src_id = b"src"
+    message.routing.dst_id = b"dst"
+    message.routing.routes.append(Route(route_id=b"src", saddr="127.0.0.1:8000"))
+    message.topic = "test"
+    message.payload = b"test_decode_lazy" * 100
+
+    envelope = decode(memoryview(encode(message)), lazy=True)
+    assert isinstance(envelope, Envelope)
+    assert envelope.id == message.id
+    assert envelope.kind == list(message.kind)
+    assert envelope.routing == message.routing
+    assert envelope.topic == message.topic
+    assert envelope.to_message() == message
+    assert decode(encode(envelope)) == message
+
+
+def test_decode_lazy_reroute(message):
+    message.payload = b"test_decode_lazy_reroute"
+    envelope = decode(encode(message), lazy=True)
+
+    copy = Envelope()
+    copy.CopyFrom(envelope)
+    copy.routing.routes.append(Route(route_id=b"hop"))
+    assert len(envelope.routing.routes) == 0
+
+    message.routing.routes.append(Route(route_id=b"hop"))
+    assert decode(encode(copy)) == message
+
+
+def test_decode_lazy_truncated(message):
+    message.payload = b"test_decode_lazy_truncated"
+    with pytest.raises(DecodeError):
+        decode(encode(message)[:-1], lazy=True)
+
+
+def test_envelope_merge(message):
+    message.kind.append(message.Kind.SYN)
+    message.payload = b"test_envelope_merge"
+    envelope = decode(encode(message), lazy=True)
+
+    fields = Message(id=b"id")
+    fields.kind.append(message.Kind.GOSSIP)
+    envelope.MergeFromString(encode(fields))
+    message.MergeFrom(fields)
+
+    assert envelope.id == b"id"
+    assert envelope.kind == list(message.kind)
+    assert envelope.to_message() == message
+
+
+def test_pack_unpack(message):
+    datagrams = [encode(message), b"", b"x" * 200]
+    data = pack(datagrams)
+    assert len(data) == sum(batch_size(d) for d in datagrams)
+    assert [bytes(d) for d in unpack(data)] == datagrams
+    assert [bytes(d) for d in unpack(memoryview(data))] == datagrams
+
+    assert unpack(encode(message)) == [encode(message)]
+    assert unpack(b"") == [b""]
+    assert decode(unpack(pack([encode(message)]))[0]) == message
+
+    with pytest.raises(DecodeError):
+        unpack(data + encode(message))
@@ -0,0 +1,83 @@
+import pytest
+from google.protobuf.message import DecodeError
+
+from aiogossip.message_pb2 import Message
+from aiogossip.transport import compression
+from aiogossip.transport.codec import decode, encode
+
+PAYLOAD = b'{"name": "aiogossip", "version": "1.0.0", "tags": ["gossip", "asyncio"]}' * 8
+
+
+@pytest.mark.parametrize("algorithm", ["zlib", "lzma"])
+def test_compress(message, algorithm):
+    message.payload = PAYLOAD
+    compressed = compression.compress(message, algorithm)
+    assert compressed is not message
+    assert compressed.compression == compression.ALGORITHMS[algorithm]
+    assert len(compressed.payload) < len(PAYLOAD)
+    assert message.payload == PAYLOAD
+
+    assert compression.decompress(compressed) == message
+    assert decode(encode(message, algorithm=algorithm)) == message
+
+
+def test_compress_threshold(message):
+    message.payload = PAYLOAD
+    assert compression.compress(message, "zlib", threshold=len(PAYLOAD) + 1) is message
+    assert len(encode(message, algorithm="zlib", threshold=len(PAYLOAD) + 1)) > len(PAYLOAD)
+
+    message.payload = b"incompressible"
+    assert compression.compress(message, "zlib") is message
+
+    with pytest.raises(ValueError):
+        compression.compress(message, "gzip")
+
+
+def test_compress_dictionary(message):
+    message.topic = "test_compress_dictionary"
+    message.payload = PAYLOAD[:100]
+    plain = compression.compress(message, "zlib")
+
+    dictionaries = compression.Dictionaries()
+    dictionary = dictionaries.register(message.topic, PAYLOAD)
+    compressed = compression.compress(message, "zlib", dictionaries=dictionaries)
+    assert compressed.dictionary == dictionary
+    assert len(compressed.payload) < len(plain.payload)
+    assert decode(encode(compressed), dictionaries=dictionaries) == message
+
+    # dictionaries are not shared
+    with pytest.raises(DecodeError):
+        decode(encode(compressed), dictionaries=compression.Dictionaries())
+
+    compressed.dictionary += 1
+    with pytest.raises(DecodeError):
+        compression.decompress(compressed, dictionaries=dictionaries)
+
+
+def test_decompress_lazy(message):
+    message.payload = PAYLOAD
+    envelope = decode(encode(message, algorithm="zlib"), lazy=True)
+    assert envelope.to_message() == message
+
+
+def test_decompress_errors(message):
+    message.payload = PAYLOAD
+    message.compression = Message.Compression.ZLIB
+    with pytest.raises(DecodeError):
+        decode(encode(message))
+
+
+@pytest.mark.parametrize("algorithm", ["zlib", "lzma"])
+def test_decompress_max_size(message, algorithm):
+    message.payload = b"\0" * (1 << 20)
+    compressed = compression.compress(message, algorithm)
+    assert len(compressed.payload) < 4096  # fits in a datagram
+
+    with pytest.raises(DecodeError):
+        compression.decompress(compressed, max_size=len(message.payload) - 1)
+    assert compression.decompress(compressed, max_size=len(message.payload)) == message
+
+    compressed = compression.compress(message, algorithm)
+    compressed.payload = compressed.payload[:-8]
+    with pytest.raises(DecodeError):
+        compression.decompress(compressed)
@@ -0,0 +1,73 @@
+from aiogossip.message_pb2 import Fragment
+from aiogossip.transport.fragment import Reassembly
+
+ADDR = ("127.0.0.1", 8000)
+
+
+def fragments(fragment_id, data, size):
+    chunks = [data[i:][:size] for i in range(0, len(data), size)]
+    return [Fragment(id=fragment_id, index=i, count=len(chunks), data=chunk) for i, chunk in enumerate(chunks)]
+
+
+def test_reassembly():
+    reassembly = Reassembly(maxsize=1024, timeout=1, maxcount=8, maxpartials=8)
+    data = bytes(range(100))
+    a, b, c = fragments(b"a", data, 40)
+
+    assert reassembly.add(c, ADDR) is None
+    assert reassembly.add(c, ADDR) is None
+    assert reassembly.add(a, ADDR) is None
+    assert reassembly.missing(b"a") == [1]
+    assert reassembly.addr(b"a") == ADDR
+    assert reassembly.size == 60 + reassembly.PARTIAL_OVERHEAD
+
+    assert reassembly.add(b, ADDR) == data
+    assert b"a" not in reassembly
+    assert reassembly.missing(b"a") is None
+    assert reassembly.size == 0
+
+
+def test_reassembly_maxsize():
+    size = 40 + Reassembly.PARTIAL_OVERHEAD
+    reassembly = Reassembly(maxsize=2 * size + 10, timeout=1, maxcount=8, maxpartials=8)
+    for fragment_id in (b"a", b"b", b"c"):
+        reassembly.add(fragments(fragment_id, bytes(120), 40)[0], ADDR)
+
+    assert list(reassembly.partials) == [b"b", b"c"]
+    assert reassembly.size == 2 * size
+    assert reassembly.evicted == 1
+
+
+def test_reassembly_maxpartials():
+    reassembly = Reassembly(maxsize=1 << 20, timeout=1, maxcount=8, maxpartials=2)
+    for fragment_id in (b"a", b"b", b"c"):
+        reassembly.add(fragments(fragment_id, bytes(120), 40)[0], ADDR)
+    assert list(reassembly.partials) == [b"b", b"c"]
+    assert reassembly.evicted == 1
+
+    # fragments without data hold nothing
+    assert reassembly.add(Fragment(id=b"d", index=0, count=2), ADDR) is None
+    assert b"d" not in reassembly
+    assert reassembly.rejected == 1
+
+
+def test_reassembly_timeout():
+    reassembly = Reassembly(maxsize=1024, timeout=0, maxcount=8, maxpartials=8)
+    reassembly.add(fragments(b"a", bytes(120), 40)[0], ADDR)
+    assert reassembly.missing(b"a") is None
+    assert reassembly.size == 0
+    assert reassembly.evicted == 1
+
+
+def test_reassembly_count():
+    reassembly = Reassembly(maxsize=1024, timeout=1, maxcount=8, maxpartials=8)
+    assert reassembly.add(Fragment(id=b"a", index=0, count=50_000_000, data=b"a"), ADDR) is None
+    assert b"a" not in reassembly
+
+    a, b, c = fragments(b"a", bytes(120), 40)
+    reassembly.add(a, ADDR)
+    b.count = 8
+    assert reassembly.add(b, ADDR) is None
+    assert reassembly.missing(b"a") == [1, 2]
+    assert reassembly.missing(b"a", limit=1) == [1]
+    assert reassembly.rejected == 2
@@ -0,0 +1,46 @@
+import socket
+
+import pytest
+
+from aiogossip.transport.mmsg import LIBC, Batch
+
+
+@pytest.fixture(params=[True, False], ids=lambda x: f"mmsg={x}")
+def batch(request):
+    if request.param and LIBC is None:
+        pytest.skip("recvmmsg/sendmmsg not available")
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(("127.0.0.1", 0))
+    sock.setblocking(False)
+
+    batch = Batch(sock, size=1024, vlen=4)
+    batch.mmsg = request.param
+    yield batch
+    sock.close()
+
+
+def test_send_recv(batch):
+    addr = batch.sock.getsockname()
+    datagrams = [(f"datagram {i}".encode(), addr) for i in range(10)]
+
+    assert batch.send(datagrams) == len(datagrams)
+    assert batch.recv(len(datagrams) + 1) == datagrams
+
+
+def test_recv_empty(batch):
+    assert batch.recv(0) == []
+    assert batch.recv(4) == []
+
+
+def test_recv_into(batch):
+    addr = batch.sock.getsockname()
+    datagrams = [(f"datagram {i}".encode(), addr) for i in range(6)]
+    assert batch.send(datagrams) == len(datagrams)
+
+    buffers = [bytearray(64) for _ in range(8)]
+    received = batch.recv_into(buffers)
+    assert len(received) == len(datagrams)
+    for buffer, (nbytes, recv_addr), (data, _) in zip(buffers, received, datagrams):
+        assert buffer[:nbytes] == data
+        assert recv_addr == addr
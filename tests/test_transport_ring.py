@@ -0,0 +1,26 @@
+from aiogossip.transport.ring import Ring
+
+
+def test_acquire_release():
+    ring = Ring(size=16, count=4)
+    assert len(ring) == 4
+
+    indices = ring.acquire(3)
+    assert len(indices) == 3
+    assert len(ring) == 1
+    assert len(ring.acquire(3)) == 1
+    assert ring.acquire(1) == []
+
+    for index in indices:
+        ring.release(index)
+    assert len(ring) == 3
+
+
+def test_view():
+    ring = Ring(size=16, count=1)
+    (index,) = ring.acquire(1)
+    ring.buffers[index][:5] = b"hello"
+
+    view = ring.view(index, 5)
+    assert isinstance(view, memoryview)
+    assert view == b"hello"
@@ -1,7 +1,11 @@
+import asyncio
 import ipaddress
+from unittest.mock import MagicMock
 
 import pytest
 
+from aiogossip.message_pb2 import Fragment, Message
+from aiogossip.transport import Transport, codec
 from aiogossip.transport.address import Address
 
 
@@ -16,15 +20,87 @@ async def test_send_recv(transport, message):
 
 @pytest.mark.asyncio
 async def test_send_large_packet(transport, message):
-    message.id = b"a" * (transport.PACKET_SIZE + 1)
+    message.id = b"a" * (transport.MESSAGE_SIZE + 1)
 
     with pytest.raises(ValueError) as excinfo:
         await transport.send(message, transport.addr)
 
-    expected = f"Message size exceeds packet size of {transport.PACKET_SIZE} bytes: 4100"
+    expected = f"Message size exceeds message size of {transport.MESSAGE_SIZE} bytes: 1048581"
     assert str(excinfo.value) == expected
 
 
+@pytest.mark.asyncio
+async def test_send_fragments(transport, message):
+    message.payload = bytes(range(256)) * 64
+    await transport.send(message, transport.addr)
+    assert transport.tx_fragments == 5
+    assert transport.tx_packets == 5
+
+    received_message, received_addr = await transport.recv()
+    assert received_message == message
+    assert received_addr == transport.addr
+    assert transport.rx_fragments == 5
+    assert len(transport.reassembly) == 0
+    transport.close()
+
+
+@pytest.mark.asyncio
+async def test_recv_fragments_retransmit(transport, message):
+    message.payload = bytes(range(256)) * 64
+    await transport.connect()
+    datagrams = transport._encode(message, transport.addr)
+
+    # the second and fourth fragments are lost
+    for data, sockaddr in datagrams[:1] + datagrams[2:3] + datagrams[4:]:
+        transport.datagram_received(data, sockaddr)
+    assert transport.reassembly.missing(next(iter(transport.reassembly.partials))) == [1, 3]
+
+    received_message, _ = await transport.recv()
+    assert received_message == message
+    assert transport.tx_retransmits == 2
+    assert len(transport.reassembly) == 0
+    transport.close()
+
+
+@pytest.mark.asyncio
+async def test_recv_fragments_missing_requests(transport):
+    transport.FRAGMENT_RETRANSMIT = 0.005
+    await transport.connect()
+    sockaddr = ("127.0.0.1", 9)
+
+    # fragments without data are not reassembled nor answered
+    transport.datagram_received(codec.encode(Message(fragment=Fragment(id=b"a", index=0, count=4))), sockaddr)
+    assert len(transport.reassembly) == 0
+
+    # missing fragments are requested a bounded number of times
+    fragment = Fragment(id=b"b", index=0, count=4, data=b"b")
+    transport.datagram_received(codec.encode(Message(fragment=fragment)), sockaddr)
+    await asyncio.sleep(0.2)
+    assert transport.tx_packets == transport.MISSING_REQUESTS
+    transport.close()
+
+
+@pytest.mark.asyncio
+async def test_send_fragments_retransmit(transport, message):
+    transport.FRAGMENT_TIMEOUT = 0.05
+    message.payload = bytes(range(256)) * 64
+    await transport.connect()
+    datagrams = transport._encode(message, transport.addr)
+    fragment_id = next(iter(transport._fragments))
+
+    # fragments are only sent again to the address they were sent to
+    request = codec.encode(Message(fragment=Fragment(id=fragment_id, missing=[0, 0])))
+    transport.datagram_received(request, ("127.0.0.2", datagrams[0][1][1]))
+    assert transport.tx_retransmits == 0
+    transport.datagram_received(request, datagrams[0][1])
+    assert transport.tx_retransmits == 1
+
+    # and kept until they expire
+    await asyncio.sleep(0.1)
+    assert not transport._fragments
+    transport.close()
+
+
 @pytest.mark.asyncio
 async def test_send_type_errors(transport, message):
     with pytest.raises(TypeError):
@@ -35,3 +111,222 @@ async def test_send_type_errors(transport, message):
 
     with pytest.raises(TypeError):
         await transport.send(message, Address(ipaddress.ip_address("127.0.0.1"), 1337.0))
+
+
+@pytest.mark.asyncio
+async def test_recv_queue_full(transport):
+    for _ in range(transport.QUEUE_SIZE + 1):
+        transport.datagram_received(b"", ("127.0.0.1", 1337))
+
+    assert transport.rx_packets == transport.QUEUE_SIZE
+    assert transport.rx_dropped == 1
+    transport.close()
+
+
+@pytest.mark.asyncio
+async def test_recv_batch_decode_error(transport, message):
+    await transport.connect()
+    sockaddr = (str(transport.addr.ip), transport.addr.port)
+    for data in (codec.encode(message), b"\xff\xff", codec.encode(message)):
+        transport.datagram_received(data, sockaddr)
+
+    # the malformed datagram is skipped, the messages around it are received
+    received = await transport.recv_batch(3)
+    assert [m for m, _ in received] == [message, message]
+    assert transport.rx_errors == 1
+    transport.close()
+
+
+@pytest.mark.asyncio
+async def test_send_many_recv_batch(transport, message):
+    messages = [message] * 3
+    await transport.send_many(messages, [transport.addr] * len(messages))
+    assert transport.tx_packets == len(messages)
+    assert transport.tx_batches == 1
+
+    received = []
+    while len(received) < len(messages):
+        received.extend(await transport.recv_batch(len(messages)))
+
+    assert [m for m, _ in received] == messages
+    assert all(addr == transport.addr for _, addr in received)
+    transport.close()
+
+
+@pytest.mark.asyncio
+async def test_send_many_length_mismatch(transport, message):
+    with pytest.raises(ValueError):
+        await transport.send_many([message], [])
+    transport.close()
+
+
+@pytest.mark.asyncio
+async def test_send_many_return_exceptions(transport, message):
+    addrs = [transport.addr, ("127.0.0.1", 8000), transport.addr]
+    with pytest.raises(TypeError):
+        await transport.send_many([message] * 3, addrs)
+    assert transport.tx_packets == 0
+
+    exceptions = await transport.send_many([message] * 3, addrs, return_exceptions=True)
+    assert [type(e) for e in exceptions] == [type(None), TypeError, type(None)]
+    assert transport.tx_packets == 2
+
+    received = []
+    while len(received) < 2:
+        received.extend(await transport.recv_batch(2))
+    assert [m for m, _ in received] == [message] * 2
+    transport.close()
+
+
+@pytest.mark.asyncio
+async def test_recv_zerocopy(event_loop, message):
+    transport = Transport(("localhost", 0), loop=event_loop, zerocopy=True)
+    messages = [message] * 10
+    await transport.send_many(messages, [transport.addr] * len(messages))
+
+    received = []
+    while len(received) < len(messages):
+        received.extend(await transport.recv_batch(len(messages)))
+
+    assert [m for m, _ in received] == messages
+    assert len(transport.ring) == transport.RING_SIZE
+    transport.close()
+
+
+@pytest.mark.asyncio
+async def test_send_coalesce(event_loop, message):
+    transport = Transport(("localhost", 0), loop=event_loop, coalesce=True)
+    messages = [message] * 10
+    for m in messages:
+        await transport.send(m, transport.addr)
+    assert transport.tx_packets == 0
+
+    received = []
+    while len(received) < len(messages):
+        received.extend(await transport.recv_batch(len(messages)))
+
+    assert [m for m, _ in received] == messages
+    assert all(addr == transport.addr for _, addr in received)
+    assert transport.tx_packets == 1
+    assert transport.tx_coalesced == len(messages)
+    assert transport.rx_packets == 1
+    transport.close()
+
+
+@pytest.mark.asyncio
+async def test_send_coalesce_packet_size(event_loop, message):
+    transport = Transport(("localhost", 0), loop=event_loop, coalesce=True)
+    message.payload = b"a" * (transport.PACKET_SIZE // 4)
+    messages = [message] * 4
+    for m in messages:
+        await transport.send(m, transport.addr)
+    assert transport.tx_packets == 1
+
+    transport.flush()
+    assert transport.tx_packets == 2
+    assert transport.tx_coalesced == 3
+
+    received = []
+    while len(received) < len(messages):
+        received.extend(await transport.recv_batch(len(messages)))
+    assert [m for m, _ in received] == messages
+    transport.close()
+
+
+@pytest.mark.asyncio
+async def test_send_coalesce_batch_size(event_loop, message):
+    transport = Transport(("localhost", 0), loop=event_loop, coalesce=True)
+    # fits in a datagram, not in a batch
+    message.payload = b"a" * (transport.PACKET_SIZE - len(message.SerializeToString()) - 4)
+    assert len(message.SerializeToString()) == transport.PACKET_SIZE - 1
+
+    small = Message(id=message.id)
+    await transport.send(small, transport.addr)
+    await transport.send(message, transport.addr)
+    assert transport.tx_packets == 2
+    assert not transport._outbox
+
+    received = []
+    while len(received) < 2:
+        received.extend(await transport.recv_batch(2))
+    assert [m for m, _ in received] == [small, message]
+    transport.close()
+
+
+@pytest.mark.asyncio
+async def test_recv_coalesce_zerocopy(event_loop, message):
+    transport = Transport(("localhost", 0), loop=event_loop, zerocopy=True, coalesce=True)
+    messages = [message] * 10
+    for m in messages:
+        await transport.send(m, transport.addr)
+    transport.flush()
+
+    received = []
+    while len(received) < len(messages):
+        received.extend(await transport.recv_batch(len(messages)))
+
+    assert [m for m, _ in received] == messages
+    assert len(transport.ring) == transport.RING_SIZE
+    transport.close()
+
+
+@pytest.mark.asyncio
+async def test_send_compression(event_loop, message):
+    transport = Transport(("localhost", 0), loop=event_loop, compression="zlib")
+    message.payload = b"test_send_compression" * 1000
+    await transport.send(message, transport.addr)
+    assert transport.tx_fragments == 0
+    assert transport.tx_bytes < len(message.payload)
+
+    received_message, _ = await transport.recv()
+    assert received_message == message
+    transport.close()
+
+    with pytest.raises(ValueError):
+        Transport(("localhost", 0), loop=event_loop, compression="gzip")
+
+
+@pytest.mark.asyncio
+async def test_send_piggyback(event_loop, message):
+    transport = Transport(("localhost", 0), loop=event_loop)
+    piggyback = transport.piggyback = MagicMock()
+    piggyback.pack.return_value = b"piggyback"
+
+    await transport.send(message, transport.addr)
+    size = transport.PACKET_SIZE - len(message.SerializeToString()) - transport.PIGGYBACK_OVERHEAD
+    piggyback.pack.assert_called_once_with(size)
+
+    received_message, addr = await transport.recv(lazy=True)
+    piggyback.unpack.assert_called_once_with(b"piggyback", addr)
+    assert received_message.to_message() == message
+
+    # fragmented messages carry no piggybacked data
+    message.payload = b"x" * transport.PACKET_SIZE
+    await transport.send(message, transport.addr)
+    assert piggyback.pack.call_count == 1
+    transport.close()
+
+
+@pytest.mark.asyncio
+async def test_send_coalesce_piggyback(event_loop, message):
+    transport = Transport(("localhost", 0), loop=event_loop, coalesce=True)
+    piggyback = transport.piggyback = MagicMock()
+    # events pending: the piggyback fills all the free space
+    piggyback.pack.side_effect = lambda size: b"x" * size
+
+    messages = [message] * 10
+    for m in messages:
+        await transport.send(m, transport.addr)
+    transport.flush()
+    assert transport.tx_packets == 1
+    assert transport.tx_coalesced == len(messages)
+    assert transport.PACKET_SIZE - 1 <= transport.tx_bytes <= transport.PACKET_SIZE
+
+    # once per datagram
+    received = []
+    while len(received) < len(messages):
+        received.extend(await transport.recv_batch(len(messages)))
+    assert [m for m, _ in received] == messages
+    assert piggyback.pack.call_count == 1
+    assert piggyback.unpack.call_count == 1
+    transport.close()